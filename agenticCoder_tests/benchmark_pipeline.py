@@ -0,0 +1,174 @@
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Offline, deterministic model; checkpoints go to a throwaway database
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ.setdefault("RUN_STORE_PATH", os.path.join(tempfile.mkdtemp(), "runs.sqlite"))
+
+from agents import agent_factory
+from agents.tester_agent import TesterAgent
+from agents.virtual_workspace import VirtualWorkspace, release_workspace
+
+PROMPT = "Benchmark project"
+
+
+class Timers(dict):
+    """Accumulates time spent in wrapped functions, per bucket."""
+
+    def __init__(self):
+        super().__init__()
+        self._patched = []
+
+    def wrap(self, owner, attr: str, bucket: str):
+        original = getattr(owner, attr)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self[bucket] = self.get(bucket, 0.0) + time.perf_counter() - start
+
+        setattr(owner, attr, timed)
+        self._patched.append((owner, attr, original))
+
+    def restore(self):
+        for owner, attr, original in reversed(self._patched):
+            setattr(owner, attr, original)
+        self._patched = []
+
+
+def run_graph(workdir: str) -> dict:
+    from agents.run_Agent import stream_agentic_pipeline
+
+    workspace = os.path.join(workdir, "workspace")
+    nodes, final_state = {}, {}
+    last = time.perf_counter()
+    for event, payload in stream_agentic_pipeline(PROMPT, workspace=workspace):
+        now = time.perf_counter()
+        if event == "node":
+            node = payload["node"]
+            nodes[node] = nodes.get(node, 0.0) + now - last
+            last = now
+        elif event == "done":
+            final_state = payload
+
+    # Export the result the way the app does
+    release_workspace(workspace).zip_bytes()
+    return {
+        "nodes": nodes,
+        "iterations": final_state.get("iteration", 0),
+        "passed": (final_state.get("test_output") or {}).get("passed", 0),
+    }
+
+
+def run_main(workdir: str) -> dict:
+    import main
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        main.run_pipeline(PROMPT)
+    finally:
+        release_workspace("workspace")
+        os.chdir(cwd)
+    return {"nodes": {}, "iterations": 1, "passed": None}
+
+
+PIPELINES = {"graph": run_graph, "main": run_main}
+
+
+def run_scenario(pipeline: str, modules: int, fixes: int, candidates: int = 1) -> dict:
+    os.environ["FAKE_LLM_MODULES"] = str(modules)
+    os.environ["FAKE_LLM_FIX_ITERATIONS"] = str(fixes)
+    os.environ["CODER_CANDIDATES"] = str(candidates)
+    agent_factory.reset()
+
+    timers = Timers()
+    timers.wrap(VirtualWorkspace, "materialize", "io")
+    timers.wrap(VirtualWorkspace, "zip_bytes", "io")
+    timers.wrap(VirtualWorkspace, "write_zip", "io")
+    timers.wrap(TesterAgent, "_run_pytest", "pytest")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = PIPELINES[pipeline](tempfile.mkdtemp(prefix="bench_"))
+            wall = time.perf_counter() - start
+    finally:
+        timers.restore()
+
+    return {
+        "pipeline": pipeline,
+        "modules": modules,
+        "fixes": fixes,
+        "candidates": candidates,
+        "wall_s": round(wall, 3),
+        "io_s": round(timers.get("io", 0.0), 3),
+        "pytest_s": round(timers.get("pytest", 0.0), 3),
+        "nodes_s": {k: round(v, 3) for k, v in result["nodes"].items()},
+        "iterations": result["iterations"],
+        "passed": result["passed"],
+    }
+
+
+def parse_ints(text: str):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="End-to-end pipeline benchmark on the fake LLM backend."
+    )
+    parser.add_argument("--pipelines", default="graph,main")
+    parser.add_argument("--modules", default="1,5,20,50", type=parse_ints)
+    parser.add_argument("--fixes", default="0,1,2,3", type=parse_ints)
+    parser.add_argument(
+        "--candidates",
+        default="1",
+        type=parse_ints,
+        help="best-of-N fix candidates per iteration (graph pipeline only)",
+    )
+    parser.add_argument(
+        "--latency", default=0.0, type=float, help="seconds per LLM call"
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    os.environ["FAKE_LLM_LATENCY_S"] = str(args.latency)
+
+    results = []
+    print(
+        f"{'pipeline':8} {'modules':>7} {'fixes':>5} {'cands':>5} {'wall s':>8} {'io s':>7} "
+        f"{'pytest s':>8} {'iters':>5}  nodes"
+    )
+    for pipeline in args.pipelines.split(","):
+        # main.run_pipeline has no fix loop, so only the module count matters
+        fixes = args.fixes if pipeline == "graph" else [0]
+        candidates = args.candidates if pipeline == "graph" else [1]
+        for modules in args.modules:
+            for fix in fixes:
+                for n in candidates:
+                    r = run_scenario(pipeline, modules, fix, n)
+                    results.append(r)
+                    nodes = " ".join(f"{k}={v:.3f}" for k, v in r["nodes_s"].items())
+                    print(
+                        f"{r['pipeline']:8} {r['modules']:>7} {r['fixes']:>5} "
+                        f"{r['candidates']:>5} {r['wall_s']:>8.3f} {r['io_s']:>7.3f} "
+                        f"{r['pytest_s']:>8.3f} {r['iterations']:>5}  {nodes}"
+                    )
+
+    agent_factory.reset()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
@@ -4,8 +4,15 @@ import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(project_root)
 
-from app.app_helper import cleanup_workspace
+from app.app_helper import cleanup_artifacts, make_run_workspace, new_run_id
 
 if __name__ == "__main__":
-    cleanup_workspace()
-    print("Workspace cleaned up.")
+    # Two runs of the same session get separate workspaces
+    run_a, run_b = new_run_id("session"), new_run_id("session")
+    workspace_a, workspace_b = make_run_workspace(run_a), make_run_workspace(run_b)
+    assert run_a != run_b and workspace_a != workspace_b
+    assert os.path.isdir(os.path.join(workspace_a, "tests"))
+    print("Run workspaces:", workspace_a, workspace_b)
+
+    cleanup_artifacts(max_age_s=0)
+    print("Artifacts cleaned up.")
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Offline model with some latency; the first fix of every run still fails
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["FAKE_LLM_MODULES"] = "2"
+os.environ["FAKE_LLM_FIX_ITERATIONS"] = "1"
+os.environ["FAKE_LLM_LATENCY_S"] = "0.5"
+os.environ["RUN_CHECKPOINTS"] = "0"
+
+from agents.run_Agent import arun_agentic_pipeline, astream_agentic_pipeline
+
+RUNS = 8
+
+
+async def streamed_run():
+    events = []
+    async for event, payload in astream_agentic_pipeline(
+        "calc", workspace=tempfile.mkdtemp(prefix="async_run_")
+    ):
+        events.append(payload["node"] if event == "node" else event)
+    return events
+
+
+async def main():
+    print("Streamed events:", await streamed_run())
+
+    # Many pipelines on one event loop, none of them holding a thread
+    threads = threading.active_count()
+    start = time.perf_counter()
+    states = await asyncio.gather(
+        *(
+            arun_agentic_pipeline(
+                "calc", workspace=tempfile.mkdtemp(prefix="async_run_")
+            )
+            for _ in range(RUNS)
+        )
+    )
+    print(f"{RUNS} runs in {time.perf_counter() - start:.1f}s")
+    print("Stop reasons:", [s["stop_reason"] for s in states])
+    print("Threads before / after:", threads, threading.active_count())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
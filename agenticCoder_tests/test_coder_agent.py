@@ -54,7 +54,7 @@ if __name__ == "__main__":
     }
 
     coder = CoderAgent()
-    generated = coder.generate_code(plan)
+    generated = coder.generate_or_improve_code(plan)
 
     for filename, code in generated.items():
         print(f"\n--- {filename} ---\n{code[:300]}...")
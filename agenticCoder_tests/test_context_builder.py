@@ -0,0 +1,38 @@
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.context_builder import build_improve_context
+
+if __name__ == "__main__":
+    files = {
+        "utils.py": "def validate(n):\n    return n >= 0\n",
+        "divide_apples.py": (
+            "from utils import validate\n\n"
+            "def distribute(total, people):\n"
+            "    return [total / people] * people\n"
+        ),
+        "cli.py": "import argparse\n" + "# cli helpers\n" * 400,
+        "tests/test_divide_apples.py": (
+            "from divide_apples import distribute\n\n"
+            "def test_equal_division():\n"
+            "    assert distribute(100, 10) == [10] * 10\n"
+        ),
+    }
+    feedback = (
+        "❌ Tests failed. Details:\n"
+        "F\n"
+        "workspace/tests/test_divide_apples.py:4: in test_equal_division\n"
+        "    assert distribute(100, 10) == [10] * 10\n"
+        "E   assert [10.0, 10.0] == [10, 10]\n"
+        "FAILED workspace/tests/test_divide_apples.py::test_equal_division\n"
+        "1 failed in 0.02s\n"
+    )
+
+    trimmed_feedback, context, stats = build_improve_context(
+        files, feedback, token_budget=1000
+    )
+    print(context)
+    print("stats: ", stats)
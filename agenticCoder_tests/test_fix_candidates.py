@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Offline model whose first fix still fails: only later candidates pass
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["FAKE_LLM_MODULES"] = "2"
+os.environ["FAKE_LLM_FIX_ITERATIONS"] = "2"
+
+from agents.coder_agent import CoderAgent
+from agents.fix_candidates import Candidate, best_of_n_fix, candidate_options
+from agents.pytest_results import RunResult
+from agents.tester_agent import TesterAgent
+from agents.virtual_workspace import get_workspace
+
+if __name__ == "__main__":
+    workspace = tempfile.mkdtemp(prefix="fix_candidates_")
+    coder = CoderAgent(output_dir=workspace, candidates=3)
+    tester = TesterAgent(workspace=workspace, workers=0)
+
+    plan = json.loads(coder.llm.invoke("You are a software project planner").content)
+    coder.generate_or_improve_code(plan, workspace=workspace)
+    result = tester.run_tests(workspace=workspace)
+    print("Initial:", result.summary_line())
+
+    feedback = tester.analyze_results(result)
+    code_output, result = best_of_n_fix(
+        coder, tester, plan, feedback, workspace, coder.candidates
+    )
+    print("Winner changed:", list(code_output))
+    print("Winner result:", result.summary_line() if result else None)
+    print("Workspace mod_0.py:", get_workspace(workspace).read("mod_0.py"))
+
+    # A subset that failed once ranks behind two failures of the full suite
+    subset = RunResult(passed=1, failed=1, selected=["tests/test_mod_0.py"])
+    suite = RunResult(passed=3, failed=2)
+    ranked = sorted(
+        [
+            Candidate(0, workspace, {}, {}, subset),
+            Candidate(1, workspace, {}, {}, suite),
+        ],
+        key=lambda c: c.score,
+    )
+    print("Ranked:", [(c.index, c.result.summary_line()) for c in ranked])
+    assert [c.index for c in ranked] == [1, 0]
+
+    # gpt-5 models reject a temperature: candidates only differ by seed
+    from langchain_core.messages import HumanMessage
+    from llm.openai_client import RetryingChatOpenAI
+
+    for model in ("gpt-5-mini", "gpt-4o-mini"):
+        coder.llm = RetryingChatOpenAI(model_name=model, temperature=0, api_key="sk")
+        bound = coder.with_llm_options(**candidate_options(2, [0.2, 0.5])[1]).llm
+        payload = bound.bound._get_request_payload(
+            [HumanMessage("fix it")], **bound.kwargs
+        )
+        print(model, "payload:", {k: payload.get(k) for k in ("temperature", "seed")})
+        if model.startswith("gpt-5"):
+            assert "temperature" not in payload and payload["seed"] == 1
+        else:
+            assert payload["temperature"] == 0.5
@@ -0,0 +1,74 @@
+import os
+import re
+import subprocess
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Entry points and the heavy packages they must not import eagerly
+ENTRY_POINTS = ["agents.graph", "agents.run_Agent", "main"]
+HEAVY_MODULES = [
+    "langchain_openai",
+    "openai",
+    "huggingface_hub",
+    "langgraph",
+    "tiktoken",
+]
+
+# Cumulative import budget per entry point (milliseconds)
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "500"))
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module: str) -> dict:
+    """
+    Imports module in a fresh interpreter with `python -X importtime` and
+    returns {imported module: cumulative microseconds} for module and everything
+    it imported (interpreter startup imports are left out).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    # Lines come in post-order: a module's imports are listed right before it
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            depth = (len(match.group(3)) - 1) // 2
+            entries.append((match.group(4), int(match.group(2)), depth))
+
+    end = max(i for i, (name, _, depth) in enumerate(entries) if name == module)
+    start = end
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    return {name: us for name, us, _ in entries[start : end + 1]}
+
+
+if __name__ == "__main__":
+    failures = []
+    for entry in ENTRY_POINTS:
+        times = import_times(entry)
+        total_ms = times.get(entry, 0) / 1000
+        heavy = sorted({name.split(".")[0] for name in times} & set(HEAVY_MODULES))
+        slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[1:6]
+
+        print(f"{entry}: {total_ms:.1f} ms (budget {BUDGET_MS:.0f} ms)")
+        for name, us in slowest:
+            print(f"    {us / 1000:8.1f} ms  {name}")
+
+        if heavy:
+            failures.append(f"{entry} eagerly imports {', '.join(heavy)}")
+        if total_ms > BUDGET_MS:
+            failures.append(f"{entry} took {total_ms:.1f} ms to import")
+
+    if failures:
+        print("\n❌ Startup regression:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\n✅ Import times within budget.")
@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.incremental_json import IncrementalFilesParser
+
+FILES = {
+    "files": [
+        {"filename": "a.py", "code": 'print("a", "b")\nd = {"k": "v"}\n'},
+        {"filename": "b.py", "code": "x = 1\n"},
+    ]
+}
+
+if __name__ == "__main__":
+    # Unescaped quotes and raw newlines inside strings
+    broken = (
+        '```json\n{"files": [{"filename": "a.py", "code": "print("a", "b")\n'
+        'd = {"k": "v"}\n"}, {"filename": "b.py", "code": "x = 1\n"}]}\n```'
+    )
+    parser = IncrementalFilesParser()
+    parser.feed(broken)
+    parser.close()
+    print("Repaired locally:", parser.document() == FILES)
+
+    # A truncated plan keeps its complete modules; only the rest is requested
+    plan = {
+        "modules": [
+            {"name": "calc.py", "tasks": ["add()"]},
+            {"name": "tests/test_calc.py", "tasks": ["test add()"]},
+        ]
+    }
+    truncated = json.dumps(plan)[:-40]
+    continuation = json.dumps({"modules": plan["modules"][1:]})
+    fd, responses = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump([truncated, continuation], f)
+
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_RESPONSES"] = responses
+    from agents.planner_agent import PlannerAgent
+
+    result = PlannerAgent().plan_project("A calculator with tests")
+    print("Salvaged plan:", result)
+    print("Same as the intended plan:", result == plan)
+    os.remove(responses)
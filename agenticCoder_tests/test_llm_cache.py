@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+
+from llm.fake_llm import ScriptedChatModel
+from llm.llm_cache import DiskLLMCache
+
+if __name__ == "__main__":
+    cache_path = os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite")
+    cache = DiskLLMCache(path=cache_path, max_entries=2)
+
+    prompt = PromptTemplate.from_template("Plan a project for: {user_prompt}")
+    llm = FakeListChatModel(responses=["first", "second", "third"], cache=cache)
+    chain = prompt | llm
+
+    start = time.perf_counter()
+    print(chain.invoke({"user_prompt": "quadratic solver"}).content)  # miss -> "first"
+    print(chain.invoke({"user_prompt": "quadratic solver"}).content)  # hit  -> "first"
+    print(chain.invoke({"user_prompt": "apple divider"}).content)  # miss -> "second"
+    print(chain.invoke({"user_prompt": "todo app"}).content)  # miss, evicts LRU
+    print(f"elapsed: {time.perf_counter() - start:.4f}s")
+    print("stats: ", cache.stats())
+
+    # Bypass always reaches the model but keeps the stored entry fresh
+    cache.bypass = True
+    print(chain.invoke({"user_prompt": "todo app"}).content)
+    print("stats after bypass: ", cache.stats())
+
+    # Streams (the coder's incremental parsing) share entries with invoke
+    cache = DiskLLMCache(path=os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite"))
+    llm = ScriptedChatModel(
+        responses=["streamed", "invoked"], chunk_size=3, cache=cache
+    )
+    chain = prompt | llm
+    streamed = [c.content for c in chain.stream({"user_prompt": "quadratic solver"})]
+    print("miss, streamed: ", streamed)
+    replayed = [c.content for c in chain.stream({"user_prompt": "quadratic solver"})]
+    print("hit, replayed:  ", replayed)
+    invoked = chain.invoke({"user_prompt": "quadratic solver"}).content
+    chain.invoke({"user_prompt": "apple divider"})
+    restreamed = [c.content for c in chain.stream({"user_prompt": "apple divider"})]
+    print("stats after streams: ", cache.stats())
+    assert "".join(streamed) == "streamed" and len(streamed) > 1
+    assert replayed == ["streamed"] and invoked == "streamed"
+    assert restreamed == ["invoked"] and llm.calls == 2
+    assert cache.stats()["hits"] == 3
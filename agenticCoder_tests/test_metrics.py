@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from agents.metrics import MetricsCallbackHandler, MetricsRegistry, RunMetrics
+
+if __name__ == "__main__":
+    llm = FakeListChatModel(responses=['{"modules": []}', "not json"])
+    chain = (
+        ChatPromptTemplate.from_template("Plan: {prompt}") | llm | JsonOutputParser()
+    )
+
+    metrics = RunMetrics("demo")
+    config = {"callbacks": [MetricsCallbackHandler(metrics)]}
+    print("Parsed:", chain.invoke({"prompt": "Divide apples."}, config=config))
+    try:
+        chain.invoke({"prompt": "Divide apples again."}, config=config)
+    except Exception as e:
+        print("Expected parse failure:", type(e).__name__)
+    metrics.finish("done")
+
+    registry = MetricsRegistry(window=10)
+    data = registry.record(metrics)
+    print("Totals:", json.dumps(data["totals"], indent=2))
+    print("Summary:", json.dumps(registry.aggregate()["llm_latency_s"]))
+    print(registry.prometheus_text())
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+# Offline tiers of differing latency
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["LLM_ROUTING"] = "1"
+os.environ["LLM_ROUTER_TIERS"] = (
+    "fast=fake-fast:2000:1,standard=fake-standard:20000:2,large=fake-large:0:5"
+)
+os.environ["LLM_ROUTER_ROLES"] = "planner=fast,coder=standard"
+os.environ["FAKE_LLM_TIER_LATENCY_S"] = "fast=0.02,standard=0.1,large=0.3"
+os.environ["FAKE_LLM_MODULES"] = "2"
+os.environ["FAKE_LLM_FIX_ITERATIONS"] = "1"
+os.environ["RUN_CHECKPOINTS"] = "0"
+
+from agents.metrics import get_metrics_registry
+from agents.run_Agent import stream_agentic_pipeline
+from llm.fake_llm import ScriptedChatModel
+from llm.router import (
+    ModelRouter,
+    RoutedChatModel,
+    failure_category,
+    get_model_router,
+    parse_tiers,
+)
+
+
+def names(tiers):
+    return [t.name for t in tiers]
+
+
+if __name__ == "__main__":
+    # Failure categories of test / pre-check feedback
+    for feedback in (
+        "tests/test_a.py:1: ModuleNotFoundError: No module named 'calc'",
+        "E       assert 5 == 1\nAssertionError",
+        "",
+    ):
+        print(repr(feedback[:40]), "->", repr(failure_category(feedback)))
+
+    # Routing decisions
+    router = get_model_router()
+    print("planner, small prompt:", names(router.route("planner", 500)))
+    print("coder, small prompt:", names(router.route("coder", 500)))
+    print("coder, import error:", names(router.route("coder", 500, "import")))
+    print("coder, huge prompt:", names(router.route("coder", 50000)))
+    print("coder, escalated:", names(router.route("coder", 500, escalate=True)))
+
+    # A tier slower than its timeout falls back to the next one and, after two
+    # timeouts in a row, is skipped altogether
+    slow = ModelRouter(parse_tiers("fast=slow:0:0.1,standard=ok:0:2"))
+    llm = RoutedChatModel(
+        role="coder",
+        router=slow,
+        clients={
+            "fast": ScriptedChatModel(latency_s=0.5, timeout_s=0.1),
+            "standard": ScriptedChatModel(latency_s=0.05),
+        },
+    )
+    for _ in range(3):
+        served_by = llm.invoke("You are a software project planner")
+        print("Served by:", served_by.response_metadata.get("tier", "?"))
+    print("Tier stats:", slow.stats())
+
+    # A whole pipeline on the shared router: every call reports its tier
+    final_state = None
+    for event, payload in stream_agentic_pipeline(
+        "calc", workspace=tempfile.mkdtemp(prefix="routed_")
+    ):
+        if event == "done":
+            final_state = payload
+    metrics = get_metrics_registry().get(final_state["run_id"])
+    print("Run:", final_state["stop_reason"])
+    print("Tiers per call:", [c.get("tier") for c in metrics["llm_calls"]])
+    print("Tier latency:", get_metrics_registry().aggregate()["llm_latency_by_tier_s"])
+    print("Router stats:", router.stats())
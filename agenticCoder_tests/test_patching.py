@@ -0,0 +1,46 @@
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.patching import PatchError, apply_file_patch
+
+if __name__ == "__main__":
+    original = (
+        "def distribute(total, people):\n"
+        "    return [total / people] * people\n"
+        "\n"
+        "\n"
+        "def describe(dist):\n"
+        "    return ', '.join(map(str, dist))\n"
+    )
+
+    edit = {
+        "filename": "divide_apples.py",
+        "edits": [{"search": "[total / people]", "replace": "[total // people]"}],
+    }
+    print(apply_file_patch(original, edit))
+
+    diff = {
+        "filename": "divide_apples.py",
+        "diff": (
+            "--- a/divide_apples.py\n"
+            "+++ b/divide_apples.py\n"
+            "@@ -5,2 +5,2 @@\n"
+            " def describe(dist):\n"
+            "-    return ', '.join(map(str, dist))\n"
+            "+    return ' | '.join(map(str, dist))\n"
+        ),
+    }
+    print(apply_file_patch(original, diff))
+
+    # A stale hunk must be rejected so the coder falls back to a full rewrite
+    stale = {
+        "filename": "divide_apples.py",
+        "diff": "@@ -1 +1 @@\n-import os\n+import re\n",
+    }
+    try:
+        apply_file_patch(original, stale)
+    except PatchError as e:
+        print("rejected: ", e)
@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.plan_index import PlanIndex
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "plans.sqlite")
+    index = PlanIndex(path=path, max_entries=4)
+    plan = {"modules": [{"name": "quadratic.py", "tasks": ["Solve ax^2+bx+c=0"]}]}
+    index.add("quadratic solver", plan)
+    index.add("Divide 100 apples among 10 people.", {"modules": []})
+    index.add("Convert celsius to fahrenheit", {"modules": []})
+
+    for prompt, reusable in (
+        ("Write a quadratic solver in Python", True),
+        ("Solve quadratic equations in Python", False),  # only a hint
+        # Near misses: other numbers or word order are never reused as is
+        ("Divide 100 apples among 12 people.", False),
+        ("Convert fahrenheit to celsius", False),
+        ("calculator with add and subtract", False),  # miss
+    ):
+        match = index.lookup(prompt)
+        print(prompt, "->", (match.similarity, match.reusable) if match else None)
+        assert bool(match and match.reusable) == reusable
+
+    index.add("todo list app", {"modules": []})
+    index.add("apple divider", {"modules": []})  # evicts the least recently used
+    print("Stats:", index.stats())
+
+    # The index is persisted: a new instance sees the same plans
+    print("Reloaded:", PlanIndex(path=path).stats()["entries"], "entries")
@@ -0,0 +1,49 @@
+import os
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.progress import (
+    assess_progress,
+    failure_signature,
+    workspace_fingerprint,
+)
+
+if __name__ == "__main__":
+    failing = {
+        "cases": [
+            {"nodeid": "test_a.py::test_one", "outcome": "failed"},
+            {"nodeid": "test_a.py::test_two", "outcome": "passed"},
+        ],
+        "collection_errors": [{"path": "test_b.py"}],
+    }
+    print("Failure signature:", failure_signature(failing))
+
+    v1 = workspace_fingerprint({"a.py": "1"})
+    v2 = workspace_fingerprint({"a.py": "2"})
+    v3 = workspace_fingerprint({"a.py": "3"})
+    fails = failure_signature(failing)
+
+    cases = {
+        "first iteration": [{"workspace": v1, "failures": fails}],
+        "files unchanged": [
+            {"workspace": v1, "failures": fails},
+            {"workspace": v1, "failures": fails},
+        ],
+        "same failures": [
+            {"workspace": v1, "failures": fails},
+            {"workspace": v2, "failures": fails},
+        ],
+        "back to v1": [
+            {"workspace": v1, "failures": fails},
+            {"workspace": v2, "failures": ["x"]},
+            {"workspace": v1, "failures": fails},
+        ],
+        "progressing": [
+            {"workspace": v1, "failures": fails},
+            {"workspace": v3, "failures": ["test_a.py::test_one:failed"]},
+        ],
+    }
+    for name, progress in cases.items():
+        print(f"{name}: {assess_progress(progress)}")
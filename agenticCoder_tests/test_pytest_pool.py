@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.pytest_pool import PytestWorkerPool
+
+TESTS = {
+    "tests/test_ok.py": "def test_ok():\n    assert 1 + 1 == 2\n",
+    "tests/test_hang.py": "import time\n\n\ndef test_hang():\n    time.sleep(60)\n",
+    # Far beyond the pool's address space limit
+    "tests/test_memory.py": "def test_memory():\n    data = bytearray(4 * 1024**3)\n",
+    "tests/test_broken.py": "import module_that_does_not_exist\n",
+}
+
+
+def make_workspace() -> str:
+    root = tempfile.mkdtemp(prefix="pytest_pool_")
+    for path, code in TESTS.items():
+        os.makedirs(os.path.join(root, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(root, path), "w", encoding="utf-8") as f:
+            f.write(code)
+    return root
+
+
+def check(label: str, result):
+    outcomes = {c.nodeid: c.outcome for c in result.cases}
+    print(f"{label}: {result.summary_line()}")
+    print("  cases:", outcomes)
+    assert outcomes["tests/test_ok.py::test_ok"] == "passed"
+    hang = next(c for c in result.cases if c.nodeid.endswith("test_hang"))
+    assert hang.outcome == "failed" and "timeout" in hang.message
+    memory = next(c for c in result.cases if c.nodeid.endswith("test_memory"))
+    assert memory.outcome == "failed" and "MemoryError" in memory.message
+    assert not result.timed_out
+
+
+def check_collection(label: str, result):
+    # pytest stops a session at a collection error, so it gets its own run
+    print(f"{label}: {result.summary_line()}")
+    print("  collection errors:", [e.path for e in result.collection_errors])
+    assert [e.path for e in result.collection_errors] == ["tests/test_broken.py"]
+    assert "module_that_does_not_exist" in result.collection_errors[0].message
+    assert result.errors == 1 and not result.ok
+
+
+def check_cancelled(label: str, result):
+    print(f"{label}: {result.summary_line()}")
+    print("  messages:", {c.nodeid: c.message for c in result.cases})
+    assert result.errors == 1 and not result.timed_out
+    assert result.cases[0].message == "run was cancelled"
+
+
+if __name__ == "__main__":
+    workspace = make_workspace()
+    paths = [p for p in sorted(TESTS) if p != "tests/test_broken.py"]
+    pool = PytestWorkerPool(workers=2, test_timeout=1, run_timeout=60, memory_mb=512)
+    pool.warm_up()
+
+    # Per-test SIGALRM timeout, RLIMIT_AS and a collection error, sync and async
+    check("run", pool.run(workspace, paths))
+    check("arun", asyncio.run(pool.arun(workspace, paths)))
+    check_collection("run", pool.run(workspace, ["tests/test_broken.py"]))
+    check_collection(
+        "arun", asyncio.run(pool.arun(workspace, ["tests/test_broken.py"]))
+    )
+
+    # Cancelling a run kills its workers and reports the shard as errors
+    slow = PytestWorkerPool(workers=1, test_timeout=30, run_timeout=60)
+    cancel = threading.Event()
+    threading.Timer(1.0, cancel.set).start()
+    check_cancelled(
+        "run cancelled", slow.run(workspace, ["tests/test_hang.py"], cancel)
+    )
+
+    async def cancelled_arun():
+        cancel = threading.Event()
+        asyncio.get_running_loop().call_later(1.0, cancel.set)
+        return await slow.arun(workspace, ["tests/test_hang.py"], cancel)
+
+    check_cancelled("arun cancelled", asyncio.run(cancelled_arun()))
+
+    pool.shutdown()
+    slow.shutdown()
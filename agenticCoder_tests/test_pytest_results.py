@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.pytest_results import (
+    MAX_TRACEBACK_CHARS,
+    MAX_TRACEBACK_LINES,
+    RunResult,
+    parse_junit_xml,
+)
+
+# A long traceback: the report must keep only its informative tail
+LONG_TRACEBACK = "\n".join(
+    [f"    frame_{i}()" for i in range(60)]
+    + ["_ _ _ _ _ _", "E   assert 3 == 4", "tests/test_calc.py:12: AssertionError"]
+)
+
+JUNIT_XML = f"""<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+  <testsuite name="pytest" errors="2" failures="1" skipped="1" tests="5" time="1.25">
+    <testcase classname="tests.test_calc" name="test_add" time="0.01" />
+    <testcase classname="tests.test_calc" name="test_sub" time="0.02">
+      <failure message="assert 3 == 4">{LONG_TRACEBACK}</failure>
+    </testcase>
+    <testcase classname="tests.test_calc.TestDiv" name="test_zero" time="0.03">
+      <error message="fixture 'db' not found">fixture 'db' not found</error>
+    </testcase>
+    <testcase classname="tests.test_calc" name="test_later" time="0.00">
+      <skipped type="pytest.skip" message="not ready">not ready</skipped>
+    </testcase>
+    <testcase classname="" name="tests.test_broken" time="0.00">
+      <error message="collection failure">ModuleNotFoundError: No module named 'nope'</error>
+    </testcase>
+  </testsuite>
+</testsuites>
+"""
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "report.xml")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(JUNIT_XML)
+
+    result = parse_junit_xml(path)
+    print(result.summary_line())
+    for case in result.cases:
+        print(f"  {case.outcome:<8} {case.nodeid}")
+    print("Failing files:", result.failing_files())
+
+    assert (result.passed, result.failed, result.errors, result.skipped) == (1, 1, 2, 1)
+    assert not result.ok
+    nodeids = [c.nodeid for c in result.cases]
+    assert "tests/test_calc.py::TestDiv::test_zero" in nodeids
+    assert [e.path for e in result.collection_errors] == ["tests/test_broken.py"]
+    assert result.failing_files() == ["tests/test_calc.py", "tests/test_broken.py"]
+
+    # Tracebacks are trimmed to their tail, separators dropped
+    message = next(c.message for c in result.cases if c.outcome == "failed")
+    print("Trimmed failure:\n" + message)
+    assert message.startswith("...") and "frame_0()" not in message
+    assert message.endswith("tests/test_calc.py:12: AssertionError")
+    assert "_ _ _" not in message
+    assert len(message.splitlines()) <= MAX_TRACEBACK_LINES + 1
+    assert len(message) <= MAX_TRACEBACK_CHARS + 3
+
+    # Shards run in parallel are merged into one result
+    shard = RunResult(passed=2, duration=2.0)
+    merged = RunResult.merge([result, shard])
+    print("Merged:", merged.summary_line())
+    assert (merged.passed, merged.failed, merged.errors) == (3, 1, 2)
+    assert merged.duration == 2.0
+    assert len(merged.cases) == 4 and len(merged.collection_errors) == 1
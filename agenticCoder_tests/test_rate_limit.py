@@ -0,0 +1,28 @@
+import os
+import sys
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from llm.rate_limit import TokenBucketLimiter
+
+if __name__ == "__main__":
+    # 5 requests per second, and 600 tokens per minute with 100 tokens per call
+    limiter = TokenBucketLimiter(requests_per_second=5, tokens_per_minute=600)
+
+    def call():
+        limiter.acquire()
+        limiter.consume_tokens(100)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # The first 6 calls use up the minute's tokens, the rest wait for a refill
+    print(f"8 calls took {time.perf_counter() - start:.1f}s")
+    print("Stats:", limiter.stats())
@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+os.environ["RUN_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "runs.sqlite")
+
+from agents.run_Agent import stream_resume
+from agents.run_store import RunStore, get_run_store
+from agents.virtual_workspace import VirtualWorkspace, get_workspace
+
+if __name__ == "__main__":
+    store = RunStore(path=os.path.join(tempfile.mkdtemp(), "runs.sqlite"))
+    store.start_run("demo", "Divide 100 apples among 10 people.", "workspace")
+
+    workspace = VirtualWorkspace("workspace")
+    workspace.write(
+        "divide_apples.py", "def share(total, people):\n    return total // people\n"
+    )
+    state = {"run_id": "demo", "iteration": 0, "plan": {"modules": []}}
+    store.save("demo", "plan", state, *workspace.snapshot())
+
+    state["iteration"] = 1
+    store.save("demo", "test", state, *workspace.snapshot())
+
+    latest = store.latest("demo")
+    print("Last node:", latest["node"], "step:", latest["step"])
+    print("State:", latest["state"])
+    print("Files:", list(latest["files"]))
+    print("Runs:", store.list_runs())
+
+    # Resuming restores exactly the checkpoint's files: a stale test left in
+    # the directory by another run is removed, in memory and on disk
+    resume_dir = tempfile.mkdtemp(prefix="resume_")
+    os.makedirs(os.path.join(resume_dir, "tests"))
+    with open(os.path.join(resume_dir, "tests", "test_stale.py"), "w") as f:
+        f.write("def test_stale():\n    assert False\n")
+
+    shared = get_run_store()
+    shared.start_run("resumed", "Divide 100 apples among 10 people.", resume_dir)
+    done = {**state, "workspace": resume_dir, "test_output": {"passed": 1}}
+    shared.save("resumed", "test", done, *workspace.snapshot())
+    for event, payload in stream_resume("resumed"):
+        print("Resume event:", event)
+
+    print("Restored files:", sorted(get_workspace(resume_dir).snapshot()[1]))
+    assert not os.path.exists(os.path.join(resume_dir, "tests", "test_stale.py"))
@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["RUN_CHECKPOINTS"] = "0"
+os.environ.setdefault("SNAPSHOT_DIR", tempfile.mkdtemp(prefix="blobs_"))
+
+from agents.agent_factory import get_coder, get_planner, get_tester
+from agents.graph import _apply_test_result, _snapshot
+from agents.pytest_results import RunResult
+from agents.run_Agent import stream_agentic_pipeline
+from agents.snapshots import (
+    BlobStore,
+    best_snapshot,
+    get_blob_store,
+    restore_best_snapshot,
+)
+from agents.virtual_workspace import get_workspace, release_workspace
+from llm.fake_llm import ScriptedChatModel
+
+TEST_HEADER = (
+    "import os, sys\n"
+    "sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))\n"
+)
+
+
+def files(add: str, sub: str) -> str:
+    return json.dumps(
+        {
+            "files": [
+                {"filename": "calc.py", "code": f"{add}\n{sub}\n"},
+                {
+                    "filename": "tests/test_calc.py",
+                    "code": TEST_HEADER + "from calc import add, sub\n\n\n"
+                    "def test_add():\n    assert add(1, 2) == 3\n\n\n"
+                    "def test_sub():\n    assert sub(3, 2) == 1\n",
+                },
+            ]
+        }
+    )
+
+
+ADD_OK = "def add(a, b):\n    return a + b\n"
+ADD_BAD = "def add(a, b):\n    return a - b\n"
+SUB_OK = "def sub(a, b):\n    return a - b\n"
+SUB_BAD = "def sub(a, b):\n    return a + b\n"
+
+if __name__ == "__main__":
+    # Identical files share one blob; snapshots materialize as hardlinks
+    store = BlobStore(tempfile.mkdtemp(prefix="blobs_"))
+    workspace = tempfile.mkdtemp(prefix="snapshot_")
+    vfs = get_workspace(workspace)
+    vfs.write("a.py", "x = 1\n")
+    first = store.snapshot(workspace)
+    vfs.write("b.py", "y = 2\n")
+    second = store.snapshot(workspace)
+    print("Blob stats:", store.stats())
+    target = tempfile.mkdtemp(prefix="materialized_")
+    store.materialize(second, target)
+    print(
+        "Hardlinked:",
+        os.stat(os.path.join(target, "a.py")).st_ino
+        == os.stat(store.path(first["a.py"])).st_ino,
+    )
+
+    # A fix that makes things worse is rolled back before packaging
+    plan = {"modules": [{"name": "calc.py", "tasks": ["add", "sub"]}]}
+    get_planner().llm = ScriptedChatModel(responses=[json.dumps(plan)])
+    get_planner().plan_index = None
+    get_coder().llm = ScriptedChatModel(
+        responses=[
+            files(ADD_OK, SUB_BAD),  # 1 of 2 tests fail
+            files(ADD_BAD, SUB_BAD),  # worse: both fail
+            files(ADD_BAD, SUB_BAD),  # no change: the loop stops
+            files(ADD_BAD, SUB_BAD),
+        ]
+    )
+    run_workspace = tempfile.mkdtemp(prefix="rollback_")
+    for event, payload in stream_agentic_pipeline("calc", workspace=run_workspace):
+        if event == "done":
+            final_state = payload
+
+    for snapshot in final_state["snapshots"]:
+        print("Iteration", snapshot["iteration"], snapshot["score"], snapshot["tests"])
+    print("Shipped iteration:", final_state["shipped_iteration"])
+    print("Shipped calc.py:\n" + release_workspace(run_workspace).read("calc.py"))
+    print("Blob store:", get_blob_store().stats())
+
+    # A failing affected-tests subset is not scored against full-suite counts
+    subset_workspace = tempfile.mkdtemp(prefix="subset_")
+    vfs = get_workspace(subset_workspace)
+    state = {"workspace": subset_workspace, "iteration": 0, "snapshots": []}
+    vfs.write("calc.py", ADD_OK + SUB_BAD)
+    _snapshot(state)
+    _apply_test_result(state, get_tester(), RunResult(passed=8, failed=2))
+    vfs.write("calc.py", ADD_BAD + SUB_BAD)
+    _snapshot(state)
+    subset = RunResult(failed=1, selected=["tests/test_calc.py"])
+    _apply_test_result(state, get_tester(), subset)
+
+    for snapshot in state["snapshots"]:
+        print("Iteration", snapshot["iteration"], snapshot["score"], snapshot["tests"])
+    assert best_snapshot(state["snapshots"])["iteration"] == 1
+    assert restore_best_snapshot(state)["iteration"] == 1
+    assert vfs.read("calc.py") == ADD_OK + SUB_BAD
+    print("Subset iteration rolled back to the full-suite one")
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+os.environ.setdefault("TESTER_WORKERS", "0")
+
+from agents.graph import check_node, decide_after_check
+from agents.static_check import check_workspace, format_diagnostics
+from agents.virtual_workspace import get_workspace
+
+FILES = {
+    "calc.py": "def add(a, b):\n    return a + b\n",
+    "broken.py": "def f(:\n    pass\n",
+    "pkg/__init__.py": "from .core import run\n",
+    "pkg/core.py": "def run():\n    return 1\n",
+    "tests/test_calc.py": (
+        "import pytest\n"
+        "from calc import add, mul\n"
+        "from pkg import core, run\n"
+        "from pkg.missing import x\n"
+        "import notinstalledlib\n"
+    ),
+}
+
+if __name__ == "__main__":
+    diagnostics = check_workspace(FILES)
+    print(format_diagnostics(diagnostics))
+
+    # The graph node routes straight back to code without running pytest
+    workspace = tempfile.mkdtemp(prefix="static_check_")
+    vfs = get_workspace(workspace)
+    for path, code in FILES.items():
+        vfs.write(path, code)
+    state = {"workspace": workspace, "iteration": 0, "code_output": FILES}
+    state = check_node(state)
+    print("Iteration:", state["iteration"])
+    print("Untested files:", sorted(state["untested_files"]))
+    print("Next node:", decide_after_check(state))
+
+    vfs.write("broken.py", "def f():\n    pass\n")
+    vfs.write("tests/test_calc.py", "from calc import add\nfrom pkg import run\n")
+    state = check_node(state)
+    print("After the fix:", state["static_check"], decide_after_check(state))
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["RUN_CHECKPOINTS"] = "0"
+os.environ["METRICS_DIR"] = ""
+os.environ.setdefault("SNAPSHOT_DIR", tempfile.mkdtemp(prefix="blobs_"))
+os.environ["TELEMETRY_PATH"] = os.path.join(tempfile.mkdtemp(), "telemetry.sqlite")
+
+from agents.run_Agent import run_agentic_pipeline
+from agents.telemetry import (
+    TelemetryStore,
+    format_report,
+    get_telemetry_store,
+    window_report,
+)
+from agents.virtual_workspace import release_workspace
+
+
+def synthetic_run(started_at: float, duration_s: float, iterations_to_green) -> dict:
+    return {
+        "run_id": f"run-{started_at}",
+        "pipeline": "graph",
+        "started_at": started_at,
+        "duration_s": duration_s,
+        "status": "done",
+        "outcome": "passed" if iterations_to_green else "failed",
+        "prompt_hash": "0" * 16,
+        "modules": 2,
+        "iterations": iterations_to_green or 3,
+        "iterations_to_green": iterations_to_green,
+        "llm_calls": 3,
+        "llm_s": duration_s / 2,
+        "prompt_tokens": 1200,
+        "completion_tokens": 800,
+        "tests_passed": 4 if iterations_to_green else 2,
+        "tests_failed": 0 if iterations_to_green else 2,
+        "tests_partial": False,
+        "pass_rate": 1.0 if iterations_to_green else 0.5,
+        "node_s": {"plan": 1.0, "code": duration_s - 2.0, "test": 1.0},
+    }
+
+
+if __name__ == "__main__":
+    # A finished graph run is recorded without any setup
+    workspace = tempfile.mkdtemp(prefix="telemetry_")
+    final_state = run_agentic_pipeline(
+        "Divide 100 apples among 10 people.", workspace=workspace
+    )
+    release_workspace(workspace)
+    recorded = get_telemetry_store().runs()
+    print("Recorded:", recorded[-1])
+
+    # Last week vs. the week before: runs got slower and needed more fixes
+    store = TelemetryStore(os.path.join(tempfile.mkdtemp(), "telemetry.sqlite"))
+    now = time.time()
+    week = 7 * 86400
+    for i in range(20):
+        store.record(synthetic_run(now - week - 3600 * (i + 1), 10.0 + i % 3, 1))
+        store.record(
+            synthetic_run(now - 3600 * (i + 1), 14.0 + i % 5, 2 if i % 4 else None)
+        )
+
+    baseline = window_report(store.runs(now - 2 * week, now - week))
+    current = window_report(store.runs(now - week, now))
+    print()
+    print(format_report(current, baseline))
@@ -0,0 +1,27 @@
+import io
+import os
+import sys
+import tempfile
+import zipfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(project_root)
+
+from agents.virtual_workspace import VirtualWorkspace
+
+if __name__ == "__main__":
+    root = tempfile.mkdtemp(prefix="vfs_")
+    workspace = VirtualWorkspace(root)
+    workspace.write("calc.py", "def add(a, b):\n    return a + b\n")
+    workspace.write("tests/test_calc.py", "from calc import add\n")
+    workspace.write("README.md", "# Calc\n")
+
+    # Only files pytest needs are written, and only once
+    print("Materialized:", workspace.materialize())
+    print("Unchanged:", workspace.materialize())
+    print(
+        "Same content changed?", workspace.write("calc.py", workspace.read("calc.py"))
+    )
+
+    archive = zipfile.ZipFile(io.BytesIO(workspace.zip_bytes()))
+    print("Zip contents:", archive.namelist())
@@ -0,0 +1,61 @@
+import threading
+
+# Agents are built on first use: constructing them imports langchain / the
+# OpenAI client and starts the pytest worker pool, which nobody should pay for
+# just by importing the graph or the app.
+_agents = {}
+_lock = threading.Lock()
+
+
+def _build(name: str):
+    if name == "planner":
+        from agents.planner_agent import PlannerAgent
+
+        return PlannerAgent()
+    if name == "coder":
+        from agents.coder_agent import CoderAgent
+
+        return CoderAgent()
+    if name == "tester":
+        from agents.tester_agent import TesterAgent
+
+        return TesterAgent()
+    raise ValueError(f"Unknown agent: {name}")
+
+
+def get_agent(name: str):
+    """Returns the shared planner / coder / tester, constructing it once."""
+    agent = _agents.get(name)
+    if agent is None:
+        with _lock:
+            agent = _agents.get(name)
+            if agent is None:
+                agent = _agents[name] = _build(name)
+    return agent
+
+
+def get_planner():
+    return get_agent("planner")
+
+
+def get_coder():
+    return get_agent("coder")
+
+
+def get_tester():
+    return get_agent("tester")
+
+
+def reset():
+    """Drops the shared agents (e.g. after changing settings); they are rebuilt on use."""
+    with _lock:
+        tester = _agents.pop("tester", None)
+        _agents.clear()
+    if tester is not None and tester.pool is not None:
+        tester.pool.shutdown()
+
+
+def warm_up():
+    """Builds every agent ahead of the first run (e.g. in a background thread)."""
+    for name in ("planner", "coder", "tester"):
+        get_agent(name)
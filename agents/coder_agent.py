@@ -1,14 +1,33 @@
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
+import asyncio
+import copy
 import os
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 os.sys.path.append(project_root)
 
-from llm.llmModels import get_llm
+from llm.llmModels import accepts_temperature, get_llm
+from llm.router import failure_category, route_hint
+from agents.context_builder import build_improve_context
+from agents.incremental_json import ainvoke_json, invoke_json
+from agents.module_scheduler import module_dependencies, plan_waves
+from agents.patching import PatchError, apply_file_patch
+from agents.virtual_workspace import VirtualWorkspace, get_workspace
+
+# Prepended to the feedback when the fix loop stopped making progress
+ESCALATION_NOTE = (
+    "Your previous fix did not change the test outcome. Re-read the failing "
+    "tests and the code, question your earlier assumptions and try a different "
+    "approach.\n\n"
+)
+
+
+def _only(result: dict, filenames: List[str]) -> List[dict]:
+    """The files of a model result that are among filenames."""
+    return [f for f in result.get("files", []) if f.get("filename") in set(filenames)]
 
 
 class CodeFile(BaseModel):
@@ -24,14 +43,76 @@ class CodeBundle(BaseModel):
     )
 
 
+class SearchReplaceEdit(BaseModel):
+    search: str = Field(description="Exact existing code to replace (unique in file)")
+    replace: str = Field(description="Code that replaces the search text")
+
+
+class FilePatch(BaseModel):
+    filename: str = Field(description="Path of the file to change (e.g., utils.py)")
+    edits: List[SearchReplaceEdit] = Field(
+        default_factory=list, description="Search/replace edits applied in order"
+    )
+    diff: Optional[str] = Field(
+        default=None, description="Unified diff for this file (alternative to edits)"
+    )
+    code: Optional[str] = Field(
+        default=None, description="Full file content, only for brand new files"
+    )
+
+
+class PatchBundle(BaseModel):
+    files: List[FilePatch] = Field(description="List of per-file patches")
+
+
 class CoderAgent:
-    def __init__(self, output_dir: str = "workspace"):
+    def __init__(
+        self,
+        output_dir: str = "workspace",
+        parallel: bool = None,
+        max_concurrency: int = None,
+        context_token_budget: int = None,
+        improve_mode: str = None,
+        candidates: int = None,
+    ):
+        # Default workspace; files are kept in memory and materialized on demand
         self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
+
+        # Per-module generation: one request per plan module, run concurrently
+        if parallel is None:
+            parallel = os.getenv("CODER_PARALLEL", "0").lower() in ("1", "true", "yes")
+        self.parallel = parallel
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("CODER_MAX_CONCURRENCY", "4")
+        )
+
+        # Token budget for the improve prompt context (0 = send every file)
+        if context_token_budget is None:
+            context_token_budget = int(os.getenv("CODER_CONTEXT_TOKENS", "12000"))
+        self.context_token_budget = context_token_budget
+        self.last_context_stats = {}
+
+        # "full" regenerates changed files, "patch" asks for edits/diffs per file
+        self.improve_mode = (
+            improve_mode or os.getenv("CODER_IMPROVE_MODE", "full")
+        ).lower()
+
+        # Targeted requests for the files a truncated / malformed response lost
+        self.json_repairs = int(os.getenv("JSON_REPAIR_REQUESTS", "1"))
+        self.last_salvage_stats = None
+
+        # Best-of-N fixing: concurrent candidate fixes, each tested in its own
+        # copy of the workspace (1 = a single fix per iteration)
+        self.candidates = max(1, candidates or int(os.getenv("CODER_CANDIDATES", "1")))
+        temperatures = os.getenv("CODER_CANDIDATE_TEMPERATURES", "0.2,0.5,0.8,1.0")
+        self.candidate_temperatures = [
+            float(t) for t in temperatures.split(",") if t.strip()
+        ]
 
         # Initialize LLM and Parser (kept in __init__ for reuse)
-        self.llm = get_llm(model_name="gpt-5-mini", temperature=0.2)
+        self.llm = get_llm(model_name="gpt-5-mini", temperature=0.2, role="coder")
         self.parser = JsonOutputParser(pydantic_object=CodeBundle)
+        self.patch_parser = JsonOutputParser(pydantic_object=PatchBundle)
 
         # Explicitly instructs the model to output structured JSON
         self.initial_prompt_template = (
@@ -49,6 +130,24 @@ class CoderAgent:
             "{format_instructions}"
         )
 
+        self.module_prompt_template = (
+            "You are a senior Python developer.\n"
+            "You are implementing ONE file of a larger project.\n\n"
+            "Rules:\n"
+            "- Code files go in workspace root.\n"
+            "- Test files go in /tests/.\n"
+            "- Tests import code from workspace root (e.g. `from module import func`).\n"
+            "- Avoid relative imports like `..`; if needed, add:\n"
+            "  import sys, os; sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))\n"
+            "- Only use names from other modules that the plan or the dependency code defines.\n\n"
+            "Full project plan (for context only):\n{modules}\n\n"
+            "Already generated dependencies:\n{dependencies}\n\n"
+            "Write ONLY the file `{filename}` with these tasks:\n{tasks}\n\n"
+            "Output valid JSON only:\n"
+            '{{"files": [{{"filename": "{filename}", "code": "<python code>"}}]}}\n\n'
+            "{format_instructions}"
+        )
+
         self.improve_prompt_template = (
             "You are a senior Python developer reviewing test failures.\n"
             "The following test feedback was received:\n\n"
@@ -56,6 +155,7 @@ class CoderAgent:
             "You have the following project files:\n"
             "{workspace_files}\n\n"
             "Fix bugs, adjust logic, or modify test cases as needed.\n"
+            "Only return files you change; files not returned are kept as they are.\n"
             "Keep the same structure (workspace root + /tests folder).\n"
             "Ensure imports between tests and modules remain valid.\n"
             "Only output JSON in this format:\n"
@@ -63,99 +163,471 @@ class CoderAgent:
             "{format_instructions}"
         )
 
+        self.patch_prompt_template = (
+            "You are a senior Python developer reviewing test failures.\n"
+            "The following test feedback was received:\n\n"
+            "{feedback}\n\n"
+            "You have the following project files:\n"
+            "{workspace_files}\n\n"
+            "Fix bugs, adjust logic, or modify test cases as needed.\n"
+            "Do NOT rewrite whole files. For each file you change, return minimal\n"
+            "search/replace edits: `search` must be copied verbatim from the file\n"
+            "(a few lines, unique within the file) and `replace` is its new text.\n"
+            "A unified diff in `diff` is accepted instead of edits.\n"
+            "Use `code` only for brand new files.\n"
+            "Only output JSON in this format:\n"
+            '{{"files": [{{"filename": "file1.py", "edits": [{{"search": "<old>", "replace": "<new>"}}]}}, ...]}}\n\n'
+            "{format_instructions}"
+        )
+
+    def with_llm_options(self, **options) -> "CoderAgent":
+        """
+        Returns a shallow copy whose model calls use the given options (e.g.
+        temperature, seed); used to vary best-of-N fix candidates. Models that
+        reject a temperature are only varied by the remaining options.
+        """
+        if "temperature" in options and not accepts_temperature(self.llm):
+            options = {k: v for k, v in options.items() if k != "temperature"}
+        clone = copy.copy(self)
+        clone.llm = self.llm.bind(**options)
+        return clone
+
     # Combined function to handle both initial generation and iterative improvement
     def generate_or_improve_code(
-        self, plan: dict, feedback: str = None
+        self,
+        plan: dict,
+        feedback: str = None,
+        on_file: Callable[[str, str], None] = None,
+        workspace: str = None,
+        escalate: bool = False,
     ) -> Dict[str, str]:
         """
         Generates initial code based on the plan, or revises existing code using feedback.
+
+        When on_file(filename, code) is given, the model output is streamed and
+        each file is written to the workspace (and reported) as soon as it is
+        complete, instead of after the whole response arrived.
+
+        workspace overrides the agent's default output_dir, so one agent can
+        serve several isolated pipeline runs. Files go to that directory's
+        in-memory VirtualWorkspace; the tester materializes them for pytest.
+
+        escalate is set by the graph once fixes stopped making progress: the
+        model then sees every file, rewrites whole files and is told that its
+        previous approach did not work.
         """
+        vfs = get_workspace(workspace or self.output_dir)
+        emit = self._file_emitter(vfs, on_file)
+
         try:
-            if feedback:
-                print("🔁 [Coder] Improving code based on test feedback...")
-                # Logic for code improvement (when feedback is present)
-
-                # 1. Collect all Python files in workspace
-                workspace_files = []
-                for root, _, files in os.walk(self.output_dir):
-                    for fname in files:
-                        if fname.endswith(".py"):
-                            # Get relative path for prompt clarity
-                            rel_path = os.path.relpath(
-                                os.path.join(root, fname), self.output_dir
-                            )
-                            with open(
-                                os.path.join(root, fname), "r", encoding="utf-8"
-                            ) as f:
-                                workspace_files.append(
-                                    {"filename": rel_path, "code": f.read()}
-                                )
-
-                if not workspace_files:
-                    raise ValueError(
-                        "No Python files found in workspace for improvement."
-                    )
-
-                # 2. Prepare the model chain for improvement
-                improve_prompt = PromptTemplate(
-                    template=self.improve_prompt_template,
-                    input_variables=["feedback", "workspace_files"],
-                    partial_variables={
-                        "format_instructions": self.parser.get_format_instructions()
-                    },
-                )
-                chain = improve_prompt | self.llm | self.parser
+            kind, args = self._request(plan, feedback, vfs, escalate)
+            # With LLM_ROUTING, trivial failures go to a cheaper model tier
+            with route_hint(failure=failure_category(feedback), escalate=escalate):
+                if kind == "patch":
+                    result = self._improve_with_patches(*args)
+                elif kind == "modules":
+                    result = asyncio.run(self._agenerate_modules(*args, emit))
+                else:
+                    result = self._invoke(*args, emit)
+            self._report_done(kind, feedback)
+            return self._write_files(result, vfs)
 
-                # 3. Invoke the chain
-                result = chain.invoke(
-                    {"feedback": feedback, "workspace_files": str(workspace_files)}
-                )
-                print("✅ Code improvement suggested.")
+        except Exception as e:
+            return self._failure(feedback, e)
+
+    async def agenerate_or_improve_code(
+        self,
+        plan: dict,
+        feedback: str = None,
+        on_file: Callable[[str, str], None] = None,
+        workspace: str = None,
+        escalate: bool = False,
+    ) -> Dict[str, str]:
+        """
+        generate_or_improve_code for the event loop: the same requests, but
+        every model call is awaited (streamed with astream when on_file is
+        given), so no thread waits on the model while it writes.
+        """
+        vfs = get_workspace(workspace or self.output_dir)
+        emit = self._file_emitter(vfs, on_file)
+
+        try:
+            kind, args = self._request(plan, feedback, vfs, escalate)
+            with route_hint(failure=failure_category(feedback), escalate=escalate):
+                if kind == "patch":
+                    result = await self._aimprove_with_patches(*args)
+                elif kind == "modules":
+                    result = await self._agenerate_modules(*args, emit)
+                else:
+                    result = await self._ainvoke(*args, emit)
+            self._report_done(kind, feedback)
+            return self._write_files(result, vfs)
+
+        except Exception as e:
+            return self._failure(feedback, e)
+
+    def _file_emitter(
+        self, vfs: VirtualWorkspace, on_file: Callable[[str, str], None]
+    ) -> Optional[Callable[[dict], None]]:
+        """Writes each streamed file as soon as it is complete and reports it."""
+        if on_file is None:
+            return None
+
+        def emit(f: dict):
+            for filename, code in self._write_files({"files": [f]}, vfs).items():
+                on_file(filename, code)
 
+        return emit
+
+    def _request(
+        self, plan: dict, feedback: str, vfs: VirtualWorkspace, escalate: bool
+    ) -> Tuple[str, tuple]:
+        """
+        What to ask the model for, shared by the sync and async entry points:
+        ("invoke", (prompt, inputs)), ("patch", (workspace_files, feedback,
+        context)) or ("modules", (modules,)).
+        """
+        if feedback:
+            print("🔁 [Coder] Improving code based on test feedback...")
+            # Logic for code improvement (when feedback is present)
+
+            # 1. Collect all Python files in workspace
+            workspace_files = vfs.text_files(".py")
+
+            if not workspace_files:
+                raise ValueError("No Python files found in workspace for improvement.")
+
+            if escalate:
+                print("🪜 [Coder] Escalated fix: full context, whole files")
+                feedback = ESCALATION_NOTE + feedback
+
+            # 2. Keep only the files implicated by the failures
+            prompt_feedback = feedback
+            if self.context_token_budget > 0 and not escalate:
+                prompt_feedback, context, stats = build_improve_context(
+                    workspace_files, feedback, self.context_token_budget
+                )
+                self.last_context_stats = stats
+                print(
+                    f"📉 [Coder] Context packed: {stats['tokens_before']} → "
+                    f"{stats['tokens_after']} tokens "
+                    f"({stats['files_included']}/{stats['files_total']} files)"
+                )
             else:
-                print("\n💻 [Coder] Writing initial code based on plan...")
-                # Logic for initial code generation (when feedback is None)
-
-                modules = plan.get("modules", [])
-                if not modules:
-                    raise ValueError("No modules found in plan")
-
-                # 1. Prepare the model chain for initial generation
-                initial_prompt = PromptTemplate(
-                    template=self.initial_prompt_template,
-                    input_variables=["modules"],
-                    partial_variables={
-                        "format_instructions": self.parser.get_format_instructions()
-                    },
+                context = str(
+                    [{"filename": p, "code": c} for p, c in workspace_files.items()]
                 )
-                chain = initial_prompt | self.llm | self.parser
 
-                # 2. Invoke the chain
-                result = chain.invoke({"modules": str(modules)})
-                print("✅ Initial code generated.")
+            if self.improve_mode == "patch" and not escalate:
+                return "patch", (workspace_files, prompt_feedback, context)
+
+            # 3. Prepare the model chain for improvement
+            improve_prompt = PromptTemplate(
+                template=self.improve_prompt_template,
+                input_variables=["feedback", "workspace_files"],
+                partial_variables={
+                    "format_instructions": self.parser.get_format_instructions()
+                },
+            )
+            return "invoke", (
+                improve_prompt,
+                {"feedback": prompt_feedback, "workspace_files": context},
+            )
+
+        print("\n💻 [Coder] Writing initial code based on plan...")
+        # Logic for initial code generation (when feedback is None)
+
+        modules = plan.get("modules", [])
+        if not modules:
+            raise ValueError("No modules found in plan")
+
+        if self.parallel:
+            return "modules", (modules,)
+
+        # Prepare the model chain for initial generation
+        initial_prompt = PromptTemplate(
+            template=self.initial_prompt_template,
+            input_variables=["modules"],
+            partial_variables={
+                "format_instructions": self.parser.get_format_instructions()
+            },
+        )
+        return "invoke", (initial_prompt, {"modules": str(modules)})
+
+    @staticmethod
+    def _report_done(kind: str, feedback: str):
+        if kind == "modules":
+            return  # reported per wave by _agenerate_modules
+        if feedback:
+            print("✅ Code improvement suggested.")
+        else:
+            print("✅ Initial code generated.")
+
+    @staticmethod
+    def _failure(feedback: str, e: Exception) -> Dict[str, str]:
+        error_msg = "CoderAgent failed to generate/improve code"
+        if feedback:
+            error_msg = "CoderAgent failed to improve code"
+        return {"error": error_msg, "exception": str(e)}
+
+    def _invoke(
+        self, prompt: PromptTemplate, inputs: dict, emit=None, parser=None
+    ) -> dict:
+        """
+        Runs prompt | llm | parser. With emit, tokens are streamed through an
+        incremental parser and every completed file is handed to emit immediately.
+        A truncated or malformed response keeps its complete files and only
+        the missing ones are requested again (up to json_repairs requests).
+        """
+        result, stats = invoke_json(
+            self.llm,
+            prompt,
+            inputs,
+            parser or self.parser,
+            "files",
+            "filename",
+            self.json_repairs,
+            self._entry_emitter(emit),
+        )
+        self._report_salvage(stats)
+        return result
+
+    async def _ainvoke(
+        self, prompt: PromptTemplate, inputs: dict, emit=None, parser=None
+    ) -> dict:
+        """_invoke with the model call awaited."""
+        result, stats = await ainvoke_json(
+            self.llm,
+            prompt,
+            inputs,
+            parser or self.parser,
+            "files",
+            "filename",
+            self.json_repairs,
+            self._entry_emitter(emit),
+        )
+        self._report_salvage(stats)
+        return result
+
+    @staticmethod
+    def _entry_emitter(emit) -> Optional[Callable[[dict], None]]:
+        if emit is None:
+            return None
+
+        def on_entry(f: dict):
+            if f.get("filename") and isinstance(f.get("code"), str):
+                emit(f)
+
+        return on_entry
+
+    def _report_salvage(self, stats):
+        if stats is None:
+            return
+        self.last_salvage_stats = stats
+        print(
+            f"🧩 [Coder] Salvaged {stats.salvaged_items} file(s) "
+            f"({stats.salvaged_bytes} bytes) from a broken response, "
+            f"re-requested {stats.rerequested_bytes} bytes "
+            f"in {stats.repair_requests} request(s)"
+        )
+
+    # -----------------------------
+    # Patch-based improvement
+    # -----------------------------
+    def _improve_with_patches(
+        self, workspace_files: Dict[str, str], feedback: str, context: str
+    ) -> dict:
+        """
+        Asks the model for per-file edits instead of full files and applies them.
+        Files whose patch does not apply cleanly are regenerated in full with a
+        second, narrower request.
+        """
+        result = self._invoke(
+            self._patch_prompt(),
+            {"feedback": feedback, "workspace_files": context},
+            parser=self.patch_parser,
+        )
+        files, failed = self._apply_patches(workspace_files, result)
+        if failed:
+            prompt, inputs = self._regenerate_request(workspace_files, feedback, failed)
+            files.extend(_only(self._invoke(prompt, inputs), failed))
+        return {"files": files}
+
+    async def _aimprove_with_patches(
+        self, workspace_files: Dict[str, str], feedback: str, context: str
+    ) -> dict:
+        """_improve_with_patches with the model calls awaited."""
+        result = await self._ainvoke(
+            self._patch_prompt(),
+            {"feedback": feedback, "workspace_files": context},
+            parser=self.patch_parser,
+        )
+        files, failed = self._apply_patches(workspace_files, result)
+        if failed:
+            prompt, inputs = self._regenerate_request(workspace_files, feedback, failed)
+            files.extend(_only(await self._ainvoke(prompt, inputs), failed))
+        return {"files": files}
+
+    def _patch_prompt(self) -> PromptTemplate:
+        return PromptTemplate(
+            template=self.patch_prompt_template,
+            input_variables=["feedback", "workspace_files"],
+            partial_variables={
+                "format_instructions": self.patch_parser.get_format_instructions()
+            },
+        )
+
+    @staticmethod
+    def _apply_patches(
+        workspace_files: Dict[str, str], result: dict
+    ) -> Tuple[List[dict], List[str]]:
+        """Applies the model's patches; returns the patched files and the rejected names."""
+        files, failed = [], []
+        for entry in result.get("files", []):
+            filename = entry.get("filename", "")
+            if not filename:
+                continue
+            try:
+                code = apply_file_patch(workspace_files.get(filename), entry)
+                files.append({"filename": filename, "code": code})
+            except PatchError as e:
+                print(f"⚠️ [Coder] Patch for {filename} rejected: {e}")
+                failed.append(filename)
 
-            # --- Shared file writing logic ---
-            # 3. Write generated/improved files back to the workspace
-            file_results = {}
-            for f in result.get("files", []):
-                filename = f.get("filename", "")
-                code = f.get("code", "")
+        print(f"🩹 [Coder] Applied {len(files)} patch(es), {len(failed)} rejected.")
+        return files, failed
 
-                if not filename:
+    def _regenerate_request(
+        self, workspace_files: Dict[str, str], feedback: str, filenames: List[str]
+    ) -> Tuple[PromptTemplate, dict]:
+        """
+        Full-file fallback for the given files only.
+        """
+        print(f"🔁 [Coder] Regenerating in full: {', '.join(filenames)}")
+        improve_prompt = PromptTemplate(
+            template=self.improve_prompt_template,
+            input_variables=["feedback", "workspace_files"],
+            partial_variables={
+                "format_instructions": self.parser.get_format_instructions()
+            },
+        )
+        context = "\n".join(
+            f"### {name}\n```python\n{workspace_files.get(name, '')}\n```\n"
+            for name in filenames
+        )
+        return improve_prompt, {
+            "feedback": feedback
+            + "\n\nReturn the complete content of ONLY these files: "
+            + ", ".join(filenames),
+            "workspace_files": context,
+        }
+
+    # -----------------------------
+    # Per-module parallel generation
+    # -----------------------------
+    async def _agenerate_module(
+        self, module: dict, modules: List[dict], generated: Dict[str, str]
+    ) -> List[dict]:
+        """
+        Generates a single plan module, giving the model the code of the
+        modules it depends on that earlier waves already produced.
+        """
+        module_prompt = PromptTemplate(
+            template=self.module_prompt_template,
+            input_variables=["modules", "dependencies", "filename", "tasks"],
+            partial_variables={
+                "format_instructions": self.parser.get_format_instructions()
+            },
+        )
+        chain = module_prompt | self.llm | self.parser
+
+        dependencies = "\n\n".join(
+            f"# --- {name} ---\n{code}" for name, code in generated.items()
+        )
+        result = await chain.ainvoke(
+            {
+                "modules": str(modules),
+                "dependencies": dependencies or "(none)",
+                "filename": module["name"],
+                "tasks": "\n".join(f"- {t}" for t in module.get("tasks", [])),
+            }
+        )
+        return result.get("files", [])
+
+    async def _agenerate_modules(self, modules: List[dict], emit=None) -> dict:
+        """
+        Generates every plan module with its own request. Modules are scheduled in
+        dependency waves; modules inside a wave run concurrently, bounded by
+        max_concurrency. A failed module is reported but does not discard the rest.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        generated: Dict[str, str] = {}
+        files: List[dict] = []
+        failed: List[str] = []
+        deps = module_dependencies(modules)
+
+        async def run_one(module: dict):
+            known = {
+                name: generated[name]
+                for name in deps.get(module["name"], ())
+                if name in generated
+            }
+            async with semaphore:
+                module_files = await self._agenerate_module(module, modules, known)
+            if emit is not None:
+                # Emit each module as soon as it is done, not at the end of the wave
+                for f in module_files:
+                    if f.get("filename"):
+                        emit(f)
+            return module_files
+
+        waves = plan_waves(modules)
+        for i, wave in enumerate(waves, start=1):
+            print(
+                f"⚙️ [Coder] Wave {i}/{len(waves)}: "
+                + ", ".join(m["name"] for m in wave)
+            )
+            results = await asyncio.gather(
+                *(run_one(m) for m in wave), return_exceptions=True
+            )
+            for module, module_files in zip(wave, results):
+                if isinstance(module_files, Exception):
+                    print(f"❌ [Coder] {module['name']} failed: {module_files}")
+                    failed.append(module["name"])
                     continue
+                for f in module_files:
+                    if f.get("filename"):
+                        generated[f["filename"]] = f.get("code", "")
+                        files.append(f)
 
-                # Use the filename (which might include a path like 'tests/...')
-                filepath = os.path.join(self.output_dir, filename)
-                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                with open(filepath, "w", encoding="utf-8") as out:
-                    out.write(code)
+        if not files:
+            raise ValueError(f"All module generations failed: {failed}")
+        if failed:
+            print(f"⚠️ [Coder] {len(failed)} module(s) failed: {', '.join(failed)}")
+        print("✅ Initial code generated.")
+        return {"files": files}
 
-                file_results[filename] = code
+    # -----------------------------
+    # Shared file writing logic
+    # -----------------------------
+    def _write_files(
+        self, result: dict, workspace: VirtualWorkspace = None
+    ) -> Dict[str, str]:
+        """
+        Writes generated/improved files back to the (in-memory) workspace.
+        """
+        if workspace is None:
+            workspace = get_workspace(self.output_dir)
+        file_results = {}
+        for f in result.get("files", []):
+            filename = f.get("filename", "")
+            code = f.get("code", "")
 
-            return file_results
+            if not filename:
+                continue
 
-        except Exception as e:
-            error_msg = "CoderAgent failed to generate/improve code"
-            if feedback:
-                error_msg = "CoderAgent failed to improve code"
-            return {"error": error_msg, "exception": str(e)}
+            # The filename might include a path like 'tests/...'
+            workspace.write(filename, code)
+            file_results[filename] = code
+
+        return file_results
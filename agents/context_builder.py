@@ -0,0 +1,145 @@
+import re
+from typing import Dict, List, Set, Tuple
+
+from agents.import_graph import build_import_graph, dependency_closure
+
+_encoding = None
+_encoding_loaded = False
+
+
+FAILED_TEST_RE = re.compile(r"^(?:FAILED|ERROR)\s+([^\s:]+\.py)", re.MULTILINE)
+PYTEST_FRAME_RE = re.compile(r"^\s*([^\s:]+\.py):\d+:", re.MULTILINE)
+PYTHON_FRAME_RE = re.compile(r'File "([^"]+\.py)", line \d+')
+
+
+def _get_encoding():
+    # Loaded lazily: tiktoken may need to download the encoding on first use
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # tiktoken missing or encoding not downloadable
+            _encoding = None
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """Counts prompt tokens with tiktoken when available, else ~4 chars per token."""
+    if _get_encoding() is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+def _match_workspace_path(path: str, files: Dict[str, str]) -> str:
+    """
+    Maps a path printed by pytest (relative to where pytest ran, or absolute)
+    to a workspace-relative path, by longest matching suffix.
+    """
+    path = path.replace("\\", "/")
+    best = ""
+    for candidate in files:
+        if (path == candidate or path.endswith("/" + candidate)) and len(
+            candidate
+        ) > len(best):
+            best = candidate
+    return best
+
+
+def implicated_files(test_output: str, files: Dict[str, str]) -> List[str]:
+    """
+    Returns workspace files named by failing/erroring tests or traceback frames,
+    in order of first appearance.
+    """
+    found: List[str] = []
+    for regex in (FAILED_TEST_RE, PYTEST_FRAME_RE, PYTHON_FRAME_RE):
+        for match in regex.finditer(test_output):
+            path = _match_workspace_path(match.group(1), files)
+            if path and path not in found:
+                found.append(path)
+    return found
+
+
+def trim_output(text: str, token_budget: int) -> str:
+    """Keeps the head and the tail (failure summary) of long test output."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    lines = text.splitlines()
+    head, tail = lines[:40], lines[40:]
+    kept_tail: List[str] = []
+    used = estimate_tokens("\n".join(head))
+    for line in reversed(tail):
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        kept_tail.insert(0, line)
+        used += cost
+
+    skipped = len(tail) - len(kept_tail)
+    return "\n".join(head + [f"... [{skipped} lines trimmed] ..."] + kept_tail)
+
+
+def _render_file(path: str, code: str) -> str:
+    return f"### {path}\n```python\n{code}\n```\n"
+
+
+def build_improve_context(
+    files: Dict[str, str], feedback: str, token_budget: int = 12000
+) -> Tuple[str, str, dict]:
+    """
+    Packs the failure-relevant part of the workspace for the improve prompt.
+
+    Files implicated by failing tests and traceback frames come first, followed
+    by the workspace modules they import (closest first), until token_budget is
+    used up. The test feedback itself is trimmed to at most a third of the budget.
+
+    Returns (trimmed_feedback, packed_files, stats) where stats compares the
+    packed prompt size with the naive "every file + full output" one.
+    """
+    naive_files = str([{"filename": p, "code": c} for p, c in files.items()])
+    tokens_before = estimate_tokens(feedback) + estimate_tokens(naive_files)
+
+    trimmed_feedback = trim_output(feedback, token_budget // 3)
+    remaining = token_budget - estimate_tokens(trimmed_feedback)
+
+    implicated = implicated_files(feedback, files)
+    if implicated:
+        graph = build_import_graph(files)
+        distances = dependency_closure(graph, implicated)
+        order = implicated + sorted(
+            (p for p in distances if p not in implicated),
+            key=lambda p: (distances[p], p),
+        )
+    else:
+        # Nothing to anchor on (e.g. collection crashed): smallest files first
+        order = sorted(files, key=lambda p: len(files[p]))
+
+    packed: List[str] = []
+    omitted: Set[str] = set(files)
+    for path in order:
+        chunk = _render_file(path, files[path])
+        cost = estimate_tokens(chunk)
+        if cost > remaining:
+            continue
+        packed.append(chunk)
+        omitted.discard(path)
+        remaining -= cost
+
+    if omitted:
+        packed.append(
+            "Other files (unchanged, not shown): " + ", ".join(sorted(omitted)) + "\n"
+        )
+
+    packed_files = "\n".join(packed)
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": estimate_tokens(trimmed_feedback)
+        + estimate_tokens(packed_files),
+        "files_total": len(files),
+        "files_included": len(files) - len(omitted),
+        "implicated": implicated,
+    }
+    return trimmed_feedback, packed_files, stats
@@ -0,0 +1,185 @@
+import contextvars
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from agents.pytest_results import RunResult
+from agents.virtual_workspace import fork_workspace, get_workspace, release_workspace
+
+
+@dataclass
+class Candidate:
+    index: int
+    root: str
+    options: dict
+    code_output: Dict[str, str]
+    result: Optional[RunResult]
+
+    @property
+    def score(self) -> tuple:
+        """
+        Lower is better: passing, then failures of the full suite ahead of those
+        of the affected subset (whose counts leave the other tests out), then
+        fewest failures, then most passes.
+        """
+        if "error" in self.code_output or self.result is None:
+            return (2, 0, 0, 0, 0, self.index)
+        if self.result.ok and not self.result.partial:
+            return (0, 0, 0, 0, 0, self.index)
+        return (
+            1,
+            int(self.result.partial),
+            int(self.result.timed_out),
+            self.result.failed + self.result.errors,
+            -self.result.passed,
+            self.index,
+        )
+
+
+def candidate_options(n: int, temperatures: List[float]) -> List[dict]:
+    """
+    Model options of each candidate: cycled temperatures and distinct seeds
+    (CoderAgent.with_llm_options drops the temperature for models without one).
+    """
+    temperatures = temperatures or [0.2]
+    return [
+        {"temperature": temperatures[i % len(temperatures)], "seed": i}
+        for i in range(n)
+    ]
+
+
+def _discard(tester, candidate: Optional[Candidate]):
+    if candidate is None:
+        return
+    release_workspace(candidate.root)
+    tester.reset(candidate.root)
+    shutil.rmtree(candidate.root, ignore_errors=True)
+
+
+def _run_candidate(
+    coder,
+    tester,
+    plan: dict,
+    feedback: str,
+    workspace: str,
+    index: int,
+    options: dict,
+    cancel: threading.Event,
+    escalate: bool = False,
+) -> Optional[Candidate]:
+    """Generates one fix in a private copy of the workspace and tests it."""
+    root = tempfile.mkdtemp(prefix=f"candidate{index}_")
+    fork_workspace(workspace, root)
+    tester.fork_history(workspace, root)
+    candidate = Candidate(index, root, options, {}, None)
+
+    if not cancel.is_set():
+        candidate.code_output = coder.with_llm_options(
+            **options
+        ).generate_or_improve_code(plan, feedback, workspace=root, escalate=escalate)
+    if "error" not in candidate.code_output and not cancel.is_set():
+        changed = {k: v for k, v in candidate.code_output.items() if k.endswith(".py")}
+        candidate.result = tester.run_tests(
+            changed_files=changed, workspace=root, cancel=cancel
+        )
+
+    if cancel.is_set():
+        # Another candidate already won
+        _discard(tester, candidate)
+        return None
+    return candidate
+
+
+def best_of_n_fix(
+    coder,
+    tester,
+    plan: dict,
+    feedback: str,
+    workspace: str,
+    n: int,
+    escalate: bool = False,
+) -> Tuple[Dict[str, str], Optional[RunResult]]:
+    """
+    Requests n candidate fixes concurrently, each applied to its own copy of
+    the workspace and tested in parallel. The first fully-passing candidate
+    wins and the others are cancelled; if none passes, the one with the fewest
+    failures wins once all are done.
+
+    The winner's files are written to the workspace. Returns its code output
+    and test result (None when no candidate produced code).
+    """
+    cancel = threading.Event()
+    options = candidate_options(n, coder.candidate_temperatures)
+    print(f"🎲 [Coder] Requesting {n} candidate fixes in parallel...")
+
+    executor = ThreadPoolExecutor(max_workers=n, thread_name_prefix="fix-candidate")
+    futures = [
+        # Each candidate runs in a copy of the caller's context so the run's
+        # callbacks (metrics) still see its model calls
+        executor.submit(
+            contextvars.copy_context().run,
+            _run_candidate,
+            coder,
+            tester,
+            plan,
+            feedback,
+            workspace,
+            i,
+            options[i],
+            cancel,
+            escalate,
+        )
+        for i in range(n)
+    ]
+
+    best: Optional[Candidate] = None
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    candidate = future.result()
+                except Exception as e:
+                    print(f"❌ [Coder] Fix candidate failed: {e}")
+                    continue
+                if candidate is None:
+                    continue
+                if best is None or candidate.score < best.score:
+                    best, candidate = candidate, best
+                _discard(tester, candidate)
+            if best is not None and best.score[0] == 0:
+                break
+    finally:
+        cancel.set()
+
+        def cleanup(future: Future):
+            if not future.cancelled() and future.exception() is None:
+                _discard(tester, future.result())
+
+        for future in pending:
+            future.add_done_callback(cleanup)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if best is None:
+        return {"error": "CoderAgent failed to improve code"}, None
+    if "error" in best.code_output:
+        _discard(tester, best)
+        return best.code_output, None
+
+    summary = best.result.summary_line() if best.result else "not tested"
+    print(
+        f"🏆 [Coder] Candidate {best.index + 1}/{n} wins "
+        f"(temperature {best.options['temperature']}): {summary}"
+        + (f", {len(pending)} cancelled" if pending else "")
+    )
+    vfs = get_workspace(workspace)
+    for filename, code in best.code_output.items():
+        vfs.write(filename, code)
+    tester.fork_history(best.root, workspace)
+    _discard(tester, best)
+    return best.code_output, best.result
@@ -1,8 +1,22 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict
-from agents.planner_agent import PlannerAgent
-from agents.coder_agent import CoderAgent
-from agents.tester_agent import TesterAgent
+import os
+from typing import List, TypedDict
+
+# Agents are built on first use (agents.agent_factory) and shared by all runs;
+# each run's files live in state["workspace"]
+from agents.agent_factory import get_coder, get_planner, get_tester
+from agents.progress import (
+    STALL_MESSAGES,
+    assess_progress,
+    failure_signature,
+    workspace_fingerprint,
+)
+from agents.snapshots import get_blob_store, snapshot_score
+from agents.static_check import check_workspace, format_diagnostics
+from agents.virtual_workspace import get_workspace
+
+# Same value as langgraph.graph.END, kept here so importing this module does
+# not pull in langgraph before a graph is actually built
+END = "__end__"
 
 
 # -----------------------------
@@ -10,26 +24,50 @@ from agents.tester_agent import TesterAgent
 # -----------------------------
 class GraphState(TypedDict):
     user_prompt: str
+    workspace: str
+    run_id: str
     iteration: int
     plan: dict
     code_output: dict
     test_output: dict
     feedback: str
     error: str
+    # Test result of the winning best-of-N fix candidate, reused by test_node
+    candidate_test: dict
+    # Per-iteration workspace fingerprint and failing tests, to detect stalls
+    progress: List[dict]
+    escalations: int
+    # Why the loop ended: passed, max_iterations, no_change, same_failures, oscillation
+    stop_reason: str
+    # Diagnostics of the static pre-check ([] when it passed)
+    static_check: List[str]
+    # Files written by fixes that failed the pre-check, so never tested yet
+    untested_files: dict
+    # Content-addressed workspace after every code step, with its test score
+    snapshots: List[dict]
+    # Iteration whose code the run ships (earlier than the last after a rollback)
+    shipped_iteration: int
 
 
-# -----------------------------
-# Initialize Agents
-# -----------------------------
-planner = PlannerAgent()
-coder = CoderAgent()
-tester = TesterAgent()
+MAX_ITERATIONS = 3
 
 
 # -----------------------------
 # Planner Node
 # -----------------------------
 def plan_node(state: GraphState) -> GraphState:
+    planner = get_planner()
+    args, kwargs = _plan_request(state)
+    return _apply_plan(state, planner.plan_project(*args, **kwargs))
+
+
+async def aplan_node(state: GraphState) -> GraphState:
+    planner = get_planner()
+    args, kwargs = _plan_request(state)
+    return _apply_plan(state, await planner.aplan_project(*args, **kwargs))
+
+
+def _plan_request(state: GraphState):
     prompt = state.get("user_prompt")
     feedback = state.get("feedback")
     current_plan = state.get("plan")
@@ -40,11 +78,12 @@ def plan_node(state: GraphState) -> GraphState:
     if feedback and current_plan:
         print("\n🔄 [Planner] Revising plan based on feedback...")
         # Assume planner.plan_project can handle revision logic if a plan is provided
-        plan = planner.plan_project(prompt, plan=current_plan, feedback=feedback)
-    else:
-        print("\n📋 [Planner] Generating initial plan...")
-        plan = planner.plan_project(prompt)
+        return (prompt,), {"plan": current_plan, "feedback": feedback}
+    print("\n📋 [Planner] Generating initial plan...")
+    return (prompt,), {}
+
 
+def _apply_plan(state: GraphState, plan: dict) -> GraphState:
     if not plan or "modules" not in plan:
         print("❌ [Planner] Failed to generate a valid plan.")
         state["error"] = "Invalid plan"
@@ -65,8 +104,143 @@ def code_node(state: GraphState) -> GraphState:
     if not plan:
         raise ValueError("Missing plan in state")
 
+    on_file = _file_reporter()
+    coder = get_coder()
+    if feedback and coder.candidates > 1:
+        from agents.fix_candidates import best_of_n_fix
+
+        # Speculative fixing: the winner was already tested in its own copy
+        code_output, result = best_of_n_fix(*_candidates_args(state, coder))
+        return _apply_candidate(state, code_output, result, on_file)
+
     # CRITICAL FIX: Use the new single function name
-    state["code_output"] = coder.generate_or_improve_code(plan, feedback)
+    state["code_output"] = coder.generate_or_improve_code(
+        plan,
+        feedback,
+        on_file=on_file,
+        workspace=state.get("workspace"),
+        escalate=state.get("escalations", 0) > 0,
+    )
+    _snapshot(state)
+    return state
+
+
+async def acode_node(state: GraphState) -> GraphState:
+    plan = state.get("plan")
+    feedback = state.get("feedback")
+
+    if not plan:
+        raise ValueError("Missing plan in state")
+
+    on_file = _file_reporter()
+    coder = get_coder()
+    if feedback and coder.candidates > 1:
+        import asyncio
+
+        from agents.fix_candidates import best_of_n_fix
+
+        # Candidates race in their own threads (cancelled via threading.Event)
+        code_output, result = await asyncio.to_thread(
+            best_of_n_fix, *_candidates_args(state, coder)
+        )
+        return _apply_candidate(state, code_output, result, on_file)
+
+    state["code_output"] = await coder.agenerate_or_improve_code(
+        plan,
+        feedback,
+        on_file=on_file,
+        workspace=state.get("workspace"),
+        escalate=state.get("escalations", 0) > 0,
+    )
+    _snapshot(state)
+    return state
+
+
+def _file_reporter():
+    from langgraph.config import get_stream_writer
+
+    # Report each file as soon as it is written (a no-op unless the graph is
+    # run with stream_mode="custom")
+    writer = get_stream_writer()
+
+    def on_file(filename: str, code: str):
+        writer({"event": "file", "filename": filename, "bytes": len(code)})
+
+    return on_file
+
+
+def _candidates_args(state: GraphState, coder) -> tuple:
+    return (
+        coder,
+        get_tester(),
+        state.get("plan"),
+        state.get("feedback"),
+        state.get("workspace"),
+        coder.candidates,
+        state.get("escalations", 0) > 0,
+    )
+
+
+def _apply_candidate(state: GraphState, code_output: dict, result, on_file):
+    if "error" not in code_output:
+        for filename, code in code_output.items():
+            on_file(filename, code)
+    state["code_output"] = code_output
+    state["candidate_test"] = result.model_dump() if result else {}
+    _snapshot(state)
+    return state
+
+
+def _snapshot(state: GraphState):
+    """Records the workspace the next check / test will score."""
+    store = get_blob_store()
+    if store is None:
+        return
+    state["snapshots"] = list(state.get("snapshots") or []) + [
+        {
+            "iteration": state.get("iteration", 0) + 1,
+            "files": store.snapshot(state.get("workspace")),
+            "score": None,
+            "tests": None,
+        }
+    ]
+
+
+# -----------------------------
+# Static Check Node
+# -----------------------------
+def check_node(state: GraphState) -> GraphState:
+    """
+    Parses, compiles and resolves the imports of the workspace in-process, so
+    syntax errors and broken imports go back to the coder without a pytest run.
+    """
+    workspace = state.get("workspace")
+    state["static_check"] = []
+    if state.get("iteration", 0) == 0:
+        # A new run; test_node may only see it after a failed pre-check
+        get_tester().reset(workspace)
+    # The winning fix candidate was already tested as a whole
+    if state.get("candidate_test") or os.getenv("STATIC_CHECK", "1") == "0":
+        return state
+
+    diagnostics = check_workspace(get_workspace(workspace).text_files(".py"))
+    if not diagnostics:
+        print("\n✅ [Check] Files compile and imports resolve.")
+        return state
+
+    feedback = format_diagnostics(diagnostics)
+    code_output = state.get("code_output") or {}
+    state["untested_files"] = {
+        **(state.get("untested_files") or {}),
+        **{k: v for k, v in code_output.items() if k.endswith(".py")},
+    }
+    state["static_check"] = [str(d) for d in diagnostics]
+    state["iteration"] = state.get("iteration", 0) + 1
+    state["test_output"] = {}
+    state["feedback"] = feedback
+    print("\n🔍 [Check Feedback]:", feedback)
+    _record_progress(state, sorted(state["static_check"]))
+    _score_snapshot(state, {"static_check": len(diagnostics)})
     return state
 
 
@@ -76,34 +250,160 @@ def code_node(state: GraphState) -> GraphState:
 def test_node(state: GraphState) -> GraphState:
     print("\n🧪 [Tester] Running tests...")
     # NOTE: The test execution here is simple; in a real scenario, the code_output would be executed.
-    output = tester.run_tests()  # Pass code to tester
-    feedback = tester.analyze_results(output)
+    tester = get_tester()
+    workspace = state.get("workspace")
+    if state.get("iteration", 0) == 0:
+        tester.reset(workspace)
+
+    result = _candidate_result(state)
+    if result is None:
+        result = tester.run_tests(
+            changed_files=_changed_files(state), workspace=workspace
+        )
+    return _apply_test_result(state, tester, result)
+
+
+async def atest_node(state: GraphState) -> GraphState:
+    print("\n🧪 [Tester] Running tests...")
+    tester = get_tester()
+    workspace = state.get("workspace")
+    if state.get("iteration", 0) == 0:
+        tester.reset(workspace)
+
+    result = _candidate_result(state)
+    if result is None:
+        result = await tester.arun_tests(
+            changed_files=_changed_files(state), workspace=workspace
+        )
+    return _apply_test_result(state, tester, result)
+
+
+def _candidate_result(state: GraphState):
+    """The winning fix candidate's test result, if code_node produced one."""
+    if not state.get("candidate_test"):
+        return None
+    from agents.pytest_results import RunResult
+
+    # The winning fix candidate was tested on exactly these files
+    print("🎲 [Tester] Using the test result of the winning fix candidate")
+    result = RunResult.model_validate(state["candidate_test"])
+    state["candidate_test"] = {}
+    return result
+
+
+def _changed_files(state: GraphState) -> dict:
+    # Only the tests affected by the files the coder just wrote run first
+    code_output = state.get("code_output") or {}
+    changed_files = {k: v for k, v in code_output.items() if k.endswith(".py")}
+    # ...plus the files of fixes the pre-check sent back
+    changed_files = {**(state.get("untested_files") or {}), **changed_files}
+    state["untested_files"] = {}
+    return changed_files
+
+
+def _apply_test_result(state: GraphState, tester, result) -> GraphState:
+    feedback = tester.analyze_results(result)
     # Increment iteration *inside a node that returns state for it to persist*
     state["iteration"] = state.get("iteration", 0) + 1
-    state["test_output"] = output
+    state["test_output"] = result.model_dump()
     state["feedback"] = feedback
     print("🔍 [Tester Feedback]:", feedback)
+
+    _record_progress(state, failure_signature(state["test_output"]))
+    test_output = state["test_output"]
+    tests = {
+        k: test_output.get(k, 0) for k in ("passed", "failed", "errors", "skipped")
+    }
+    _score_snapshot(state, {**tests, "partial": result.partial}, partial=result.partial)
     return state
 
 
+def _score_snapshot(state: GraphState, tests: dict, partial: bool = False):
+    snapshots = list(state.get("snapshots") or [])
+    if not snapshots or snapshots[-1]["score"] is not None:
+        return
+    # A failed affected-tests subset is not comparable to full-suite counts,
+    # so it is never picked over a scored iteration
+    score = None
+    if not partial:
+        score = snapshot_score(state["test_output"], state.get("static_check"))
+    snapshots[-1] = {**snapshots[-1], "score": score, "tests": tests}
+    state["snapshots"] = snapshots
+
+
+def _record_progress(state: GraphState, failures: List[str]):
+    """Fingerprints this iteration so the loop can stop when fixes stop helping."""
+    _, hashes = get_workspace(state.get("workspace")).snapshot()
+    state["progress"] = list(state.get("progress") or []) + [
+        {
+            "iteration": state["iteration"],
+            "workspace": workspace_fingerprint(hashes),
+            "failures": failures,
+        }
+    ]
+    state["stop_reason"] = _stop_reason(state)
+
+
+def _tests_passed(test_output: dict) -> bool:
+    """Something ran and nothing failed."""
+    return (
+        test_output.get("passed", 0) > 0
+        and test_output.get("failed", 0) == 0
+        and test_output.get("errors", 0) == 0
+        and not test_output.get("timed_out")
+    )
+
+
+def _stop_reason(state: GraphState) -> str:
+    """
+    Why the loop should end after this iteration ("" to continue). The first
+    FIX_LOOP_ESCALATIONS stalls escalate the next fix instead of stopping.
+    """
+    if _tests_passed(state.get("test_output") or {}):
+        return "passed"
+
+    stall = assess_progress(state["progress"])
+    if stall:
+        escalations = state.get("escalations", 0)
+        if escalations < int(os.getenv("FIX_LOOP_ESCALATIONS", "1")):
+            state["escalations"] = escalations + 1
+            print(
+                f"🪜 [Graph] No progress ({STALL_MESSAGES[stall]}); "
+                "escalating the next fix."
+            )
+        else:
+            return stall
+
+    if state["iteration"] >= MAX_ITERATIONS:
+        return "max_iterations"
+    return ""
+
+
 # -----------------------------
 # Decide Next Node (Loop Logic)
 # -----------------------------
 def decide_next(state: GraphState) -> str:
-    max_iterations = 3
-    feedback_lower = state.get("feedback", "").lower()
+    max_iterations = MAX_ITERATIONS
+    test_output = state.get("test_output") or {}
 
     # 1. Check for max retries first, as this is a hard stop limit.
     if state["iteration"] >= max_iterations:
         print(f"⚠️ [Graph] Max retries ({max_iterations}) reached. Ending pipeline.")
         return END
 
-    # 2. Check for the explicit success marker (e.g., '✅ All tests passed!').
-    # This avoids false positives from summaries like '1 failed, 9 passed'.
-    if "✅" in feedback_lower:
+    # 2. Route on the structured counts: something ran and nothing failed.
+    if _tests_passed(test_output):
         print("\n✅ [Graph] Tests passed. Ending pipeline.")
         return END
 
+    # 3. Another fix would not help: identical files, same failures, or a loop
+    stop_reason = state.get("stop_reason")
+    if stop_reason in STALL_MESSAGES:
+        print(
+            f"\n🛑 [Graph] No progress: {STALL_MESSAGES[stop_reason]}. Ending pipeline."
+        )
+        return END
+
     # CRITICAL FIX: The print statement now correctly reflects the loop skipping the planner.
     # Note: We are keeping the flow to 'code' as you requested for a quick bugfix loop.
     print(
@@ -112,24 +412,60 @@ def decide_next(state: GraphState) -> str:
     return "code"
 
 
+def decide_after_check(state: GraphState) -> str:
+    """Clean workspaces go on to pytest; failed pre-checks loop like failed tests."""
+    if not state.get("static_check"):
+        return "test"
+    return decide_next(state)
+
+
+def next_node(node: str, state: GraphState) -> str:
+    """The node that runs after `node` completed with `state` (used to resume)."""
+    if node == "plan":
+        return "code"
+    if node == "code":
+        return "check"
+    if node == "check":
+        return decide_after_check(state)
+    return decide_next(state)
+
+
 # -----------------------------
 # Graph Construction
 # -----------------------------
-def create_graph(initial_state: GraphState) -> StateGraph:
+def create_graph(
+    initial_state: GraphState, entry_point: str = "plan", use_async: bool = False
+):
+    """
+    Builds the plan → code → check → test graph. With use_async the model
+    calls and pytest runs of its nodes are awaited, so the compiled graph
+    must be driven with astream / ainvoke on an event loop.
+    """
+    from langgraph.graph import StateGraph
+
     # StateGraph needs to be initialized with the state class, not an instance
     graph = StateGraph(GraphState)
 
-    # Add nodes
-    graph.add_node("plan", plan_node)
-    graph.add_node("code", code_node)
-    graph.add_node("test", test_node)
+    # Add nodes (the static pre-check is in-process and quick, so it has no
+    # async variant)
+    graph.add_node("plan", aplan_node if use_async else plan_node)
+    graph.add_node("code", acode_node if use_async else code_node)
+    graph.add_node("check", check_node)
+    graph.add_node("test", atest_node if use_async else test_node)
 
-    # Define flow
-    graph.set_entry_point("plan")
+    # Define flow (a resumed run enters at the node after its last checkpoint)
+    graph.set_entry_point(entry_point)
 
     # Initial flow
     graph.add_edge("plan", "code")
-    graph.add_edge("code", "test")
+    graph.add_edge("code", "check")
+
+    # A failed static pre-check skips pytest and goes straight back to code
+    graph.add_conditional_edges(
+        "check",
+        decide_after_check,
+        {"test": "test", "code": "code", END: END},
+    )
 
     # Conditional looping edge: 'test' decides if we loop back to 'plan' or END
     graph.add_conditional_edges(
@@ -0,0 +1,102 @@
+import ast
+import os
+from collections import deque
+from typing import Dict, Iterable, Set
+
+
+def module_name(rel_path: str) -> str:
+    """'tests/test_utils.py' -> 'tests.test_utils', 'pkg/__init__.py' -> 'pkg'"""
+    parts = os.path.splitext(rel_path.replace("\\", "/"))[0].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+def imported_modules(source: str) -> Set[str]:
+    """
+    Returns the absolute module names a source file imports. For
+    `from pkg import name` both 'pkg' and 'pkg.name' are returned, since
+    name may be a submodule. Unparsable sources import nothing.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return set()
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return names
+
+
+def resolve_import(name: str, importer: str, files: Iterable[str]) -> Set[str]:
+    """
+    Maps an imported module name to workspace files. Candidates are looked up
+    relative to the workspace root (how generated tests import code) and to the
+    importing file's directory (pytest's rootdir-based sys.path insertion).
+    """
+    known = set(files)
+    base = name.replace(".", "/")
+    importer_dir = os.path.dirname(importer.replace("\\", "/"))
+
+    resolved = set()
+    for prefix in ("", importer_dir):
+        stem = f"{prefix}/{base}" if prefix else base
+        for candidate in (f"{stem}.py", f"{stem}/__init__.py"):
+            if candidate in known and candidate != importer:
+                resolved.add(candidate)
+    return resolved
+
+
+def build_import_graph(files: Dict[str, str]) -> Dict[str, Set[str]]:
+    """
+    Builds {file: {workspace files it imports}} for a mapping of
+    workspace-relative paths to source code.
+    """
+    paths = [p.replace("\\", "/") for p in files]
+    graph = {}
+    for path, source in zip(paths, files.values()):
+        deps = set()
+        for name in imported_modules(source):
+            deps |= resolve_import(name, path, paths)
+        graph[path] = deps
+    return graph
+
+
+def dependency_closure(
+    graph: Dict[str, Set[str]], starts: Iterable[str]
+) -> Dict[str, int]:
+    """
+    Returns every file reachable from starts via imports, mapped to its
+    distance (0 for the start files themselves).
+    """
+    distances = {s: 0 for s in starts if s in graph}
+    queue = deque(distances)
+    while queue:
+        current = queue.popleft()
+        for dep in graph.get(current, ()):
+            if dep not in distances:
+                distances[dep] = distances[current] + 1
+                queue.append(dep)
+    return distances
+
+
+def reverse_dependents(graph: Dict[str, Set[str]], targets: Iterable[str]) -> Set[str]:
+    """Returns targets plus every file that transitively imports one of them."""
+    reverse: Dict[str, Set[str]] = {}
+    for path, deps in graph.items():
+        for dep in deps:
+            reverse.setdefault(dep, set()).add(path)
+
+    found = set(targets)
+    queue = deque(found)
+    while queue:
+        for importer in reverse.get(queue.popleft(), ()):
+            if importer not in found:
+                found.add(importer)
+                queue.append(importer)
+    return found
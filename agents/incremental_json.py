@@ -0,0 +1,400 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generator, List, Optional, Tuple
+
+from langchain_core.callbacks.manager import (
+    adispatch_custom_event,
+    dispatch_custom_event,
+)
+from langchain_core.exceptions import OutputParserException
+
+# Characters a string-closing quote needs to see before it can decide whether
+# it really closes the string (see _closes_string)
+LOOKAHEAD = 128
+NEXT_KEY_RE = re.compile(r'\s*,\s*"[^"\n]{0,100}"\s*:')
+NEXT_VALUE_RE = re.compile(r'\s*,\s*["{\[\-0-9tfn]')
+
+
+class IncrementalFilesParser:
+    """
+    Incrementally parses a streamed `{"files": [{"filename": ..., "code": ...}, ...]}`
+    response and hands back each file object as soon as it is complete, long
+    before the whole JSON document has arrived.
+
+    Text before the first `{` (e.g. a ```json fence) is ignored. Only objects that
+    are direct elements of a top-level array are emitted.
+
+    Models get JSON wrong in a few typical ways, which are tolerated: raw
+    newlines / tabs inside strings, and unescaped quotes inside a string
+    (a quote only closes a string when what follows is valid JSON structure).
+    A truncated response keeps every object completed before the cut; see
+    `items`, `complete_until` and `document()`.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.items: List[dict] = []
+        # End offset of the last complete top-level array element
+        self.complete_until = 0
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._string_role = ""
+        # Last character outside strings that was not whitespace
+        self._last_token = ""
+        self._escaped = False
+        self._item_start = None
+        self._doc_start = None
+        self._doc_end = None
+        self._closed = False
+        # Offsets of quotes that are part of a string's content
+        self._literal_quotes: List[int] = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consumes the next chunk of text; returns the objects it completed."""
+        self.buffer += chunk
+        completed = []
+
+        while self._pos < len(self.buffer) and self._doc_end is None:
+            ch = self.buffer[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    closes = self._closes_string(self._pos)
+                    if closes is None:
+                        break  # wait for more text to decide
+                    if closes:
+                        self._in_string = False
+                    else:
+                        self._literal_quotes.append(self._pos)
+            elif not self._stack and ch != "{":
+                pass  # preamble before the document starts
+            elif ch == '"':
+                self._in_string = True
+                self._string_role = self._role_of_string()
+            elif ch in "{[":
+                if not self._stack:
+                    self._doc_start = self._pos
+                if ch == "{" and self._stack == ["{", "["]:
+                    self._item_start = self._pos
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if (
+                    ch == "}"
+                    and self._stack == ["{", "["]
+                    and self._item_start is not None
+                ):
+                    item = self._decode(self._item_start, self._pos + 1)
+                    if isinstance(item, dict):
+                        completed.append(item)
+                        self.items.append(item)
+                        self.complete_until = self._pos + 1
+                    self._item_start = None
+                if not self._stack:
+                    self._doc_end = self._pos + 1
+
+            if not self._in_string and not ch.isspace():
+                self._last_token = ch
+            self._pos += 1
+
+        return completed
+
+    def close(self) -> List[dict]:
+        """Marks the end of the stream; returns the objects it completed."""
+        self._closed = True
+        return self.feed("")
+
+    @property
+    def complete(self) -> bool:
+        """Whether the whole top-level document arrived."""
+        return self._doc_end is not None
+
+    def document(self):
+        """The whole document decoded with the tolerated mistakes fixed, or None."""
+        if self._doc_end is None:
+            return None
+        return self._decode(self._doc_start, self._doc_end)
+
+    @property
+    def tail(self) -> str:
+        """Text after the last complete element: what a truncation lost."""
+        return self.buffer[self.complete_until :].lstrip(", \n\r\t")
+
+    def _role_of_string(self) -> str:
+        """'key', 'value' (in an object) or 'element' (of an array)."""
+        if self._stack[-1] == "[":
+            return "element"
+        return "value" if self._last_token == ":" else "key"
+
+    def _closes_string(self, pos: int) -> Optional[bool]:
+        """
+        Whether the quote at pos ends the current string: the text after it
+        has to continue the JSON structure. None when more text is needed.
+        """
+        rest = self.buffer[pos + 1 : pos + 1 + LOOKAHEAD]
+        if len(rest) < LOOKAHEAD and not self._closed:
+            return None
+        stripped = rest.lstrip()
+        if not stripped:
+            return True  # end of the response
+        if self._string_role == "key":
+            return stripped[0] == ":"
+
+        closer = "]" if self._string_role == "element" else "}"
+        if stripped[0] == closer:
+            after = stripped[1:].lstrip()
+            return not after or after[0] in ",]}`"
+        pattern = NEXT_VALUE_RE if self._string_role == "element" else NEXT_KEY_RE
+        return pattern.match(rest) is not None
+
+    def _decode(self, start: int, end: int):
+        text = self.buffer[start:end]
+        quotes = [q for q in self._literal_quotes if start <= q < end]
+        for q in reversed(quotes):
+            offset = q - start
+            text = text[:offset] + "\\" + text[offset:]
+        try:
+            # strict=False accepts raw control characters inside strings
+            return json.loads(text, strict=False)
+        except ValueError:
+            return None
+
+    @property
+    def text(self) -> str:
+        return self.buffer
+
+
+# -----------------------------
+# Salvage and targeted repair
+# -----------------------------
+@dataclass
+class SalvageStats:
+    received_bytes: int = 0
+    # Bytes of complete elements kept from broken responses
+    salvaged_bytes: int = 0
+    salvaged_items: int = 0
+    # Bytes of broken tails that had to be asked for again
+    rerequested_bytes: int = 0
+    repair_requests: int = 0
+
+
+CONTINUATION_PROMPT = (
+    "{original}\n\n"
+    "Your previous answer was cut off or was not valid JSON. These entries of "
+    '"{key}" arrived complete and must NOT be repeated: {received}.\n'
+    "It broke off here:\n{tail}\n\n"
+    "Output valid JSON with ONLY the remaining entries, in the same format:\n"
+    '{{"{key}": [...]}}'
+)
+
+
+def continuation_prompt(original: str, key: str, received: List[str], tail: str) -> str:
+    """The targeted request for the entries a broken response is missing."""
+    if len(tail) > 500:
+        tail = tail[:500] + "..."
+    return CONTINUATION_PROMPT.format(
+        original=original,
+        key=key,
+        received=", ".join(received) or "(none)",
+        tail=tail or "(nothing)",
+    )
+
+
+def _repair(
+    parser: IncrementalFilesParser,
+    key: str,
+    id_field: str,
+    max_requests: int,
+    emit: Callable[[dict], None],
+) -> Generator[Tuple[List[str], str], str, Tuple[dict, SalvageStats]]:
+    """
+    The loop of parse_with_repair as a generator, shared by the sync and async
+    versions: yields (received ids, broken tail) whenever the model has to be
+    asked for the rest, is sent the text of its answer, and returns the result.
+    """
+    stats = SalvageStats(received_bytes=len(parser.text))
+    document = parser.document()
+    if isinstance(document, dict) and isinstance(document.get(key), list):
+        return document, stats
+
+    items = {}
+    while True:
+        # 1. Keep every complete entry of the broken response
+        entries = list(parser.items)
+        document = parser.document()
+        if isinstance(document, dict) and isinstance(document.get(key), list):
+            entries += [e for e in document[key] if isinstance(e, dict)]
+        new = []
+        for entry in entries:
+            if not entry.get(id_field) or entry[id_field] in items:
+                continue
+            items[entry[id_field]] = entry
+            new.append(entry)
+            if emit is not None and stats.repair_requests > 0:
+                emit(entry)
+        if document is not None:
+            break
+
+        stats.salvaged_items += len(new)
+        stats.salvaged_bytes += sum(len(json.dumps(e)) for e in new)
+        if stats.repair_requests >= max_requests:
+            break
+
+        # 2. Ask only for what is missing
+        tail = parser.tail
+        stats.rerequested_bytes += len(tail)
+        stats.repair_requests += 1
+        text = yield [str(i) for i in items], tail
+        parser = IncrementalFilesParser()
+        parser.feed(text)
+        parser.close()
+        stats.received_bytes += len(parser.text)
+
+    if not items:
+        raise ValueError(f"No complete '{key}' entries in the model response")
+    return {key: list(items.values())}, stats
+
+
+def parse_with_repair(
+    parser: IncrementalFilesParser,
+    key: str,
+    id_field: str,
+    request_more: Callable[[List[str], str], str],
+    max_requests: int = 1,
+    emit: Callable[[dict], None] = None,
+) -> Tuple[dict, SalvageStats]:
+    """
+    Finishes a response that was fed to parser and closed. When the document
+    does not parse, its complete `key` entries are kept and
+    request_more(received ids, broken tail) is asked for the rest, at most
+    max_requests times; its text is parsed the same way and its entries are
+    handed to emit. Raises ValueError when nothing usable was received.
+    """
+    steps = _repair(parser, key, id_field, max_requests, emit)
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(request_more(*request))
+    except StopIteration as done:
+        return done.value
+
+
+async def aparse_with_repair(
+    parser: IncrementalFilesParser,
+    key: str,
+    id_field: str,
+    request_more: Callable[[List[str], str], Awaitable[str]],
+    max_requests: int = 1,
+    emit: Callable[[dict], None] = None,
+) -> Tuple[dict, SalvageStats]:
+    """parse_with_repair with a coroutine request_more."""
+    steps = _repair(parser, key, id_field, max_requests, emit)
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(await request_more(*request))
+    except StopIteration as done:
+        return done.value
+
+
+def invoke_json(
+    llm,
+    prompt,
+    inputs: dict,
+    output_parser,
+    key: str,
+    id_field: str,
+    max_requests: int = 1,
+    emit: Callable[[dict], None] = None,
+) -> Tuple[dict, Optional[SalvageStats]]:
+    """
+    Runs prompt | llm and parses the JSON response. With emit, tokens are
+    streamed and every completed `key` entry is handed to emit immediately.
+
+    A complete, valid response goes through output_parser as usual (so its
+    run reaches the callbacks). A truncated or malformed one keeps its
+    complete entries and asks the model for the missing ones only; the
+    returned SalvageStats (None when nothing needed salvaging) are also
+    dispatched as a "json_salvage" event to the run's callbacks.
+    """
+    parser = IncrementalFilesParser()
+    if emit is None:
+        parser.feed((prompt | llm).invoke(inputs).content)
+    else:
+        for chunk in (prompt | llm).stream(inputs):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            for entry in parser.feed(text):
+                emit(entry)
+    for entry in parser.close():
+        if emit is not None:
+            emit(entry)
+
+    # A truncated response would be "repaired" by closing it, cut-off code included
+    if parser.complete:
+        try:
+            return output_parser.invoke(parser.text), None
+        except OutputParserException:
+            pass
+
+    def request_more(received: List[str], tail: str) -> str:
+        original = prompt.format(**inputs)
+        return llm.invoke(continuation_prompt(original, key, received, tail)).content
+
+    result, stats = parse_with_repair(
+        parser, key, id_field, request_more, max_requests, emit
+    )
+    try:
+        dispatch_custom_event("json_salvage", stats.__dict__)
+    except RuntimeError:
+        pass  # not inside a traced run
+    return result, stats
+
+
+async def ainvoke_json(
+    llm,
+    prompt,
+    inputs: dict,
+    output_parser,
+    key: str,
+    id_field: str,
+    max_requests: int = 1,
+    emit: Callable[[dict], None] = None,
+) -> Tuple[dict, Optional[SalvageStats]]:
+    """invoke_json on the event loop: the same parsing and repair, awaiting the model."""
+    parser = IncrementalFilesParser()
+    if emit is None:
+        parser.feed((await (prompt | llm).ainvoke(inputs)).content)
+    else:
+        async for chunk in (prompt | llm).astream(inputs):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            for entry in parser.feed(text):
+                emit(entry)
+    for entry in parser.close():
+        if emit is not None:
+            emit(entry)
+
+    if parser.complete:
+        try:
+            return await output_parser.ainvoke(parser.text), None
+        except OutputParserException:
+            pass
+
+    async def request_more(received: List[str], tail: str) -> str:
+        original = prompt.format(**inputs)
+        message = await llm.ainvoke(continuation_prompt(original, key, received, tail))
+        return message.content
+
+    result, stats = await aparse_with_repair(
+        parser, key, id_field, request_more, max_requests, emit
+    )
+    try:
+        await adispatch_custom_event("json_salvage", stats.__dict__)
+    except RuntimeError:
+        pass  # not inside a traced run
+    return result, stats
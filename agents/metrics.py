@@ -0,0 +1,456 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from langchain_core.tracers.context import register_configure_hook
+
+from llm.rate_limit import queue_wait_total
+
+GRAPH_NODES = ("plan", "code", "check", "test")
+QUANTILES = (0.5, 0.95)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _tier(response) -> Dict[str, str]:
+    """The router tier and model that served a call, if it was routed."""
+    sources = [response.llm_output or {}]
+    for generations in response.generations:
+        for gen in generations:
+            # Streamed calls carry it in the message metadata
+            message = getattr(gen, "message", None)
+            sources.append(getattr(message, "response_metadata", None) or {})
+            sources.append(gen.generation_info or {})
+    for source in sources:
+        if source.get("tier"):
+            return {"tier": source["tier"], "tier_model": source.get("model_name")}
+    return {}
+
+
+def _usage(response) -> Dict[str, int]:
+    """Token usage reported by the provider, if any."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+        }
+    for generations in response.generations:
+        for gen in generations:
+            meta = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if meta:
+                return {
+                    "prompt_tokens": meta.get("input_tokens", 0),
+                    "completion_tokens": meta.get("output_tokens", 0),
+                }
+    return {}
+
+
+class RunMetrics:
+    """Everything measured during one pipeline run."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.status = "running"
+        self.nodes: List[dict] = []
+        self.llm_calls: List[dict] = []
+        self.parse_s: List[float] = []
+        self.parse_failures = 0
+        self.retries = 0
+        self.llm_errors = 0
+        # Broken JSON responses (agents.incremental_json)
+        self.json_salvaged_bytes = 0
+        self.json_rerequested_bytes = 0
+        self.json_repair_requests = 0
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, record: dict) -> None:
+        with self._lock:
+            getattr(self, kind).append(record)
+
+    def count(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            nodes, calls = list(self.nodes), list(self.llm_calls)
+            parse_s = list(self.parse_s)
+        end = self.finished_at or time.time()
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_s": round(end - self.started_at, 4),
+            "nodes": nodes,
+            "llm_calls": calls,
+            "totals": {
+                "llm_calls": len(calls),
+                "llm_s": round(sum(c["latency_s"] for c in calls), 4),
+                "queue_s": round(sum(c.get("queue_s", 0.0) for c in calls), 4),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+                "parse_s": round(sum(parse_s), 4),
+                "parse_failures": self.parse_failures,
+                "retries": self.retries,
+                "llm_errors": self.llm_errors,
+                "json_salvaged_bytes": self.json_salvaged_bytes,
+                "json_rerequested_bytes": self.json_rerequested_bytes,
+                "json_repair_requests": self.json_repair_requests,
+                "files_written": sum(n.get("files_written", 0) for n in nodes),
+                "bytes_written": sum(n.get("bytes_written", 0) for n in nodes),
+                "pytest_s": round(sum(n.get("pytest_s", 0.0) for n in nodes), 4),
+            },
+        }
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records graph node timings and every chat model / output parser run of a
+    pipeline. Passed as a callback to graph.stream, so it reaches the chains
+    invoked inside the nodes too.
+    """
+
+    def __init__(self, metrics: RunMetrics):
+        self.metrics = metrics
+        self._starts: Dict[Any, tuple] = {}
+        self._seen_errors = set()
+
+    # -----------------------------
+    # Nodes and parsers
+    # -----------------------------
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name") or ""
+        if name in GRAPH_NODES and (metadata or {}).get("langgraph_node") == name:
+            self._starts[run_id] = ("node", name, time.perf_counter())
+        elif "OutputParser" in name:
+            self._starts[run_id] = ("parser", name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        kind, name, started = start
+        elapsed = time.perf_counter() - started
+        if kind == "parser":
+            self.metrics.add("parse_s", elapsed)
+            return
+
+        record = {"node": name, "duration_s": round(elapsed, 4)}
+        outputs = outputs if isinstance(outputs, dict) else {}
+        if name == "code":
+            code_output = outputs.get("code_output") or {}
+            written = {k: v for k, v in code_output.items() if isinstance(v, str)}
+            if "error" not in code_output:
+                record["files_written"] = len(written)
+                record["bytes_written"] = sum(len(v.encode()) for v in written.values())
+            else:
+                record["error"] = code_output.get("exception", code_output["error"])
+        elif name == "check":
+            record["problems"] = len(outputs.get("static_check") or [])
+        elif name == "test":
+            test_output = outputs.get("test_output") or {}
+            record["pytest_s"] = round(test_output.get("duration", 0.0), 4)
+            record["passed"] = test_output.get("passed", 0)
+            record["failed"] = test_output.get("failed", 0) + test_output.get(
+                "errors", 0
+            )
+        self.metrics.add("nodes", record)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        # The same exception bubbles through every enclosing chain; count it once
+        if (
+            isinstance(error, OutputParserException)
+            and id(error) not in self._seen_errors
+        ):
+            self._seen_errors.add(id(error))
+            self.metrics.count("parse_failures")
+        if start and start[0] == "node":
+            elapsed = time.perf_counter() - start[2]
+            self.metrics.add(
+                "nodes",
+                {
+                    "node": start[1],
+                    "duration_s": round(elapsed, 4),
+                    "error": str(error),
+                },
+            )
+
+    # -----------------------------
+    # Chat model calls
+    # -----------------------------
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "\n".join(str(m.content) for batch in messages for m in batch)
+        name = kwargs.get("name") or (serialized or {}).get("name", "")
+        self._starts[run_id] = (
+            "llm",
+            name,
+            time.perf_counter(),
+            len(prompt),
+            queue_wait_total(),
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        _, name, started, prompt_chars, queue_before = start
+        usage = _usage(response)
+        completion_chars = sum(
+            len(gen.text) for generations in response.generations for gen in generations
+        )
+        self.metrics.add(
+            "llm_calls",
+            {
+                "model": name,
+                "latency_s": round(time.perf_counter() - started, 4),
+                # Time spent waiting for the shared rate limiter (part of latency_s)
+                "queue_s": round(queue_wait_total() - queue_before, 4),
+                # ~4 characters per token when the provider reports no usage
+                "prompt_tokens": usage.get("prompt_tokens", prompt_chars // 4),
+                "completion_tokens": usage.get(
+                    "completion_tokens", completion_chars // 4
+                ),
+                "tokens_estimated": not usage,
+                # Model tier picked by the router (LLM_ROUTING=1)
+                **_tier(response),
+            },
+        )
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+        self.metrics.count("llm_errors")
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        self.metrics.count("retries")
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name == "json_salvage":
+            self.metrics.count("json_salvaged_bytes", data["salvaged_bytes"])
+            self.metrics.count("json_rerequested_bytes", data["rerequested_bytes"])
+            self.metrics.count("json_repair_requests", data["repair_requests"])
+
+
+# Handler added to every chain run in the context (see collect_metrics)
+_context_handler: ContextVar[Optional[MetricsCallbackHandler]] = ContextVar(
+    "agentic_metrics_handler", default=None
+)
+register_configure_hook(_context_handler, inheritable=True)
+
+
+@contextmanager
+def collect_metrics(metrics: RunMetrics):
+    """
+    Records the model calls of code that does not pass callbacks itself, such
+    as main.run_pipeline calling the agents directly.
+    """
+    token = _context_handler.set(MetricsCallbackHandler(metrics))
+    try:
+        yield metrics
+    finally:
+        _context_handler.reset(token)
+
+
+class MetricsRegistry:
+    """
+    Keeps the metrics of the most recent runs for p50/p95 aggregation and the
+    Prometheus endpoint, and writes each finished run as JSON to metrics_dir.
+    """
+
+    def __init__(self, window: int = 200, metrics_dir: Optional[str] = None):
+        self.metrics_dir = metrics_dir
+        self.runs: Deque[dict] = deque(maxlen=window)
+        # Monotonic counters since process start (the window only feeds p50/p95)
+        self.runs_total: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, metrics: RunMetrics) -> dict:
+        data = metrics.to_dict()
+        with self._lock:
+            self.runs.append(data)
+            self.runs_total[data["status"]] = self.runs_total.get(data["status"], 0) + 1
+            for key, value in data["totals"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+        if self.metrics_dir:
+            os.makedirs(self.metrics_dir, exist_ok=True)
+            path = os.path.join(self.metrics_dir, f"{metrics.run_id}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        return data
+
+    def get(self, run_id: str) -> Optional[dict]:
+        with self._lock:
+            return next((r for r in self.runs if r["run_id"] == run_id), None)
+
+    def aggregate(self) -> dict:
+        """p50/p95 of run, node and LLM call durations over the recent runs."""
+        with self._lock:
+            runs = list(self.runs)
+
+        def summary(values: List[float]) -> dict:
+            return {
+                "count": len(values),
+                "sum": round(sum(values), 4),
+                **{
+                    f"p{int(q * 100)}": round(percentile(values, q), 4)
+                    for q in QUANTILES
+                },
+            }
+
+        nodes: Dict[str, List[float]] = {}
+        for run in runs:
+            for node in run["nodes"]:
+                nodes.setdefault(node["node"], []).append(node["duration_s"])
+
+        tiers: Dict[str, List[float]] = {}
+        for run in runs:
+            for call in run["llm_calls"]:
+                if call.get("tier"):
+                    tiers.setdefault(call["tier"], []).append(call["latency_s"])
+
+        with self._lock:
+            totals = dict(self.counters)
+
+        return {
+            "runs": len(runs),
+            "run_duration_s": summary([r["duration_s"] for r in runs]),
+            "node_duration_s": {name: summary(v) for name, v in nodes.items()},
+            "llm_latency_s": summary(
+                [c["latency_s"] for r in runs for c in r["llm_calls"]]
+            ),
+            "llm_queue_s": summary(
+                [c.get("queue_s", 0.0) for r in runs for c in r["llm_calls"]]
+            ),
+            "llm_latency_by_tier_s": {name: summary(v) for name, v in tiers.items()},
+            "totals": totals,
+        }
+
+    def prometheus_text(self) -> str:
+        """Renders the aggregate in the Prometheus text exposition format."""
+        agg = self.aggregate()
+        lines = []
+
+        def emit_summary(name: str, help_text: str, series: Dict[str, dict]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} summary")
+            for labels, s in series.items():
+                sep = "," if labels else ""
+                for q in QUANTILES:
+                    value = s[f"p{int(q * 100)}"]
+                    lines.append(f'{name}{{{labels}{sep}quantile="{q}"}} {value}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {s['sum']}")
+                lines.append(f"{name}_count{suffix} {s['count']}")
+
+        def emit_counter(name: str, help_text: str, value: float, labels: str = ""):
+            if not any(line.startswith(f"# TYPE {name} ") for line in lines):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+        emit_summary(
+            "agentic_run_duration_seconds",
+            "Wall time of pipeline runs.",
+            {"": agg["run_duration_s"]},
+        )
+        emit_summary(
+            "agentic_node_duration_seconds",
+            "Duration of graph nodes.",
+            {f'node="{n}"': s for n, s in agg["node_duration_s"].items()},
+        )
+        emit_summary(
+            "agentic_llm_call_duration_seconds",
+            "Latency of chat model calls.",
+            {"": agg["llm_latency_s"]},
+        )
+        emit_summary(
+            "agentic_llm_tier_call_duration_seconds",
+            "Latency of chat model calls per routed model tier.",
+            {f'tier="{t}"': s for t, s in agg["llm_latency_by_tier_s"].items()},
+        )
+        emit_summary(
+            "agentic_llm_queue_seconds",
+            "Time chat model calls waited for the client-side rate limiter.",
+            {"": agg["llm_queue_s"]},
+        )
+
+        with self._lock:
+            runs_total = dict(self.runs_total)
+        for status, count in sorted(runs_total.items()):
+            emit_counter(
+                "agentic_runs_total",
+                "Finished pipeline runs.",
+                count,
+                f'status="{status}"',
+            )
+
+        totals = agg["totals"]
+        for key, help_text in (
+            ("prompt_tokens", "Prompt tokens sent to the model."),
+            ("completion_tokens", "Completion tokens received from the model."),
+            ("parse_failures", "Model responses that failed to parse."),
+            ("retries", "Retried runnable calls."),
+            ("llm_errors", "Failed chat model calls."),
+            (
+                "json_salvaged_bytes",
+                "Bytes kept from truncated or malformed responses.",
+            ),
+            (
+                "json_rerequested_bytes",
+                "Bytes of broken response tails asked for again.",
+            ),
+            ("files_written", "Files written by the coder."),
+            ("bytes_written", "Bytes written by the coder."),
+        ):
+            emit_counter(f"agentic_{key}_total", help_text, totals.get(key, 0))
+        return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Process-wide registry
+# -----------------------------
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """
+    Returns the shared metrics registry.
+
+    Environment:
+        METRICS_DIR      per-run JSON files (default .cache/metrics, empty disables)
+        METRICS_WINDOW   number of recent runs aggregated for p50/p95
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry(
+                window=int(os.getenv("METRICS_WINDOW", "200")),
+                metrics_dir=os.getenv("METRICS_DIR", os.path.join(".cache", "metrics")),
+            )
+        return _registry
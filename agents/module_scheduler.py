@@ -0,0 +1,73 @@
+import os
+import re
+from typing import Dict, List, Set
+
+
+def module_stem(name: str) -> str:
+    """'tests/test_utils.py' -> 'test_utils', 'utils.py' -> 'utils'"""
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def is_test_module(name: str) -> bool:
+    normalized = name.replace("\\", "/")
+    return module_stem(name).startswith("test_") or normalized.startswith("tests/")
+
+
+def module_dependencies(modules: List[dict]) -> Dict[str, Set[str]]:
+    """
+    Infers which plan modules each module depends on from its task descriptions.
+
+    A module depends on every non-test module whose import name it mentions
+    (e.g. "call utils.validate_inputs"). Test modules that mention no module
+    explicitly depend on the code module they are named after, or on all code
+    modules as a fallback.
+    """
+    names = [m.get("name", "") for m in modules]
+    code_modules = {module_stem(n): n for n in names if n and not is_test_module(n)}
+
+    deps: Dict[str, Set[str]] = {}
+    for module in modules:
+        name = module.get("name", "")
+        text = " ".join(module.get("tasks", []))
+        found = {
+            target
+            for stem, target in code_modules.items()
+            if target != name and re.search(rf"\b{re.escape(stem)}\b", text)
+        }
+
+        if is_test_module(name) and not found:
+            tested = module_stem(name)[len("test_") :]
+            if tested in code_modules:
+                found = {code_modules[tested]}
+            else:
+                found = set(code_modules.values())
+
+        deps[name] = found
+    return deps
+
+
+def plan_waves(modules: List[dict]) -> List[List[dict]]:
+    """
+    Orders plan modules into dependency "waves": every module in a wave only
+    depends on modules from earlier waves, so a wave can be generated concurrently.
+    Code modules always come before the tests that import them; dependency
+    cycles are broken by emitting the remaining modules together.
+    """
+    by_name = {m.get("name", ""): m for m in modules}
+    remaining = module_dependencies(modules)
+    done: Set[str] = set()
+    waves: List[List[dict]] = []
+
+    while remaining:
+        ready = [n for n, d in remaining.items() if d <= done]
+        if not ready:
+            # Cycle: prefer releasing code modules first so tests still come last
+            code = [n for n in remaining if not is_test_module(n)]
+            ready = code or list(remaining)
+
+        waves.append([by_name[n] for n in ready])
+        done.update(ready)
+        for n in ready:
+            remaining.pop(n)
+
+    return waves
@@ -0,0 +1,141 @@
+import re
+from typing import List, Optional
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """Raised when an edit or diff hunk does not match the current file."""
+
+
+# -----------------------------
+# Search / replace edits
+# -----------------------------
+def _find_block(lines: List[str], block: List[str], strict: bool) -> List[int]:
+    """Returns every start index where block occurs in lines."""
+    if not block:
+        return []
+    norm = (lambda s: s) if strict else (lambda s: s.rstrip())
+    target = [norm(b) for b in block]
+    return [
+        i
+        for i in range(len(lines) - len(block) + 1)
+        if [norm(l) for l in lines[i : i + len(block)]] == target
+    ]
+
+
+def apply_search_replace(original: str, edits: List[dict]) -> str:
+    """
+    Applies [{"search": ..., "replace": ...}, ...] in order. Each search text
+    must match exactly once; trailing whitespace differences are tolerated.
+    """
+    text = original
+    for n, edit in enumerate(edits, start=1):
+        search = edit.get("search", "")
+        replace = edit.get("replace", "")
+        if not search:
+            raise PatchError(f"edit {n}: empty search text")
+
+        count = text.count(search)
+        if count == 1:
+            text = text.replace(search, replace, 1)
+            continue
+        if count > 1:
+            raise PatchError(f"edit {n}: search text matches {count} times")
+
+        lines = text.splitlines(keepends=True)
+        block = search.splitlines(keepends=True)
+        starts = _find_block(lines, block, strict=False)
+        if len(starts) != 1:
+            raise PatchError(f"edit {n}: search text not found")
+
+        start = starts[0]
+        if replace and not replace.endswith("\n") and start + len(block) < len(lines):
+            replace += "\n"
+        text = "".join(lines[:start]) + replace + "".join(lines[start + len(block) :])
+    return text
+
+
+# -----------------------------
+# Unified diffs
+# -----------------------------
+def _parse_hunks(diff: str) -> List[dict]:
+    hunks = []
+    current = None
+    for line in diff.splitlines():
+        header = HUNK_HEADER_RE.match(line)
+        if header:
+            old_start = int(header.group(1))
+            if header.group(2) == "0":
+                # Zero-length old range: the start names the line to insert after
+                old_start += 1
+            current = {"old_start": old_start, "old": [], "new": []}
+            hunks.append(current)
+        elif current is None:
+            continue  # file headers (---/+++) and any preamble
+        elif line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        elif line.startswith("-"):
+            current["old"].append(line[1:])
+        elif line.startswith("+"):
+            current["new"].append(line[1:])
+        else:
+            # Context line; some models drop the leading space on blank lines
+            current["old"].append(line[1:] if line.startswith(" ") else line)
+            current["new"].append(line[1:] if line.startswith(" ") else line)
+
+    if not hunks:
+        raise PatchError("no hunks found in diff")
+    return hunks
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """
+    Applies a unified diff to original. Every hunk's context and removed lines
+    must match the file; a hunk may sit at a different line than its header
+    claims (the nearest exact match wins), but fuzzy content is rejected.
+    """
+    lines = original.splitlines()
+    offset = 0
+    for n, hunk in enumerate(_parse_hunks(diff), start=1):
+        old, new = hunk["old"], hunk["new"]
+        expected = max(hunk["old_start"] - 1 + offset, 0)
+
+        if not old:
+            # Pure insertion: trust the header position
+            start = min(expected, len(lines))
+        else:
+            starts = _find_block(lines, old, strict=False)
+            if not starts:
+                raise PatchError(f"hunk {n}: context does not match the file")
+            start = min(starts, key=lambda s: abs(s - expected))
+
+        lines[start : start + len(old)] = new
+        offset += len(new) - len(old)
+
+    text = "\n".join(lines)
+    return text + "\n" if original.endswith("\n") or not original else text
+
+
+# -----------------------------
+# Per-file dispatch
+# -----------------------------
+def apply_file_patch(original: Optional[str], entry: dict) -> str:
+    """
+    Applies one model-returned file entry, which carries either full "code",
+    a unified "diff", or a list of search/replace "edits".
+    """
+    if entry.get("code"):
+        return entry["code"]
+
+    if entry.get("diff"):
+        return apply_unified_diff(original or "", entry["diff"])
+
+    edits = entry.get("edits") or []
+    if edits:
+        if original is None:
+            # New file: the edits can only describe its full content
+            return "".join(e.get("replace", "") for e in edits)
+        return apply_search_replace(original, edits)
+
+    raise PatchError("entry has no code, diff or edits")
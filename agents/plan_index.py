@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+DEFAULT_PLAN_INDEX_PATH = os.path.join(".cache", "plans.sqlite")
+
+NUM_PERM = 128
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)
+]
+
+# Words that say nothing about what the project should do
+STOPWORDS = {
+    "a", "an", "and", "app", "build", "can", "code", "create", "for", "i", "in",
+    "implement", "make", "me", "need", "of", "on", "please", "program", "py",
+    "python", "script", "simple", "small", "that", "the", "to", "using", "want",
+    "which", "with", "write", "you",
+}  # fmt: skip
+SUFFIXES = ("ations", "ation", "ings", "ing", "ers", "er", "ies", "es", "ed", "s", "e")
+WORD_RE = re.compile(r"[a-z0-9]+")
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def normalize_prompt(prompt: str) -> List[str]:
+    """Lowercased, stemmed content words of a prompt, in order."""
+    words = WORD_RE.findall(prompt.lower())
+    return [_stem(w) for w in words if w not in STOPWORDS]
+
+
+def shingles(prompt: str) -> Set[str]:
+    """
+    Words plus their character trigrams, so "solver" and "solve" overlap, and
+    word bigrams, so the same words in another order score lower.
+    """
+    words = normalize_prompt(prompt)
+    result = set()
+    for word in words:
+        result.add(word)
+        padded = f"#{word}#"
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    result.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return result
+
+
+def same_details(prompt: str, other: str) -> bool:
+    """
+    Whether two similar prompts also agree on what shingles blur: the same
+    numbers, and their shared words in the same order ("celsius to
+    fahrenheit" is not "fahrenheit to celsius").
+    """
+    if NUMBER_RE.findall(prompt) != NUMBER_RE.findall(other):
+        return False
+    words, other_words = normalize_prompt(prompt), normalize_prompt(other)
+    shared = set(words) & set(other_words)
+
+    def order(ws: List[str]) -> List[str]:
+        return [w for w in dict.fromkeys(ws) if w in shared]
+
+    return order(words) == order(other_words)
+
+
+def minhash(items: Set[str]) -> Tuple[int, ...]:
+    """MinHash signature; the share of equal positions estimates Jaccard similarity."""
+    if not items:
+        return tuple([_PRIME] * NUM_PERM)
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+        for s in items
+    ]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_PERM
+
+
+@dataclass
+class PlanMatch:
+    prompt: str
+    plan: dict
+    similarity: float
+    # Close enough to reuse the plan as is, not just as a starting point
+    reusable: bool = False
+
+
+class PlanIndex:
+    """
+    Local store of earlier plans, looked up by prompt similarity.
+
+    Prompts are normalized (lowercase, stopwords dropped, words stemmed) and
+    indexed by a MinHash signature of their word, word-bigram and
+    character-trigram shingles. Signatures are kept in memory for lookups and
+    persisted with the plans in SQLite; beyond max_entries the least recently
+    used plans go.
+    Plans are kept per namespace (the planner's model), so plans of one model
+    are never served for another.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PLAN_INDEX_PATH,
+        max_entries: int = 1000,
+        reuse_threshold: float = 0.8,
+        hint_threshold: float = 0.5,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.reuse_threshold = reuse_threshold
+        self.hint_threshold = hint_threshold
+
+        self.hits = 0
+        self.hints = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            " key TEXT PRIMARY KEY,"
+            " namespace TEXT NOT NULL,"
+            " prompt TEXT NOT NULL,"
+            " signature TEXT NOT NULL,"
+            " plan TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+        # key -> (namespace, signature)
+        self._signatures: Dict[str, Tuple[str, Tuple[int, ...]]] = {
+            key: (namespace, tuple(json.loads(signature)))
+            for key, namespace, signature in self._conn.execute(
+                "SELECT key, namespace, signature FROM plans"
+            )
+        }
+
+    @staticmethod
+    def make_key(prompt: str, namespace: str) -> str:
+        normalized = " ".join(normalize_prompt(prompt))
+        return hashlib.sha256(f"{namespace}\x00{normalized}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, namespace: str = "") -> Optional[PlanMatch]:
+        """
+        Returns the most similar stored plan when its similarity reaches
+        hint_threshold, else None. It is marked reusable from reuse_threshold
+        on, if the prompts also have the same numbers and word order.
+        """
+        key = self.make_key(prompt, namespace)
+        signature = minhash(shingles(prompt))
+        with self._lock:
+            best_key, best = None, 0.0
+            for other, (other_namespace, other_signature) in self._signatures.items():
+                if other_namespace != namespace:
+                    continue
+                score = 1.0 if other == key else similarity(signature, other_signature)
+                if score > best:
+                    best_key, best = other, score
+
+            if best_key is None or best < self.hint_threshold:
+                self.misses += 1
+                return None
+
+            row = self._conn.execute(
+                "SELECT prompt, plan FROM plans WHERE key = ?", (best_key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE plans SET used_at = ? WHERE key = ?", (time.time(), best_key)
+            )
+            self._conn.commit()
+
+        reusable = best >= self.reuse_threshold and same_details(prompt, row[0])
+        if reusable:
+            self.hits += 1
+        else:
+            self.hints += 1
+        return PlanMatch(
+            prompt=row[0], plan=json.loads(row[1]), similarity=best, reusable=reusable
+        )
+
+    def add(self, prompt: str, plan: dict, namespace: str = "") -> None:
+        key = self.make_key(prompt, namespace)
+        signature = minhash(shingles(prompt))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans"
+                " (key, namespace, prompt, signature, plan, created_at, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    namespace,
+                    prompt,
+                    json.dumps(signature),
+                    json.dumps(plan),
+                    now,
+                    now,
+                ),
+            )
+            self._signatures[key] = (namespace, signature)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drops least recently used plans beyond max_entries."""
+        excess = len(self._signatures) - self.max_entries
+        if excess <= 0:
+            return
+        rows = self._conn.execute(
+            "SELECT key FROM plans ORDER BY used_at ASC LIMIT ?", (excess,)
+        ).fetchall()
+        for (key,) in rows:
+            self._conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+            self._signatures.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "hints": self.hints,
+            "misses": self.misses,
+            "entries": len(self._signatures),
+        }
+
+
+# -----------------------------
+# Process-wide index
+# -----------------------------
+_index: Optional[PlanIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_plan_index() -> Optional[PlanIndex]:
+    """
+    Returns the shared plan index, or None when PLAN_REUSE is not enabled.
+
+    Environment:
+        PLAN_REUSE=1             enable plan reuse for similar prompts
+        PLAN_INDEX_PATH          SQLite file (default .cache/plans.sqlite)
+        PLAN_INDEX_MAX_ENTRIES   plans kept before LRU eviction
+        PLAN_REUSE_THRESHOLD     similarity from which a stored plan is reused as is
+        PLAN_HINT_THRESHOLD      similarity from which it is sent as a starting point
+    """
+    global _index
+
+    if os.getenv("PLAN_REUSE", "0").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _index_lock:
+        if _index is None:
+            _index = PlanIndex(
+                path=os.getenv("PLAN_INDEX_PATH", DEFAULT_PLAN_INDEX_PATH),
+                max_entries=int(os.getenv("PLAN_INDEX_MAX_ENTRIES", "1000")),
+                reuse_threshold=float(os.getenv("PLAN_REUSE_THRESHOLD", "0.8")),
+                hint_threshold=float(os.getenv("PLAN_HINT_THRESHOLD", "0.5")),
+            )
+        return _index
@@ -1,6 +1,6 @@
+import json
 import os
-from typing import List
-from langchain_openai import ChatOpenAI
+from typing import List, Optional, Tuple
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
@@ -9,6 +9,8 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 os.sys.path.append(project_root)
 
 from llm.llmModels import get_llm
+from agents.incremental_json import ainvoke_json, invoke_json
+from agents.plan_index import get_plan_index
 
 
 # --- Step 1: Define schema using Pydantic ---
@@ -29,7 +31,13 @@ class ProjectPlan(BaseModel):
 class PlannerAgent:
     def __init__(self):
         # Use the new ChatOpenAI from langchain_openai
-        self.llm = get_llm(model_name="gpt-5-mini", temperature=0.2)
+        self.llm = get_llm(model_name="gpt-5-mini", temperature=0.2, role="planner")
+
+        # Plans of earlier, similar prompts (None unless PLAN_REUSE=1)
+        self.plan_index = get_plan_index()
+        self.plan_namespace = (
+            getattr(self.llm, "model_name", None) or self.llm._llm_type
+        )
 
         # Structured output parser
         self.parser = JsonOutputParser(pydantic_object=ProjectPlan)
@@ -41,26 +49,99 @@ class PlannerAgent:
                 "Given the user's request below, design a JSON plan with clear modules and tasks "
                 "that a coding agent can execute.\n\n"
                 "User request:\n{user_prompt}\n\n"
+                "{reference_plan}"
                 "{format_instructions}"
             ),
-            input_variables=["user_prompt"],
+            input_variables=["user_prompt", "reference_plan"],
             partial_variables={
                 "format_instructions": self.parser.get_format_instructions()
             },
         )
 
-        # Chain = prompt → LLM → parser
-        self.chain = self.prompt | self.llm | self.parser
+        # Targeted requests for the modules a truncated / malformed plan lost
+        self.json_repairs = int(os.getenv("JSON_REPAIR_REQUESTS", "1"))
 
     def plan_project(self, user_prompt: str):
         """
         Takes a user prompt (project idea) and returns a structured project plan dict.
         """
+        plan, reference_plan = self._lookup(user_prompt)
+        if plan is not None:
+            return plan
+
+        try:
+            result, stats = invoke_json(
+                self.llm,
+                self.prompt,
+                {"user_prompt": user_prompt, "reference_plan": reference_plan},
+                self.parser,
+                "modules",
+                "name",
+                self.json_repairs,
+            )
+            return self._finish(user_prompt, result, stats)
+        except Exception as e:
+            return {
+                "error": "PlannerAgent failed to produce valid JSON",
+                "exception": str(e),
+            }
+
+    async def aplan_project(self, user_prompt: str):
+        """
+        plan_project for the event loop: the model call is awaited, so no thread
+        waits on it.
+        """
+        plan, reference_plan = self._lookup(user_prompt)
+        if plan is not None:
+            return plan
+
         try:
-            result = self.chain.invoke({"user_prompt": user_prompt})
-            return result  # already parsed into Python dict
+            result, stats = await ainvoke_json(
+                self.llm,
+                self.prompt,
+                {"user_prompt": user_prompt, "reference_plan": reference_plan},
+                self.parser,
+                "modules",
+                "name",
+                self.json_repairs,
+            )
+            return self._finish(user_prompt, result, stats)
         except Exception as e:
             return {
                 "error": "PlannerAgent failed to produce valid JSON",
                 "exception": str(e),
             }
+
+    def _lookup(self, user_prompt: str) -> Tuple[Optional[dict], str]:
+        """
+        The plan of an earlier, near-identical prompt (reused as is), or the
+        reference_plan prompt section for a merely similar one (including
+        near-identical prompts with other numbers or word order).
+        """
+        match = None
+        if self.plan_index is not None:
+            match = self.plan_index.lookup(user_prompt, self.plan_namespace)
+        if match is None:
+            return None, ""
+        if match.reusable:
+            print(
+                f"♻️ [Planner] Reusing the plan of a similar request "
+                f"({match.similarity:.2f}): {match.prompt!r}"
+            )
+            return match.plan, ""
+        # Close but not close enough: let the model adapt the earlier plan
+        return None, (
+            f"A plan made for a similar earlier request ({match.prompt!r}) is "
+            "below; reuse what fits this request and change what differs:\n"
+            f"{json.dumps(match.plan)}\n\n"
+        )
+
+    def _finish(self, user_prompt: str, result: dict, stats) -> dict:
+        if stats is not None:
+            print(
+                f"🧩 [Planner] Salvaged {stats.salvaged_items} module(s) from a "
+                f"broken plan, re-requested {stats.rerequested_bytes} bytes"
+            )
+        if self.plan_index is not None and result.get("modules"):
+            self.plan_index.add(user_prompt, result, self.plan_namespace)
+        return result  # already parsed into Python dict
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Dict, List, Optional
+
+# Reasons the fix loop stops without the tests passing
+NO_CHANGE = "no_change"
+SAME_FAILURES = "same_failures"
+OSCILLATION = "oscillation"
+
+STALL_MESSAGES = {
+    NO_CHANGE: "the fix left every file byte-identical",
+    SAME_FAILURES: "the same tests failed as in the previous iteration",
+    OSCILLATION: "the workspace went back to the content of an earlier iteration",
+}
+
+
+def workspace_fingerprint(hashes: Dict[str, str]) -> str:
+    """One hash over the (path, content hash) pairs of the workspace."""
+    digest = hashlib.sha256()
+    for path, file_hash in sorted(hashes.items()):
+        digest.update(f"{path}\x00{file_hash}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def failure_signature(test_output: dict) -> List[str]:
+    """Sorted ids of the failing / erroring tests and uncollectable files."""
+    failing = {
+        f"{case['nodeid']}:{case['outcome']}"
+        for case in test_output.get("cases", [])
+        if case.get("outcome") in ("failed", "error")
+    }
+    failing.update(
+        f"{error['path']}:collection"
+        for error in test_output.get("collection_errors", [])
+    )
+    if test_output.get("timed_out"):
+        failing.add("<timed out>")
+    return sorted(failing)
+
+
+def assess_progress(progress: List[dict]) -> Optional[str]:
+    """
+    Compares the latest iteration ({"workspace", "failures"}) with the earlier
+    ones and returns why it made no progress, or None.
+    """
+    if len(progress) < 2:
+        return None
+    latest, previous = progress[-1], progress[-2]
+    if latest["workspace"] == previous["workspace"]:
+        return NO_CHANGE
+    if any(p["workspace"] == latest["workspace"] for p in progress[:-2]):
+        return OSCILLATION
+    if latest["failures"] and latest["failures"] == previous["failures"]:
+        return SAME_FAILURES
+    return None
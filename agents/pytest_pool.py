@@ -0,0 +1,402 @@
+import asyncio
+import atexit
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from agents.pytest_results import (
+    CaseResult,
+    CollectionError,
+    RunResult,
+    trim_traceback,
+)
+
+# How often arun() checks on a worker that has not finished yet
+WORKER_POLL_S = 0.02
+
+# -----------------------------
+# Worker bootstrap (runs in a fresh interpreter)
+# -----------------------------
+# The worker imports pytest and common stdlib modules up front, then blocks on
+# stdin until it gets a job. It runs exactly one job and exits, so modules the
+# generated code imports never leak into the next run.
+WORKER_BOOTSTRAP = r"""
+import json, os, sys, time
+import argparse, dataclasses, math, re, typing, unittest.mock
+import pytest
+import _pytest.python, _pytest.runner, _pytest.assertion.rewrite
+from importlib.metadata import entry_points
+
+# Third-party pytest plugins are the bulk of pytest's startup time
+for ep in entry_points(group="pytest11"):
+    try:
+        ep.load()
+    except Exception:
+        pass
+
+job = json.loads(sys.stdin.readline())
+
+try:
+    import resource
+
+    if job["memory_mb"]:
+        limit = job["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    if job["cpu_seconds"]:
+        used = int(time.process_time()) + 1
+        resource.setrlimit(
+            resource.RLIMIT_CPU, (used + job["cpu_seconds"], used + job["cpu_seconds"] + 5)
+        )
+except (ImportError, ValueError, OSError):
+    pass  # rlimits are best effort (unavailable on Windows)
+
+
+class TestTimeout(Exception):
+    pass
+
+
+class WorkerPlugin:
+    def __init__(self, test_timeout):
+        self.test_timeout = test_timeout
+        self.cases = []
+        self.collection_errors = []
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        import signal
+
+        if not self.test_timeout or not hasattr(signal, "SIGALRM"):
+            yield
+            return
+
+        def on_timeout(signum, frame):
+            raise TestTimeout(f"test exceeded {self.test_timeout}s timeout")
+
+        previous = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, self.test_timeout)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    def pytest_runtest_logreport(self, report):
+        # One entry per test: the call phase, or a setup/teardown that went wrong
+        if report.when != "call" and report.passed:
+            return
+        if report.failed:
+            outcome = "failed" if report.when == "call" else "error"
+        else:
+            outcome = report.outcome
+        self.cases.append(
+            {
+                "nodeid": report.nodeid,
+                "outcome": outcome,
+                "duration": report.duration,
+                "message": "" if report.passed else report.longreprtext[-20000:],
+            }
+        )
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.collection_errors.append(
+                {"path": report.nodeid, "message": report.longreprtext[-20000:]}
+            )
+
+
+os.chdir(job["cwd"])
+sys.path.insert(0, job["cwd"])
+plugin = WorkerPlugin(job["test_timeout"])
+args = ["-q", "-p", "no:cacheprovider", "-W", "ignore::pytest.PytestAssertRewriteWarning"]
+exit_code = pytest.main([*args, *job["paths"]], plugins=[plugin])
+sys.stdout.flush()
+
+with open(job["result_path"], "w", encoding="utf-8") as f:
+    json.dump(
+        {
+            "exit_code": int(exit_code),
+            "cases": plugin.cases,
+            "collection_errors": plugin.collection_errors,
+        },
+        f,
+    )
+"""
+
+
+def _drain(fd: int) -> List[bytes]:
+    """Whatever a non-blocking pipe holds right now."""
+    chunks = []
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return chunks
+        if not data:
+            return chunks
+        chunks.append(data)
+
+
+class PytestWorkerPool:
+    """
+    Keeps pre-warmed pytest worker processes and runs test files across them.
+
+    Every run shards the test files over up to `workers` processes, each with a
+    per-test timeout, a memory / CPU rlimit and a wall-clock limit for the whole
+    run. Workers are single-use: after taking a job they are replaced by a fresh
+    warm worker, so generated modules never leak from one iteration to the next.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        test_timeout: float = 30,
+        run_timeout: float = 300,
+        memory_mb: int = 1024,
+        cpu_seconds: int = 120,
+    ):
+        self.workers = max(1, workers)
+        self.test_timeout = test_timeout
+        self.run_timeout = run_timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+
+        self._idle: List[subprocess.Popen] = []
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    # -----------------------------
+    # Worker lifecycle
+    # -----------------------------
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-u", "-c", WORKER_BOOTSTRAP],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+
+    def warm_up(self):
+        """Starts idle workers up to the pool size."""
+        with self._lock:
+            self._idle = [w for w in self._idle if w.poll() is None]
+            while len(self._idle) < self.workers:
+                self._idle.append(self._spawn())
+
+    def _acquire(self) -> subprocess.Popen:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.poll() is None:
+                    return worker
+        return self._spawn()
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._idle:
+                if worker.poll() is None:
+                    worker.kill()
+            self._idle = []
+
+    # -----------------------------
+    # Running tests
+    # -----------------------------
+    @staticmethod
+    def _shard(paths: List[str], count: int) -> List[List[str]]:
+        shards = [[] for _ in range(min(count, len(paths)))]
+        for i, path in enumerate(sorted(paths)):
+            shards[i % len(shards)].append(path)
+        return shards
+
+    def run(
+        self, cwd: str, paths: List[str], cancel: threading.Event = None
+    ) -> RunResult:
+        """
+        Runs the given test files (relative to cwd) and returns the merged
+        structured result of all shards. Setting `cancel` kills the workers of
+        this run (e.g. a fix candidate that lost), which then reports errors.
+        """
+        if not paths:
+            return RunResult(output="no tests ran in 0.00s")
+
+        start = time.perf_counter()
+        deadline = start + self.run_timeout
+        jobs = self._submit(cwd, paths)
+
+        shard_results = []
+        for worker, shard, result_path in jobs:
+            timed_out = cancelled = False
+            while True:
+                remaining = max(deadline - time.perf_counter(), 0.1)
+                try:
+                    out, _ = worker.communicate(
+                        timeout=remaining if cancel is None else min(remaining, 0.2)
+                    )
+                    break
+                except subprocess.TimeoutExpired:
+                    cancelled = cancel is not None and cancel.is_set()
+                    if cancelled or time.perf_counter() >= deadline:
+                        worker.kill()
+                        out, _ = worker.communicate()
+                        timed_out = not cancelled
+                        break
+            shard_results.append(
+                self._shard_result(
+                    worker, shard, result_path, out, timed_out, cancelled
+                )
+            )
+        return self._merge(shard_results, start)
+
+    async def arun(
+        self, cwd: str, paths: List[str], cancel: threading.Event = None
+    ) -> RunResult:
+        """
+        run() for the event loop: the workers' output is drained and their
+        exit awaited without blocking, so no thread waits on pytest.
+        """
+        if not paths:
+            return RunResult(output="no tests ran in 0.00s")
+
+        start = time.perf_counter()
+        deadline = start + self.run_timeout
+        jobs = self._submit(cwd, paths)
+
+        shard_results = []
+        for worker, shard, result_path in jobs:
+            out, timed_out, cancelled = await self._await_worker(
+                worker, deadline, cancel
+            )
+            shard_results.append(
+                self._shard_result(
+                    worker, shard, result_path, out, timed_out, cancelled
+                )
+            )
+        return self._merge(shard_results, start)
+
+    def _submit(self, cwd: str, paths: List[str]) -> List[tuple]:
+        """Hands one shard of paths to each worker; returns (worker, shard, result_path)."""
+        jobs = []
+        for shard in self._shard(paths, self.workers):
+            fd, result_path = tempfile.mkstemp(suffix=".json", prefix="pytest_worker_")
+            os.close(fd)
+            worker = self._acquire()
+            worker.stdin.write(
+                json.dumps(
+                    {
+                        "cwd": os.path.abspath(cwd),
+                        "paths": shard,
+                        "result_path": result_path,
+                        "test_timeout": self.test_timeout,
+                        "memory_mb": self.memory_mb,
+                        "cpu_seconds": self.cpu_seconds,
+                    }
+                )
+                + "\n"
+            )
+            worker.stdin.flush()
+            jobs.append((worker, shard, result_path))
+        return jobs
+
+    async def _await_worker(
+        self, worker: subprocess.Popen, deadline: float, cancel: threading.Event
+    ) -> Tuple[str, bool, bool]:
+        """
+        Reads a worker's output until it exits, polling its pipe without
+        blocking. Returns (output, timed_out, cancelled).
+        """
+        worker.stdin.close()
+        fd = worker.stdout.fileno()
+        os.set_blocking(fd, False)
+        chunks = []
+        timed_out = cancelled = False
+        try:
+            while True:
+                try:
+                    data = os.read(fd, 65536)
+                except BlockingIOError:
+                    data = None
+                if data:
+                    chunks.append(data)
+                    continue
+                if data == b"" and worker.poll() is not None:
+                    break  # end of output and the worker exited
+                cancelled = cancel is not None and cancel.is_set()
+                if cancelled or time.perf_counter() >= deadline:
+                    worker.kill()
+                    worker.wait()
+                    timed_out = not cancelled
+                    chunks.extend(_drain(fd))
+                    break
+                await asyncio.sleep(WORKER_POLL_S)
+        finally:
+            worker.stdout.close()
+            worker.wait()
+        return b"".join(chunks).decode("utf-8", errors="replace"), timed_out, cancelled
+
+    def _shard_result(
+        self,
+        worker: subprocess.Popen,
+        shard: List[str],
+        result_path: str,
+        out: str,
+        timed_out: bool,
+        cancelled: bool,
+    ) -> RunResult:
+        data = self._read_result(result_path)
+        if data is None:
+            # Killed, crashed or hit an rlimit before reporting
+            if cancelled:
+                reason = "run was cancelled"
+            elif timed_out:
+                reason = f"run exceeded the {self.run_timeout}s wall-clock limit"
+            else:
+                reason = f"worker exited with code {worker.returncode}"
+            return RunResult(
+                errors=len(shard),
+                timed_out=timed_out,
+                cases=[
+                    CaseResult(nodeid=p, outcome="error", message=reason) for p in shard
+                ],
+                output=out,
+            )
+
+        result = RunResult(output=out, timed_out=timed_out)
+        for case in data["cases"]:
+            case["message"] = trim_traceback(case["message"])
+            result.cases.append(CaseResult(**case))
+            field = {"error": "errors"}.get(case["outcome"], case["outcome"])
+            if hasattr(result, field):
+                setattr(result, field, getattr(result, field) + 1)
+        for error in data["collection_errors"]:
+            result.collection_errors.append(
+                CollectionError(
+                    path=error["path"], message=trim_traceback(error["message"])
+                )
+            )
+            result.errors += 1
+        return result
+
+    def _merge(self, shard_results: List[RunResult], start: float) -> RunResult:
+        # Replace the workers we just used, off the caller's critical path
+        threading.Thread(target=self.warm_up, daemon=True).start()
+
+        merged = RunResult.merge(shard_results)
+        merged.duration = time.perf_counter() - start
+        merged.output += "\n" + merged.summary_line()
+        return merged
+
+    @staticmethod
+    def _read_result(path: str) -> Optional[dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,206 @@
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+MAX_TRACEBACK_LINES = 25
+MAX_TRACEBACK_CHARS = 1500
+
+
+def trim_traceback(text: str) -> str:
+    """
+    Keeps the informative tail of a pytest failure repr: the last source lines,
+    the `E ...` assertion lines and the `file.py:N: Error` location.
+    """
+    lines = [line.rstrip() for line in (text or "").strip().splitlines()]
+    # Drop blank lines and pytest's "____" / "_ _ _" separators
+    lines = [line for line in lines if not set(line) <= {"_", " "}]
+    if len(lines) > MAX_TRACEBACK_LINES:
+        lines = ["..."] + lines[-MAX_TRACEBACK_LINES:]
+    trimmed = "\n".join(lines)
+    if len(trimmed) > MAX_TRACEBACK_CHARS:
+        trimmed = "..." + trimmed[-MAX_TRACEBACK_CHARS:]
+    return trimmed
+
+
+class CaseResult(BaseModel):
+    nodeid: str = Field(description="pytest node id, e.g. tests/test_x.py::test_y")
+    outcome: str = Field(description="passed, failed, error or skipped")
+    duration: float = Field(default=0.0, description="Duration in seconds")
+    message: str = Field(default="", description="Trimmed traceback / reason")
+
+
+class CollectionError(BaseModel):
+    path: str = Field(description="Test file that failed to import/collect")
+    message: str = Field(default="", description="Trimmed traceback")
+
+
+class RunResult(BaseModel):
+    passed: int = 0
+    failed: int = 0
+    errors: int = 0
+    skipped: int = 0
+    duration: float = 0.0
+    timed_out: bool = False
+    cases: List[CaseResult] = Field(default_factory=list)
+    collection_errors: List[CollectionError] = Field(default_factory=list)
+    output: str = Field(default="", description="Raw pytest output (not for prompts)")
+    selected: List[str] = Field(
+        default_factory=list,
+        description="Test files run when only the affected subset ran (empty: full suite)",
+    )
+
+    @property
+    def total(self) -> int:
+        return self.passed + self.failed + self.errors + self.skipped
+
+    @property
+    def partial(self) -> bool:
+        """True when the counts only cover the affected tests, not the suite."""
+        return bool(self.selected)
+
+    @property
+    def ok(self) -> bool:
+        """True when at least one test ran and nothing failed or errored."""
+        return (
+            self.passed > 0
+            and self.failed == 0
+            and self.errors == 0
+            and not self.collection_errors
+            and not self.timed_out
+        )
+
+    def failing_files(self) -> List[str]:
+        files = [
+            c.nodeid.split("::")[0]
+            for c in self.cases
+            if c.outcome in ("failed", "error")
+        ]
+        files += [e.path for e in self.collection_errors]
+        return list(dict.fromkeys(files))
+
+    def summary_line(self) -> str:
+        parts = [
+            f"{count} {name}"
+            for name, count in (
+                ("failed", self.failed),
+                ("passed", self.passed),
+                ("skipped", self.skipped),
+                ("errors", self.errors),
+            )
+            if count
+        ]
+        return f"{', '.join(parts) or 'no tests ran'} in {self.duration:.2f}s"
+
+    def summary(self, max_chars: int = 4000) -> str:
+        """
+        Compact, bounded description of the failures for the coder prompt.
+        Identical tracebacks are reported once.
+        """
+        lines = [self.summary_line()]
+        if self.timed_out:
+            lines.append("⏱️ The test run hit its wall-clock limit and was killed.")
+
+        seen: Dict[str, str] = {}
+        entries = [
+            (f"ERROR {e.path} (collection)", e.message) for e in self.collection_errors
+        ]
+        entries += [
+            (f"{c.outcome.upper()} {c.nodeid} ({c.duration:.2f}s)", c.message)
+            for c in self.cases
+            if c.outcome in ("failed", "error")
+        ]
+
+        body, shown = [], 0
+        for header, message in entries:
+            block = header
+            if message in seen:
+                block += f"\n  (same error as {seen[message]})"
+            elif message:
+                seen[message] = header.split(" ")[1]
+                block += "\n" + "\n".join("  " + l for l in message.splitlines())
+            if sum(len(b) + 1 for b in lines + body) + len(block) > max_chars:
+                break
+            body.append(block)
+            shown += 1
+
+        if shown < len(entries):
+            body.append(f"... {len(entries) - shown} more failure(s) not shown")
+        return "\n".join(lines + body)
+
+    @classmethod
+    def merge(cls, results: List["RunResult"]) -> "RunResult":
+        """Combines results from test shards run in parallel."""
+        merged = cls()
+        for r in results:
+            merged.passed += r.passed
+            merged.failed += r.failed
+            merged.errors += r.errors
+            merged.skipped += r.skipped
+            merged.duration = max(merged.duration, r.duration)
+            merged.timed_out = merged.timed_out or r.timed_out
+            merged.cases.extend(r.cases)
+            merged.collection_errors.extend(r.collection_errors)
+        merged.output = "\n".join(r.output for r in results if r.output)
+        return merged
+
+
+def parse_junit_xml(path: str, output: str = "") -> RunResult:
+    """Reads a pytest --junitxml report into a RunResult."""
+    result = RunResult(output=output)
+    root = ET.parse(path).getroot()
+    suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+
+    for suite in suites:
+        result.duration += float(suite.get("time", 0) or 0)
+        for case in suite.findall("testcase"):
+            classname, name = case.get("classname", ""), case.get("name", "")
+            failure = case.find("failure")
+            error = case.find("error")
+            skipped = case.find("skipped")
+
+            if not classname and error is not None:
+                # Collection errors are reported as a nameless testcase
+                result.collection_errors.append(
+                    CollectionError(
+                        path=name.replace(".", "/") + ".py",
+                        message=trim_traceback(error.text or error.get("message", "")),
+                    )
+                )
+                result.errors += 1
+                continue
+
+            module = classname.split(".")
+            # "tests.test_x.TestCls" -> tests/test_x.py::TestCls::name is ambiguous;
+            # the module path is everything up to the first capitalized part
+            split = next(
+                (i for i, p in enumerate(module) if p[:1].isupper()), len(module)
+            )
+            nodeid = (
+                "/".join(module[:split]) + ".py::" + "::".join(module[split:] + [name])
+            )
+
+            if failure is not None:
+                outcome, node = "failed", failure
+            elif error is not None:
+                outcome, node = "error", error
+            elif skipped is not None:
+                outcome, node = "skipped", skipped
+            else:
+                outcome, node = "passed", None
+
+            message = ""
+            if node is not None:
+                message = trim_traceback(node.text or node.get("message", ""))
+            result.cases.append(
+                CaseResult(
+                    nodeid=nodeid,
+                    outcome=outcome,
+                    duration=float(case.get("time", 0) or 0),
+                    message=message,
+                )
+            )
+            field = {"error": "errors"}.get(outcome, outcome)
+            setattr(result, field, getattr(result, field) + 1)
+
+    return result
@@ -1,24 +1,250 @@
-from agents.graph import create_graph, GraphState
+import asyncio
+import uuid
 
+from agents.graph import END, GraphState, create_graph, next_node
+from agents.run_store import get_run_store
+from agents.snapshots import restore_best_snapshot
+from agents.virtual_workspace import get_workspace
 
-def run_agentic_pipeline(prompt: str):
-    # Initialize the state schema
-    state = GraphState(
+
+def _initial_state(
+    prompt: str, workspace: str = None, run_id: str = None
+) -> GraphState:
+    return GraphState(
         user_prompt=prompt,
+        workspace=workspace or "workspace",
+        run_id=run_id or uuid.uuid4().hex[:12],
         iteration=0,
         plan={},
         code_output={},
         test_output={},
         feedback="",
         error="",
+        candidate_test={},
+        progress=[],
+        escalations=0,
+        stop_reason="",
+        static_check=[],
+        untested_files={},
+        snapshots=[],
+        shipped_iteration=0,
     )
 
-    # Build the graph
-    graph = create_graph(state)
+
+def _stream(state: GraphState, entry_point: str = "plan"):
+    """
+    Runs the graph from entry_point and yields ("file" | "node" | "done", ...)
+    events. With checkpoints enabled, the state and a workspace snapshot are
+    stored after every node so the run can be resumed from there.
+    """
+    store, metrics, config = _start(state)
+    graph = create_graph(state, entry_point)
+    final_state = dict(state)
+    try:
+        for mode, chunk in graph.stream(
+            state, config=config, stream_mode=["updates", "custom"]
+        ):
+            yield from _events(store, mode, chunk, final_state)
+    except GeneratorExit:
+        _finish(store, metrics, "interrupted", final_state, "graph")
+        raise
+    except Exception:
+        _finish(store, metrics, "failed", final_state, "graph")
+        raise
+
+    _ship_best(final_state)
+    _finish(store, metrics, "done", final_state, "graph")
+    yield "done", final_state
+
+
+async def _astream(state: GraphState, entry_point: str = "plan"):
+    """
+    _stream on the event loop: the graph's async nodes await the model and
+    pytest, so many runs can share one loop without a thread each.
+    """
+    store, metrics, config = _start(state)
+    graph = create_graph(state, entry_point, use_async=True)
+    final_state = dict(state)
+    try:
+        async for mode, chunk in graph.astream(
+            state, config=config, stream_mode=["updates", "custom"]
+        ):
+            for event in _events(store, mode, chunk, final_state):
+                yield event
+    except (GeneratorExit, asyncio.CancelledError):
+        _finish(store, metrics, "interrupted", final_state, "graph_async")
+        raise
+    except Exception:
+        _finish(store, metrics, "failed", final_state, "graph_async")
+        raise
+
+    _ship_best(final_state)
+    _finish(store, metrics, "done", final_state, "graph_async")
+    yield "done", final_state
+
+
+def _start(state: GraphState):
+    """Registers the run; returns its run store, metrics and graph config."""
+    from agents.metrics import MetricsCallbackHandler, RunMetrics
+
+    store = get_run_store()
+    run_id = state["run_id"]
+    if store is not None:
+        store.start_run(run_id, state["user_prompt"], state["workspace"])
+
+    # Node, LLM call and parser timings for this run (see agents.metrics)
+    metrics = RunMetrics(run_id)
+    config = {"callbacks": [MetricsCallbackHandler(metrics)]}
+    return store, metrics, config
+
+
+def _events(store, mode: str, chunk: dict, final_state: dict):
+    """Turns one graph stream chunk into run events, checkpointing node updates."""
+    if mode == "custom" and chunk.get("event") == "file":
+        yield "file", chunk
+    elif mode == "updates":
+        for node, update in chunk.items():
+            final_state.update(update or {})
+            if store is not None:
+                files, hashes = get_workspace(final_state["workspace"]).snapshot()
+                store.save(final_state["run_id"], node, final_state, files, hashes)
+            yield "node", {"node": node, "state": dict(final_state)}
+
+
+def _ship_best(final_state: dict):
+    """Ships the best iteration's code, not necessarily the last one."""
+    snapshots = final_state.get("snapshots") or []
+    if snapshots:
+        final_state["shipped_iteration"] = snapshots[-1]["iteration"]
+    restored = restore_best_snapshot(final_state)
+    if restored is not None:
+        final_state["shipped_iteration"] = restored["iteration"]
+        print(
+            f"⏪ [Graph] Iteration {snapshots[-1]['iteration']} scored worse; "
+            f"shipping the code of iteration {restored['iteration']} "
+            f"({restored['tests']})"
+        )
+
+
+def _finish(store, metrics, status: str, final_state: dict, pipeline: str):
+    from agents.metrics import get_metrics_registry
+    from agents.telemetry import record_run
+
+    if store is not None:
+        store.finish(metrics.run_id, status)
+    metrics.finish(status)
+    # Kept on disk across restarts for capacity reports (see report.py)
+    record_run(get_metrics_registry().record(metrics), final_state, pipeline)
+
+
+def run_agentic_pipeline(prompt: str, workspace: str = None, run_id: str = None):
+    # Initialize the state schema
+    state = _initial_state(prompt, workspace, run_id)
 
     print("\n🚀 Starting LangGraph Agentic Coding Pair\n")
+    print(f"🆔 Run id: {state['run_id']}")
     # Run the graph
-    final_state = graph.invoke(state)
+    final_state = state
+    for event, payload in _stream(state):
+        if event == "done":
+            final_state = payload
     print("\n🏁 Agent completed!")
 
     return final_state
+
+
+def stream_agentic_pipeline(prompt: str, workspace: str = None, run_id: str = None):
+    """
+    Runs the same graph as run_agentic_pipeline but yields progress while it runs:
+      ("file", {"filename", "bytes"})  as soon as the coder wrote a file
+      ("node", {"node", "state"})      after each plan/code/check/test node
+      ("done", final_state)            once the graph finished
+
+    workspace is the directory this run writes to and tests in (default
+    "workspace"); concurrent runs must each pass their own.
+    """
+    state = _initial_state(prompt, workspace, run_id)
+
+    print("\n🚀 Starting LangGraph Agentic Coding Pair (streaming)\n")
+    yield from _stream(state)
+    print("\n🏁 Agent completed!")
+
+
+async def arun_agentic_pipeline(prompt: str, workspace: str = None, run_id: str = None):
+    """run_agentic_pipeline on the running event loop (see _astream)."""
+    state = _initial_state(prompt, workspace, run_id)
+
+    print("\n🚀 Starting LangGraph Agentic Coding Pair (async)\n")
+    print(f"🆔 Run id: {state['run_id']}")
+    final_state = state
+    async for event, payload in _astream(state):
+        if event == "done":
+            final_state = payload
+    print("\n🏁 Agent completed!")
+
+    return final_state
+
+
+async def astream_agentic_pipeline(
+    prompt: str, workspace: str = None, run_id: str = None
+):
+    """
+    Async generator yielding the same events as stream_agentic_pipeline;
+    awaiting it never blocks the event loop on the model or on pytest.
+    """
+    state = _initial_state(prompt, workspace, run_id)
+
+    print("\n🚀 Starting LangGraph Agentic Coding Pair (async streaming)\n")
+    async for event in _astream(state):
+        yield event
+    print("\n🏁 Agent completed!")
+
+
+def stream_resume(run_id: str, workspace: str = None):
+    """
+    Continues a checkpointed run after its last completed node, restoring the
+    workspace snapshot first. Yields the same events as stream_agentic_pipeline.
+    workspace overrides the directory the run originally used.
+    """
+    store = get_run_store()
+    if store is None:
+        raise RuntimeError("Run checkpoints are disabled (RUN_CHECKPOINTS=0)")
+    run = store.get_run(run_id)
+    if run is None:
+        raise ValueError(f"Unknown run id: {run_id}")
+
+    checkpoint = store.latest(run_id)
+    if checkpoint is None:
+        # Nothing completed yet: start over with the original prompt
+        state = _initial_state(run["prompt"], workspace or run["workspace"], run_id)
+        entry_point = "plan"
+    else:
+        state = GraphState(**checkpoint["state"])
+        state["workspace"] = workspace or state["workspace"]
+        vfs = get_workspace(state["workspace"])
+        # Files the checkpoint does not have (left by other runs, or written
+        # after it) would otherwise be tested as part of this run
+        for path in set(vfs.snapshot()[1]) - set(checkpoint["files"]):
+            vfs.remove(path)
+        for path, data in checkpoint["files"].items():
+            vfs.write(path, data)
+        entry_point = next_node(checkpoint["node"], state)
+
+    if entry_point == END:
+        print(f"✅ Run {run_id} already finished.")
+        store.finish(run_id, "done")
+        yield "done", state
+        return
+
+    print(f"\n⏯️ Resuming run {run_id} at '{entry_point}'\n")
+    yield from _stream(state, entry_point)
+    print("\n🏁 Agent completed!")
+
+
+def resume(run_id: str, workspace: str = None):
+    """Resumes a checkpointed run (see stream_resume) and returns its final state."""
+    final_state = None
+    for event, payload in stream_resume(run_id, workspace):
+        if event == "done":
+            final_state = payload
+    return final_state
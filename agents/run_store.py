@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_RUN_STORE_PATH = os.path.join(".cache", "runs.sqlite")
+
+
+class RunStore:
+    """
+    Local SQLite record of pipeline runs, so a crashed run can be resumed.
+
+    After every completed graph node the full state is stored as a checkpoint,
+    together with a snapshot of the run's workspace. File contents are stored
+    once per content hash; each checkpoint only references them.
+    """
+
+    def __init__(self, path: str = DEFAULT_RUN_STORE_PATH, max_runs: int = 50):
+        self.path = path
+        self.max_runs = max_runs
+
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY,"
+            " prompt TEXT NOT NULL,"
+            " workspace TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " run_id TEXT NOT NULL,"
+            " step INTEGER NOT NULL,"
+            " node TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (run_id, step));"
+            "CREATE TABLE IF NOT EXISTS checkpoint_files ("
+            " run_id TEXT NOT NULL,"
+            " step INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " PRIMARY KEY (run_id, step, path));"
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY,"
+            " content BLOB NOT NULL);"
+        )
+        self._conn.commit()
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def start_run(self, run_id: str, prompt: str, workspace: str) -> None:
+        now = time.time()
+        with self._lock:
+            # A resumed run keeps its row and is marked running again
+            self._conn.execute(
+                "INSERT INTO runs"
+                " (run_id, prompt, workspace, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'running', ?, ?)"
+                " ON CONFLICT(run_id) DO UPDATE SET status = 'running',"
+                " workspace = excluded.workspace, updated_at = excluded.updated_at",
+                (run_id, prompt, workspace, now, now),
+            )
+            self._prune()
+            self._conn.commit()
+
+    def save(
+        self,
+        run_id: str,
+        node: str,
+        state: dict,
+        files: Dict[str, bytes],
+        hashes: Dict[str, str],
+    ) -> int:
+        """Stores the state after node and the workspace files; returns the step."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn
+            step = cur.execute(
+                "SELECT COALESCE(MAX(step), -1) + 1 FROM checkpoints WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()[0]
+            cur.execute(
+                "INSERT INTO checkpoints (run_id, step, node, state, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (run_id, step, node, json.dumps(state, default=str), now),
+            )
+            for path, digest in hashes.items():
+                cur.execute(
+                    "INSERT OR IGNORE INTO blobs (hash, content) VALUES (?, ?)",
+                    (digest, files[path]),
+                )
+                cur.execute(
+                    "INSERT INTO checkpoint_files (run_id, step, path, hash)"
+                    " VALUES (?, ?, ?, ?)",
+                    (run_id, step, path, digest),
+                )
+            cur.execute(
+                "UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id)
+            )
+            cur.commit()
+        return step
+
+    def finish(self, run_id: str, status: str = "done") -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id),
+            )
+            self._conn.commit()
+
+    def _prune(self) -> None:
+        """Keeps the max_runs most recent runs and drops unreferenced blobs."""
+        old = self._conn.execute(
+            "SELECT run_id FROM runs ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+            (self.max_runs,),
+        ).fetchall()
+        if not old:
+            return
+        for (run_id,) in old:
+            for table in ("runs", "checkpoints", "checkpoint_files"):
+                self._conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+        self._conn.execute(
+            "DELETE FROM blobs WHERE hash NOT IN"
+            " (SELECT DISTINCT hash FROM checkpoint_files)"
+        )
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    def get_run(self, run_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT prompt, workspace, status, created_at, updated_at"
+                " FROM runs WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("prompt", "workspace", "status", "created_at", "updated_at")
+        return {"run_id": run_id, **dict(zip(keys, row))}
+
+    def list_runs(self, limit: int = 20) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id FROM runs ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self.get_run(run_id) for (run_id,) in rows]
+
+    def latest(self, run_id: str) -> Optional[dict]:
+        """
+        Returns the last checkpoint of a run as {"step", "node", "state", "files"},
+        or None when no node has completed yet.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT step, node, state FROM checkpoints WHERE run_id = ?"
+                " ORDER BY step DESC LIMIT 1",
+                (run_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT f.path, b.content FROM checkpoint_files f"
+                " JOIN blobs b ON b.hash = f.hash"
+                " WHERE f.run_id = ? AND f.step = ?",
+                (run_id, row[0]),
+            ).fetchall()
+        return {
+            "step": row[0],
+            "node": row[1],
+            "state": json.loads(row[2]),
+            "files": {path: bytes(content) for path, content in files},
+        }
+
+
+# -----------------------------
+# Process-wide store instance
+# -----------------------------
+_store: Optional[RunStore] = None
+_store_lock = threading.Lock()
+
+
+def get_run_store() -> Optional[RunStore]:
+    """
+    Returns the shared run store, or None when RUN_CHECKPOINTS is disabled.
+
+    Environment:
+        RUN_CHECKPOINTS=0        disable checkpointing (enabled by default)
+        RUN_STORE_PATH           SQLite file (default .cache/runs.sqlite)
+        RUN_STORE_MAX_RUNS       older runs are pruned beyond this many
+    """
+    global _store
+
+    if os.getenv("RUN_CHECKPOINTS", "1").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _store_lock:
+        if _store is None:
+            _store = RunStore(
+                path=os.getenv("RUN_STORE_PATH", DEFAULT_RUN_STORE_PATH),
+                max_runs=int(os.getenv("RUN_STORE_MAX_RUNS", "50")),
+            )
+        return _store
@@ -0,0 +1,214 @@
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+
+from agents.virtual_workspace import get_workspace
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(".cache", "blobs")
+
+
+class BlobStore:
+    """
+    Content-addressed store of workspace files: one read-only file per content
+    hash under root. A snapshot of a workspace is just {path: hash}, so files
+    that did not change between iterations (or runs) are stored once, and a
+    snapshot is materialized by hardlinking its blobs into a directory.
+    """
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, max_age_s: float = None):
+        self.root = root
+        self.max_age_s = max_age_s
+        os.makedirs(root, exist_ok=True)
+
+        self.stored_bytes = 0
+        self.shared_bytes = 0
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes, digest: str) -> bool:
+        """Stores data under its sha256 digest; returns False if already stored."""
+        path = self.path(digest)
+        if os.path.exists(path):
+            # Refresh the age of blobs that are still in use
+            os.utime(path)
+            with self._lock:
+                self.shared_bytes += len(data)
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(data)
+        os.chmod(tmp_path, 0o444)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stored_bytes += len(data)
+        return True
+
+    def read(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as f:
+            return f.read()
+
+    def snapshot(self, workspace: str) -> Dict[str, str]:
+        """Stores the files of a run's workspace; returns {path: hash}."""
+        files, hashes = get_workspace(workspace).snapshot()
+        for path, digest in hashes.items():
+            self.put(files[path], digest)
+        return hashes
+
+    def materialize(self, hashes: Dict[str, str], target: str) -> None:
+        """
+        Puts the files of a snapshot under target as hardlinks to the blobs
+        (copies where the filesystem cannot link), replacing existing files.
+        """
+        for path, digest in hashes.items():
+            filepath = os.path.join(target, path)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+            try:
+                os.link(self.path(digest), tmp_path)
+            except OSError:
+                shutil.copyfile(self.path(digest), tmp_path)
+            os.replace(tmp_path, filepath)
+
+    def prune(self) -> int:
+        """Drops blobs not used for max_age_s; returns how many were removed."""
+        if not self.max_age_s:
+            return 0
+        cutoff = time.time() - self.max_age_s
+        removed = 0
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stored_bytes": self.stored_bytes,
+                "shared_bytes": self.shared_bytes,
+            }
+
+
+# -----------------------------
+# Scoring and rollback
+# -----------------------------
+def snapshot_score(test_output: dict, static_check: List[str]) -> List[int]:
+    """
+    Lower is better: passing, then fewest failures, then most passes. Only
+    comparable between full-suite runs (and static check failures).
+    """
+    if static_check:
+        return [2, len(static_check), 0]
+    passed = test_output.get("passed", 0)
+    failing = (
+        test_output.get("failed", 0)
+        + test_output.get("errors", 0)
+        + len(test_output.get("collection_errors") or [])
+        + int(bool(test_output.get("timed_out")))
+    )
+    if failing == 0 and passed > 0:
+        return [0, 0, 0]
+    if failing == 0:
+        failing = 1  # no test ran at all
+    return [1, failing, -passed]
+
+
+def best_snapshot(snapshots: List[dict]) -> Optional[dict]:
+    """
+    The best-scoring snapshot; the latest one wins a tie. Snapshots without a
+    score (untested, or only a failing subset of the tests ran) are skipped.
+    """
+    best = None
+    for snapshot in snapshots:
+        if snapshot.get("score") is None:
+            continue
+        if best is None or snapshot["score"] <= best["score"]:
+            best = snapshot
+    return best
+
+
+def shipped_test_output(state: dict) -> dict:
+    """
+    Test results of the code a run ships, an earlier iteration's if rolled
+    back. "partial" is set when they only cover the affected tests.
+    """
+    test_output = dict(state.get("test_output") or {})
+    test_output["partial"] = bool(test_output.get("selected"))
+    shipped = state.get("shipped_iteration")
+    for snapshot in state.get("snapshots") or []:
+        if snapshot["iteration"] == shipped and snapshot.get("tests"):
+            test_output = {"partial": False, **snapshot["tests"]}
+    return test_output
+
+
+def restore_best_snapshot(state: dict) -> Optional[dict]:
+    """
+    Rolls the run's workspace back to its best-scoring snapshot when the last
+    iteration made things worse, so that is the code that gets packaged.
+    Returns the restored snapshot, or None when the workspace is kept.
+    """
+    store = get_blob_store()
+    best = best_snapshot(state.get("snapshots") or [])
+    if store is None or best is None:
+        return None
+
+    vfs = get_workspace(state["workspace"])
+    _, current = vfs.snapshot()
+    if current == best["files"]:
+        return None
+
+    for path in set(current) - set(best["files"]):
+        vfs.remove(path)
+    for path, digest in best["files"].items():
+        if current.get(path) != digest:
+            vfs.write(path, store.read(digest))
+
+    # Mirror it on disk through hardlinks where pytest already ran
+    if os.path.isdir(vfs.root):
+        needed = {p: h for p, h in best["files"].items() if vfs.needed_by_pytest(p)}
+        store.materialize(needed, vfs.root)
+        vfs.mark_on_disk(needed)
+    return best
+
+
+# -----------------------------
+# Process-wide store instance
+# -----------------------------
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    """
+    Returns the shared snapshot blob store, or None when SNAPSHOTS is disabled.
+
+    Environment:
+        SNAPSHOTS=0              disable iteration snapshots and rollback
+        SNAPSHOT_DIR             blob directory (default .cache/blobs)
+        SNAPSHOT_MAX_AGE_H       blobs unused for longer are pruned (0 = never)
+    """
+    global _store
+
+    if os.getenv("SNAPSHOTS", "1").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _store_lock:
+        if _store is None:
+            max_age_h = float(os.getenv("SNAPSHOT_MAX_AGE_H", "168"))
+            _store = BlobStore(
+                root=os.getenv("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR),
+                max_age_s=max_age_h * 3600 if max_age_h > 0 else None,
+            )
+            _store.prune()
+        return _store
@@ -0,0 +1,259 @@
+import ast
+import importlib.util
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+from agents.import_graph import module_name
+
+# Exceptions whose handlers mark an import as optional
+IMPORT_GUARDS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+
+
+@dataclass
+class Diagnostic:
+    path: str
+    line: int
+    kind: str
+    message: str
+
+    def __str__(self) -> str:
+        # "path.py:N:" is the location format context_builder picks files from
+        return f"{self.path}:{self.line}: {self.kind}: {self.message}"
+
+
+@lru_cache(maxsize=None)
+def _installed(top_level: str) -> bool:
+    """Whether a module outside the workspace (stdlib / site-packages) exists."""
+    try:
+        return importlib.util.find_spec(top_level) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _guarded(handlers: List[ast.ExceptHandler]) -> bool:
+    for handler in handlers:
+        if handler.type is None:
+            return True
+        types = (
+            handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        )
+        if any(isinstance(t, ast.Name) and t.id in IMPORT_GUARDS for t in types):
+            return True
+    return False
+
+
+def _checked_imports(tree: ast.Module) -> List[ast.stmt]:
+    """Import statements, minus those inside a try that catches ImportError."""
+    found = []
+
+    def visit(node: ast.AST):
+        if isinstance(node, ast.Try) and _guarded(node.handlers):
+            for child in node.handlers + node.orelse + node.finalbody:
+                visit(child)
+            return
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            found.append(node)
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    visit(tree)
+    return found
+
+
+def _target_names(targets: List[ast.AST]) -> Set[str]:
+    return {
+        n.id for target in targets for n in ast.walk(target) if isinstance(n, ast.Name)
+    }
+
+
+def _defined_names(tree: ast.Module) -> Optional[Set[str]]:
+    """
+    Top-level names a module defines, including ones defined conditionally,
+    or None when they cannot be known statically (star imports, module
+    __getattr__).
+    """
+    names = set()
+    pending = list(tree.body)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            continue
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.Assign):
+            names |= _target_names(node.targets)
+        elif isinstance(node, (ast.AnnAssign, ast.AugAssign, ast.For, ast.AsyncFor)):
+            names |= _target_names([node.target])
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            names |= _target_names(
+                [i.optional_vars for i in node.items if i.optional_vars]
+            )
+        # Blocks of if / try / for / while / with run at import time too
+        for field in ("body", "orelse", "finalbody"):
+            pending.extend(getattr(node, field, None) or [])
+        for handler in getattr(node, "handlers", None) or []:
+            pending.extend(handler.body)
+
+    return None if "__getattr__" in names else names
+
+
+class WorkspaceIndex:
+    """Module names of the workspace's Python files, as pytest imports them."""
+
+    def __init__(self, paths: List[str]):
+        self.modules = {module_name(p): p for p in paths}
+        self.top_level = {m.split(".")[0] for m in self.modules}
+        # Directories holding modules, importable as (namespace) packages
+        self.packages = {
+            m.rsplit(".", i)[0]
+            for m in self.modules
+            for i in range(1, m.count(".") + 1)
+        }
+
+    def _candidates(self, name: str, importer: str) -> List[str]:
+        # From the workspace root, and from the importer's directory (pytest's
+        # rootdir-based sys.path insertion)
+        package = os.path.dirname(importer).replace("/", ".")
+        return [name, f"{package}.{name}"] if package else [name]
+
+    def resolve(self, name: str, importer: str) -> Optional[str]:
+        """The workspace file of module `name` as imported from `importer`."""
+        for candidate in self._candidates(name, importer):
+            if candidate in self.modules:
+                return self.modules[candidate]
+        return None
+
+    def is_package(self, name: str, importer: str) -> bool:
+        return any(c in self.packages for c in self._candidates(name, importer))
+
+    def is_local(self, name: str, importer: str) -> bool:
+        """Whether `name` lives in a workspace package, even if it is missing."""
+        return "." in name and any(
+            c.split(".")[0] in self.top_level for c in self._candidates(name, importer)
+        )
+
+
+def _relative_base(importer: str, level: int) -> str:
+    package = module_name(importer).split(".")
+    if not importer.endswith("__init__.py"):
+        package = package[:-1]
+    package = package[: len(package) - (level - 1)] if level > 1 else package
+    return ".".join(package)
+
+
+def _missing_module(
+    index: WorkspaceIndex, module: str, path: str, node: ast.stmt
+) -> Optional[Diagnostic]:
+    """A diagnostic when `module` is neither a workspace file nor installed."""
+    if index.is_local(module, path) or getattr(node, "level", 0):
+        return Diagnostic(
+            path,
+            node.lineno,
+            "ModuleNotFoundError",
+            f"no workspace module named '{module}'",
+        )
+    top_level = module.split(".")[0]
+    if not _installed(top_level):
+        return Diagnostic(
+            path,
+            node.lineno,
+            "ModuleNotFoundError",
+            f"No module named '{top_level}' (not in the workspace and not installed)",
+        )
+    return None
+
+
+def check_workspace(files: Dict[str, str]) -> List[Diagnostic]:
+    """
+    Checks generated Python files without running them: every file must
+    parse and compile to bytecode, every import of a workspace module must
+    resolve to a file, `from module import name` must name something that
+    module defines, and third-party imports must be installed.
+    """
+    files = {p.replace("\\", "/"): code for p, code in files.items()}
+    index = WorkspaceIndex(list(files))
+    diagnostics: List[Diagnostic] = []
+    trees: Dict[str, ast.Module] = {}
+
+    # 1. Syntax and bytecode compilation
+    for path, code in sorted(files.items()):
+        try:
+            tree = ast.parse(code, filename=path)
+            compile(tree, path, "exec")
+        except SyntaxError as e:
+            diagnostics.append(
+                Diagnostic(path, e.lineno or 1, type(e).__name__, e.msg or str(e))
+            )
+            continue
+        except ValueError as e:
+            diagnostics.append(Diagnostic(path, 1, "SyntaxError", str(e)))
+            continue
+        trees[path] = tree
+
+    # 2. Imports and imported names
+    defined: Dict[str, Optional[Set[str]]] = {}
+
+    def names_of(path: str) -> Optional[Set[str]]:
+        if path not in defined:
+            defined[path] = _defined_names(trees[path]) if path in trees else None
+        return defined[path]
+
+    for path, tree in trees.items():
+        for node in _checked_imports(tree):
+            if isinstance(node, ast.Import):
+                modules = [(alias.name, None) for alias in node.names]
+            elif node.level:
+                base = _relative_base(path, node.level)
+                module = ".".join(p for p in (base, node.module) if p)
+                # A relative import from a top-level file fails at import time
+                # anyway; pytest reports that better than a guess here
+                modules = [(module, node.names)] if module else []
+            else:
+                modules = [(node.module, node.names)]
+
+            for module, aliases in modules:
+                target = index.resolve(module, path)
+                if target is not None:
+                    names = names_of(target)
+                elif index.is_package(module, path):
+                    # A directory without __init__.py: only submodules import
+                    names = set()
+                else:
+                    missing = _missing_module(index, module, path, node)
+                    if missing:
+                        diagnostics.append(missing)
+                    continue
+
+                for alias in aliases or []:
+                    if names is None or alias.name == "*" or alias.name in names:
+                        continue
+                    if index.resolve(f"{module}.{alias.name}", path):
+                        # A submodule of a package
+                        continue
+                    diagnostics.append(
+                        Diagnostic(
+                            path,
+                            node.lineno,
+                            "ImportError",
+                            f"cannot import name '{alias.name}' from '{module}' "
+                            f"({target or module.replace('.', '/') + '/'})",
+                        )
+                    )
+    return diagnostics
+
+
+def format_diagnostics(diagnostics: List[Diagnostic], max_items: int = 30) -> str:
+    """Feedback for the coder, in the same spirit as TesterAgent.analyze_results."""
+    lines = [str(d) for d in diagnostics[:max_items]]
+    if len(diagnostics) > max_items:
+        lines.append(f"... {len(diagnostics) - max_items} more")
+    return (
+        f"❌ Static pre-check failed ({len(diagnostics)} problem(s)); "
+        "tests were not run. Details:\n" + "\n".join(lines)
+    )
@@ -0,0 +1,380 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from agents.metrics import percentile
+from agents.snapshots import shipped_test_output
+
+DEFAULT_TELEMETRY_PATH = os.path.join(".cache", "telemetry.sqlite")
+REPORT_QUANTILES = (0.5, 0.95, 0.99)
+
+COLUMNS = (
+    "run_id",
+    "pipeline",
+    "started_at",
+    "duration_s",
+    "status",
+    "outcome",
+    "prompt_hash",
+    "modules",
+    "iterations",
+    "iterations_to_green",
+    "stop_reason",
+    "shipped_iteration",
+    "llm_calls",
+    "llm_s",
+    "prompt_tokens",
+    "completion_tokens",
+    "tests_passed",
+    "tests_failed",
+    "tests_partial",
+    "pass_rate",
+    "node_s",
+)
+
+
+def prompt_hash(prompt: str) -> str:
+    """Groups runs of the same prompt without storing the prompt itself."""
+    return hashlib.sha256((prompt or "").strip().encode()).hexdigest()[:16]
+
+
+def run_record(metrics: dict, state: dict, pipeline: str) -> dict:
+    """
+    One telemetry row from a finished run's metrics (RunMetrics.to_dict) and
+    final state. outcome is "passed" / "failed" by the shipped code's tests,
+    or "error" when the pipeline itself failed or was interrupted.
+    """
+    tests = shipped_test_output(state)
+    passed = tests.get("passed", 0)
+    failed = tests.get("failed", 0) + tests.get("errors", 0)
+    green = (
+        passed > 0
+        and failed == 0
+        and not tests.get("timed_out")
+        and not state.get("static_check")
+    )
+    if metrics["status"] != "done":
+        outcome = "error"
+    else:
+        outcome = "passed" if green else "failed"
+
+    node_s: Dict[str, float] = {}
+    for node in metrics["nodes"]:
+        node_s[node["node"]] = round(
+            node_s.get(node["node"], 0.0) + node["duration_s"], 4
+        )
+
+    totals = metrics["totals"]
+    iterations = state.get("iteration", 0)
+    return {
+        "run_id": metrics["run_id"],
+        "pipeline": pipeline,
+        "started_at": metrics["started_at"],
+        "duration_s": metrics["duration_s"],
+        "status": metrics["status"],
+        "outcome": outcome,
+        "prompt_hash": prompt_hash(state.get("user_prompt", "")),
+        "modules": len((state.get("plan") or {}).get("modules") or []),
+        "iterations": iterations,
+        # The loop stops at the first passing iteration, which is also the best
+        "iterations_to_green": (
+            (state.get("shipped_iteration") or iterations) if green else None
+        ),
+        "stop_reason": state.get("stop_reason") or None,
+        "shipped_iteration": state.get("shipped_iteration"),
+        "llm_calls": totals["llm_calls"],
+        "llm_s": totals["llm_s"],
+        "prompt_tokens": totals["prompt_tokens"],
+        "completion_tokens": totals["completion_tokens"],
+        "tests_passed": passed,
+        "tests_failed": failed,
+        # Counts of a failing affected-tests subset, not of the whole suite
+        "tests_partial": tests["partial"],
+        "pass_rate": (
+            round(passed / (passed + failed), 4)
+            if passed + failed and not tests["partial"]
+            else None
+        ),
+        "node_s": node_s,
+    }
+
+
+class TelemetryStore:
+    """
+    Local SQLite history of finished pipeline runs, one row per run, kept
+    across restarts so capacity trends can be reported without an external
+    metrics service (see report.py).
+    """
+
+    def __init__(self, path: str = DEFAULT_TELEMETRY_PATH, max_age_s: float = None):
+        self.path = path
+        self.max_age_s = max_age_s
+
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT NOT NULL,"
+            " pipeline TEXT NOT NULL,"
+            " started_at REAL NOT NULL,"
+            " duration_s REAL NOT NULL,"
+            " status TEXT NOT NULL,"
+            " outcome TEXT NOT NULL,"
+            " prompt_hash TEXT NOT NULL,"
+            " modules INTEGER NOT NULL,"
+            " iterations INTEGER NOT NULL,"
+            " iterations_to_green INTEGER,"
+            " stop_reason TEXT,"
+            " shipped_iteration INTEGER,"
+            " llm_calls INTEGER NOT NULL,"
+            " llm_s REAL NOT NULL,"
+            " prompt_tokens INTEGER NOT NULL,"
+            " completion_tokens INTEGER NOT NULL,"
+            " tests_passed INTEGER NOT NULL,"
+            " tests_failed INTEGER NOT NULL,"
+            " tests_partial INTEGER NOT NULL,"
+            " pass_rate REAL,"
+            " node_s TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);"
+        )
+        self._conn.commit()
+
+    def record(self, record: dict) -> None:
+        """Appends a run; a resumed run gets a row per attempt."""
+        row = [record.get(c) for c in COLUMNS]
+        row[COLUMNS.index("node_s")] = json.dumps(record.get("node_s") or {})
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO runs ({', '.join(COLUMNS)})"
+                f" VALUES ({', '.join('?' for _ in COLUMNS)})",
+                row,
+            )
+            self._prune()
+            self._conn.commit()
+
+    def _prune(self) -> None:
+        if self.max_age_s:
+            self._conn.execute(
+                "DELETE FROM runs WHERE started_at < ?",
+                (time.time() - self.max_age_s,),
+            )
+
+    def runs(self, since: float = None, until: float = None) -> List[dict]:
+        """Runs started in [since, until), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM runs"
+                " WHERE started_at >= ? AND started_at < ? ORDER BY started_at",
+                (since or 0.0, until or float("inf")),
+            ).fetchall()
+        records = [dict(zip(COLUMNS, row)) for row in rows]
+        for record in records:
+            record["node_s"] = json.loads(record["node_s"])
+        return records
+
+
+# -----------------------------
+# Reports
+# -----------------------------
+def _quantiles(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        **{
+            f"p{int(q * 100)}": round(percentile(values, q), 4)
+            for q in REPORT_QUANTILES
+        },
+    }
+
+
+def window_report(runs: List[dict]) -> dict:
+    """Latency percentiles, outcomes and iterations-to-green of a set of runs."""
+    outcomes: Dict[str, int] = {}
+    for run in runs:
+        outcomes[run["outcome"]] = outcomes.get(run["outcome"], 0) + 1
+
+    nodes: Dict[str, List[float]] = {}
+    for run in runs:
+        for node, seconds in run["node_s"].items():
+            nodes.setdefault(node, []).append(seconds)
+
+    # Runs that never went green are counted under "never"
+    to_green: Dict[str, int] = {}
+    for run in runs:
+        if run["outcome"] == "error":
+            continue
+        key = str(run["iterations_to_green"] or "never")
+        to_green[key] = to_green.get(key, 0) + 1
+    green = [r["iterations_to_green"] for r in runs if r["iterations_to_green"]]
+
+    pass_rates = [r["pass_rate"] for r in runs if r["pass_rate"] is not None]
+    return {
+        "runs": len(runs),
+        "outcomes": outcomes,
+        "success_rate": round(outcomes.get("passed", 0) / len(runs), 4) if runs else 0,
+        "duration_s": _quantiles([r["duration_s"] for r in runs]),
+        "node_s": {name: _quantiles(v) for name, v in sorted(nodes.items())},
+        "tokens_per_run": _quantiles(
+            [r["prompt_tokens"] + r["completion_tokens"] for r in runs]
+        ),
+        "iterations_to_green": dict(
+            sorted(
+                to_green.items(),
+                key=lambda kv: float("inf") if kv[0] == "never" else int(kv[0]),
+            )
+        ),
+        "mean_iterations_to_green": (
+            round(sum(green) / len(green), 2) if green else None
+        ),
+        "mean_test_pass_rate": (
+            round(sum(pass_rates) / len(pass_rates), 4) if pass_rates else None
+        ),
+    }
+
+
+def _compared(before: dict, after: dict) -> Dict[str, tuple]:
+    """(before, after, higher_is_better) of every metric worth comparing."""
+    metrics = {}
+    for q in REPORT_QUANTILES:
+        key = f"p{int(q * 100)}"
+        metrics[f"duration_s.{key}"] = (
+            before["duration_s"][key],
+            after["duration_s"][key],
+            False,
+        )
+    for node in set(before["node_s"]) & set(after["node_s"]):
+        metrics[f"node_s.{node}.p95"] = (
+            before["node_s"][node]["p95"],
+            after["node_s"][node]["p95"],
+            False,
+        )
+    metrics["tokens_per_run.p50"] = (
+        before["tokens_per_run"]["p50"],
+        after["tokens_per_run"]["p50"],
+        False,
+    )
+    for key, higher_is_better in (
+        ("success_rate", True),
+        ("mean_iterations_to_green", False),
+        ("mean_test_pass_rate", True),
+    ):
+        metrics[key] = (before[key], after[key], higher_is_better)
+    return metrics
+
+
+def regressions(before: dict, after: dict, threshold: float = 0.1) -> List[dict]:
+    """
+    Metrics of window report `after` that got worse than in `before` by more
+    than threshold (relative), worst first.
+    """
+    found = []
+    if not before["runs"] or not after["runs"]:
+        return found
+    for name, (old, new, higher_is_better) in _compared(before, after).items():
+        if old is None or new is None or old == new:
+            continue
+        change = (new - old) / abs(old) if old else float("inf")
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            found.append(
+                {"metric": name, "before": old, "after": new, "change": change}
+            )
+    return sorted(found, key=lambda r: -abs(r["change"]))
+
+
+def format_report(
+    current: dict, baseline: Optional[dict] = None, threshold: float = 0.1
+) -> str:
+    """Plain-text report of a window, with regressions against a baseline."""
+
+    def quantiles(s: dict) -> str:
+        return "  ".join(
+            f"p{int(q * 100)} {s[f'p{int(q * 100)}']:.2f}s" for q in REPORT_QUANTILES
+        )
+
+    lines = [
+        f"Runs: {current['runs']}  "
+        + "  ".join(f"{k} {v}" for k, v in sorted(current["outcomes"].items())),
+        f"Success rate: {current['success_rate']:.0%}",
+        f"Run latency:  {quantiles(current['duration_s'])}",
+    ]
+    for node, s in current["node_s"].items():
+        lines.append(f"  {node:<10}  {quantiles(s)}")
+    lines.append(
+        f"Tokens per run: p50 {current['tokens_per_run']['p50']:.0f}"
+        f"  p95 {current['tokens_per_run']['p95']:.0f}"
+    )
+    lines.append(
+        "Iterations to green: "
+        + (
+            ", ".join(f"{k}: {v}" for k, v in current["iterations_to_green"].items())
+            or "-"
+        )
+    )
+
+    if baseline is not None:
+        lines.append("")
+        if not baseline["runs"] or not current["runs"]:
+            lines.append("No runs to compare against the baseline window.")
+        else:
+            found = regressions(baseline, current, threshold)
+            lines.append(
+                f"Regressions vs. baseline ({baseline['runs']} runs, "
+                f"> {threshold:.0%} worse): {len(found) or 'none'}"
+            )
+            for r in found:
+                lines.append(
+                    f"  ⚠️ {r['metric']}: {r['before']} → {r['after']} "
+                    f"({r['change']:+.0%})"
+                )
+    return "\n".join(lines)
+
+
+# -----------------------------
+# Process-wide store instance
+# -----------------------------
+_store: Optional[TelemetryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_telemetry_store() -> Optional[TelemetryStore]:
+    """
+    Returns the shared telemetry store, or None when TELEMETRY is disabled.
+
+    Environment:
+        TELEMETRY=0              do not record finished runs (enabled by default)
+        TELEMETRY_PATH           SQLite file (default .cache/telemetry.sqlite)
+        TELEMETRY_MAX_AGE_D      runs older than this many days are pruned (0 = never)
+    """
+    global _store
+
+    if os.getenv("TELEMETRY", "1").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _store_lock:
+        if _store is None:
+            max_age_d = float(os.getenv("TELEMETRY_MAX_AGE_D", "90"))
+            _store = TelemetryStore(
+                path=os.getenv("TELEMETRY_PATH", DEFAULT_TELEMETRY_PATH),
+                max_age_s=max_age_d * 86400 if max_age_d > 0 else None,
+            )
+        return _store
+
+
+def record_run(metrics: dict, state: dict, pipeline: str) -> Optional[dict]:
+    """Stores a finished run; telemetry never fails the run itself."""
+    store = get_telemetry_store()
+    if store is None:
+        return None
+    try:
+        record = run_record(metrics, state, pipeline)
+        store.record(record)
+        return record
+    except Exception as e:
+        print(f"⚠️ [Telemetry] Run {metrics.get('run_id')} not recorded: {e}")
+        return None
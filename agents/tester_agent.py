@@ -1,49 +1,288 @@
+import asyncio
+import copy
+import hashlib
 import subprocess
+import sys
+import tempfile
+import threading
 import os
+from typing import Dict, List, Optional, Tuple
+
+from agents.import_graph import build_import_graph, reverse_dependents
+from agents.pytest_pool import PytestWorkerPool
+from agents.pytest_results import CaseResult, RunResult, parse_junit_xml
+from agents.virtual_workspace import get_workspace
+
+
+def is_test_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.endswith(".py") and (
+        name.startswith("test_") or name.endswith("_test.py")
+    )
 
 
 class TesterAgent:
-    def __init__(self, workspace="workspace"):
+    def __init__(self, workspace="workspace", workers: int = None):
         self.workspace = workspace
 
-    def run_tests(self) -> str:
-        print("🧪 Running tests...")
-        if not os.path.exists(self.workspace):
-            return "No workspace found."
+        # Pre-warmed pytest workers with timeouts and rlimits (0 = plain subprocess)
+        if workers is None:
+            workers = int(os.getenv("TESTER_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.run_timeout = float(os.getenv("TESTER_RUN_TIMEOUT", "300"))
+        self.pool = None
+        if workers > 0:
+            self.pool = PytestWorkerPool(
+                workers=workers,
+                test_timeout=float(os.getenv("TESTER_TEST_TIMEOUT", "30")),
+                run_timeout=self.run_timeout,
+                memory_mb=int(os.getenv("TESTER_MEMORY_MB", "1024")),
+                cpu_seconds=int(os.getenv("TESTER_CPU_SECONDS", "120")),
+            )
+            self.pool.warm_up()
 
-        # Run pytest in the workspace directory
-        result = subprocess.run(
-            ["pytest", "-q", self.workspace], capture_output=True, text=True
+        # Test impact analysis state per workspace, carried across iterations
+        self._history: Dict[str, dict] = {}
+
+    def _history_for(self, workspace: str) -> dict:
+        return self._history.setdefault(
+            os.path.abspath(workspace), {"file_hashes": {}, "failing_tests": []}
         )
-        return result.stdout or result.stderr
 
-    def analyze_results(self, output: str) -> str:
-        # Convert output to lowercase for case-insensitive checks
-        output_lower = output.lower()
+    def reset(self, workspace: str = None):
+        """Forgets change/failure history of a workspace, e.g. before a new run."""
+        self._history.pop(os.path.abspath(workspace or self.workspace), None)
 
-        # 1. Check for failure summary first
-        # This specifically looks for the "FAILED" keyword and "failed, X passed" pattern
-        if "failed" in output_lower:
-            # Check if 0 tests failed (e.g., if the word 'failed' appears in a traceback)
-            # This is a robust way to check the summary line.
-            import re
+    def fork_history(self, source: str, target: str):
+        """Copies the change/failure history of one workspace to another."""
+        self._history[os.path.abspath(target)] = copy.deepcopy(
+            self._history_for(source)
+        )
 
-            # Regex to find the summary line like "X failed, Y passed"
-            match = re.search(r"(\d+)\s+failed,", output_lower)
+    def _read_workspace(self, workspace: str) -> Dict[str, str]:
+        return get_workspace(workspace).text_files(".py")
 
-            if match and int(match.group(1)) > 0:
-                return f"❌ Tests failed. Details:\n{output}"
+    @staticmethod
+    def _changed_files(history: dict, written: Dict[str, str]) -> List[str]:
+        """
+        Returns the files whose content differs from what was last seen,
+        comparing content hashes of what the coder wrote.
+        """
+        file_hashes = history["file_hashes"]
+        changed = []
+        for filename, code in written.items():
+            digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+            filename = filename.replace("\\", "/")
+            if file_hashes.get(filename) != digest:
+                changed.append(filename)
+            file_hashes[filename] = digest
+        return changed
 
-            # Fall through if the failure count is 0, or if the failure was in "no tests ran"
+    def select_tests(
+        self, changed_files: Dict[str, str], workspace: str = None
+    ) -> Optional[List[str]]:
+        """
+        Picks the test files affected by changed_files: tests that import a changed
+        module (transitively), changed tests themselves, and previously failing
+        tests. Returns None when there is no history to select from yet, or
+        when every test is affected anyway (the full suite runs right away).
+        """
+        workspace = workspace or self.workspace
+        history = self._history_for(workspace)
+        first_run = not history["file_hashes"]
+        changed = self._changed_files(history, changed_files)
+        if first_run:
+            return None
 
-        # 2. Check for "No tests ran"
-        if "no tests ran" in output_lower or "no tests found" in output_lower:
-            return "⚠️ No tests found in workspace."
+        files = self._read_workspace(workspace)
+        affected = reverse_dependents(build_import_graph(files), changed)
+        selected = {p for p in affected if is_test_file(p) and p in files}
+        selected.update(p for p in history["failing_tests"] if p in files)
+        if selected >= {p for p in files if is_test_file(p)}:
+            return None
+        return sorted(selected)
+
+    def _run_pytest(
+        self,
+        workspace: str,
+        paths: List[str] = None,
+        cancel: threading.Event = None,
+    ) -> RunResult:
+        if self.pool is not None:
+            return self.pool.run(workspace, self._test_paths(workspace, paths), cancel)
+
+        # Plain subprocess: results come back through a JUnit XML report
+        fd, report_path = tempfile.mkstemp(suffix=".xml", prefix="pytest_report_")
+        os.close(fd)
+        try:
+            proc = subprocess.run(
+                self._pytest_command(report_path, paths),
+                cwd=workspace,
+                capture_output=True,
+                text=True,
+                timeout=self.run_timeout,
+            )
+            return self._report_result(report_path, proc.stdout or proc.stderr)
+        except subprocess.TimeoutExpired:
+            return self._timeout_result()
+        finally:
+            os.remove(report_path)
+
+    async def _arun_pytest(
+        self,
+        workspace: str,
+        paths: List[str] = None,
+        cancel: threading.Event = None,
+    ) -> RunResult:
+        """_run_pytest with pytest awaited on the event loop."""
+        if self.pool is not None:
+            return await self.pool.arun(
+                workspace, self._test_paths(workspace, paths), cancel
+            )
+
+        fd, report_path = tempfile.mkstemp(suffix=".xml", prefix="pytest_report_")
+        os.close(fd)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *self._pytest_command(report_path, paths),
+                cwd=workspace,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    proc.communicate(), self.run_timeout
+                )
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                return self._timeout_result()
+            output = (stdout or stderr).decode("utf-8", errors="replace")
+            return self._report_result(report_path, output)
+        finally:
+            os.remove(report_path)
+
+    def _test_paths(self, workspace: str, paths: List[str] = None) -> List[str]:
+        if paths:
+            return paths
+        return [p for p in self._read_workspace(workspace) if is_test_file(p)]
+
+    @staticmethod
+    def _pytest_command(report_path: str, paths: List[str] = None) -> List[str]:
+        return [sys.executable, "-m", "pytest", "-q", f"--junitxml={report_path}"] + (
+            paths or []
+        )
+
+    @staticmethod
+    def _report_result(report_path: str, output: str) -> RunResult:
+        if os.path.getsize(report_path) == 0:
+            return RunResult(
+                errors=1,
+                cases=[CaseResult(nodeid=".", outcome="error", message=output[-1500:])],
+                output=output,
+            )
+        return parse_junit_xml(report_path, output=output)
 
-        # 3. Check for successful completion (only if no failures were detected)
-        # The output summary "X passed in Ys" often implies success if "failed" wasn't present.
-        if "passed" in output_lower:
-            return "✅ All tests passed!"
+    def _timeout_result(self) -> RunResult:
+        return RunResult(
+            errors=1,
+            timed_out=True,
+            output=f"test run exceeded {self.run_timeout}s and was killed",
+        )
+
+    def run_tests(
+        self,
+        changed_files: Dict[str, str] = None,
+        workspace: str = None,
+        cancel: threading.Event = None,
+    ) -> RunResult:
+        """
+        Runs the workspace tests and returns a structured RunResult. When
+        changed_files (filename -> code written by the coder) is given, only the
+        affected tests run first; the full suite only runs once that subset is green.
+        workspace overrides the agent's default directory for this run.
+        Setting cancel stops a run on the worker pool early (plain subprocess
+        runs always finish).
+        """
+        workspace = workspace or self.workspace
+        selected, missing = self._prepare_run(changed_files, workspace)
+        if missing is not None:
+            return missing
+
+        if selected:
+            result = self._run_pytest(workspace, selected, cancel)
+            if not self._subset_passed(workspace, selected, result):
+                return result
+
+        # Run pytest in the workspace directory
+        result = self._run_pytest(workspace, cancel=cancel)
+        self._history_for(workspace)["failing_tests"] = result.failing_files()
+        return result
+
+    async def arun_tests(
+        self,
+        changed_files: Dict[str, str] = None,
+        workspace: str = None,
+        cancel: threading.Event = None,
+    ) -> RunResult:
+        """
+        run_tests for the event loop: pytest runs in the same workers (or an
+        asyncio subprocess) and is awaited, so no thread waits on it.
+        """
+        workspace = workspace or self.workspace
+        selected, missing = self._prepare_run(changed_files, workspace)
+        if missing is not None:
+            return missing
+
+        if selected:
+            result = await self._arun_pytest(workspace, selected, cancel)
+            if not self._subset_passed(workspace, selected, result):
+                return result
+
+        result = await self._arun_pytest(workspace, cancel=cancel)
+        self._history_for(workspace)["failing_tests"] = result.failing_files()
+        return result
+
+    def _prepare_run(
+        self, changed_files: Optional[Dict[str, str]], workspace: str
+    ) -> Tuple[Optional[List[str]], Optional[RunResult]]:
+        """
+        Writes the workspace out for pytest and picks the affected tests.
+        Returns (selected test files, None), or (None, result) when there is
+        nothing to test.
+        """
+        print("🧪 Running tests...")
+        # Only files changed since the last run are written out for pytest
+        get_workspace(workspace).materialize()
+        if not os.path.exists(workspace):
+            return None, RunResult(output="No workspace found.")
+
+        selected = None
+        if changed_files is not None:
+            selected = self.select_tests(changed_files, workspace)
+        if selected:
+            print(f"🎯 [Tester] Running {len(selected)} affected test file(s) first")
+        return selected, None
+
+    def _subset_passed(
+        self, workspace: str, selected: List[str], result: RunResult
+    ) -> bool:
+        if not result.ok:
+            # Its counts only cover the subset; snapshots do not score it
+            result.selected = list(selected)
+            history = self._history_for(workspace)
+            history["failing_tests"] = result.failing_files() or list(selected)
+            return False
+        print("🎯 [Tester] Affected tests green, running the full suite")
+        return True
+
+    def analyze_results(self, result: RunResult, max_chars: int = 4000) -> str:
+        """
+        Turns a RunResult into compact, bounded feedback for the coder.
+        """
+        if result.ok:
+            return f"✅ All tests passed! ({result.summary_line()})"
+
+        if result.total == 0 and not result.collection_errors:
+            return "⚠️ No tests found in workspace."
 
-        # 4. Default fallback if output is unexpected
-        return f"❓ Test results were ambiguous or incomplete. Raw output:\n{output}"
+        return f"❌ Tests failed. Details:\n{result.summary(max_chars)}"
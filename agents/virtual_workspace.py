@@ -0,0 +1,223 @@
+import hashlib
+import os
+import threading
+import time
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# Besides Python sources, pytest only reads its own configuration files
+PYTEST_CONFIG_FILES = {"pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini"}
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that collects zip output in chunks."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class VirtualWorkspace:
+    """
+    In-memory project files (path -> bytes, plus content hashes) shared by the
+    coder and tester nodes of one pipeline run.
+
+    The in-memory copy is the source of truth: the coder writes and reads it
+    directly, materialize() writes to `root` only the files pytest needs that
+    changed since the last call, and iter_zip() streams the archive without a
+    temporary file.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files: Dict[str, bytes] = {}
+        self.hashes: Dict[str, str] = {}
+        self._on_disk: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, root: str) -> "VirtualWorkspace":
+        """Loads the files already present under root (e.g. a previous run)."""
+        workspace = cls(root)
+        for dirpath, _, names in os.walk(root):
+            if "__pycache__" in dirpath:
+                continue
+            for fname in names:
+                path = os.path.join(dirpath, fname)
+                rel_path = os.path.relpath(path, root).replace("\\", "/")
+                with open(path, "rb") as f:
+                    workspace.write(rel_path, f.read())
+                workspace._on_disk[rel_path] = workspace.hashes[rel_path]
+        return workspace
+
+    # -----------------------------
+    # File access
+    # -----------------------------
+    def write(self, path: str, content: Union[str, bytes]) -> bool:
+        """Stores a file; returns False when the content is unchanged."""
+        path = path.replace("\\", "/").lstrip("/")
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = _digest(data)
+        with self._lock:
+            if self.hashes.get(path) == digest:
+                return False
+            self.files[path] = data
+            self.hashes[path] = digest
+        return True
+
+    def read(self, path: str) -> str:
+        return self.files[path.replace("\\", "/")].decode("utf-8")
+
+    def remove(self, path: str) -> bool:
+        """Drops a file, from disk too; returns False when it did not exist."""
+        path = path.replace("\\", "/")
+        with self._lock:
+            if path not in self.files:
+                return False
+            del self.files[path]
+            del self.hashes[path]
+            on_disk = self._on_disk.pop(path, None)
+        if on_disk is not None:
+            try:
+                os.remove(os.path.join(self.root, path))
+            except FileNotFoundError:
+                pass
+        return True
+
+    def __contains__(self, path: str) -> bool:
+        return path.replace("\\", "/") in self.files
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def snapshot(self) -> Tuple[Dict[str, bytes], Dict[str, str]]:
+        """Returns consistent copies of (files, hashes)."""
+        with self._lock:
+            return dict(self.files), dict(self.hashes)
+
+    def text_files(self, suffix: str = ".py") -> Dict[str, str]:
+        """Returns {path: text} for the files ending with suffix."""
+        with self._lock:
+            items = sorted(self.files.items())
+        return {
+            path: data.decode("utf-8", errors="replace")
+            for path, data in items
+            if path.endswith(suffix)
+        }
+
+    # -----------------------------
+    # Disk / archive export
+    # -----------------------------
+    @staticmethod
+    def needed_by_pytest(path: str) -> bool:
+        return path.endswith(".py") or os.path.basename(path) in PYTEST_CONFIG_FILES
+
+    def materialize(self) -> List[str]:
+        """
+        Writes the files pytest needs to root, skipping those whose content is
+        already on disk. Returns the paths that were written.
+        """
+        with self._lock:
+            dirty = [
+                (path, self.files[path], digest)
+                for path, digest in self.hashes.items()
+                if self.needed_by_pytest(path) and self._on_disk.get(path) != digest
+            ]
+
+        written = []
+        for path, data, digest in dirty:
+            filepath = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            # Replace instead of rewriting in place: the old file may be a
+            # hardlink into the snapshot blob store (agents.snapshots)
+            tmp_path = f"{filepath}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as out:
+                out.write(data)
+            os.replace(tmp_path, filepath)
+            self._on_disk[path] = digest
+            written.append(path)
+        return written
+
+    def mark_on_disk(self, hashes: Dict[str, str]) -> None:
+        """Records files that were put under root by other means (hardlinks)."""
+        with self._lock:
+            self._on_disk.update(hashes)
+
+    def iter_zip(self) -> Iterator[bytes]:
+        """Yields a zip archive of every file, built in memory file by file."""
+        with self._lock:
+            items = sorted(self.files.items())
+
+        sink = _ChunkSink()
+        date_time = time.localtime()[:6]
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for path, data in items:
+                info = zipfile.ZipInfo(path, date_time=date_time)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, data)
+                yield sink.drain()
+        yield sink.drain()
+
+    def zip_bytes(self) -> bytes:
+        return b"".join(self.iter_zip())
+
+    def write_zip(self, path: str) -> str:
+        """Writes the archive to path (for the CLI); returns path."""
+        with open(path, "wb") as out:
+            for chunk in self.iter_zip():
+                out.write(chunk)
+        return path
+
+
+# -----------------------------
+# Per-run registry
+# -----------------------------
+_workspaces: Dict[str, VirtualWorkspace] = {}
+_registry_lock = threading.Lock()
+
+
+def get_workspace(root: str) -> VirtualWorkspace:
+    """
+    Returns the in-memory workspace of a run, keyed by its directory. The first
+    call loads whatever already exists on disk there.
+    """
+    key = os.path.abspath(root)
+    with _registry_lock:
+        if key not in _workspaces:
+            _workspaces[key] = VirtualWorkspace.from_directory(root)
+        return _workspaces[key]
+
+
+def fork_workspace(source_root: str, root: str) -> VirtualWorkspace:
+    """
+    Registers an in-memory copy of source_root's files under root, e.g. for a
+    fix candidate that must not touch the run's own workspace. Nothing of it is
+    on disk yet, so the first materialize() writes every file.
+    """
+    files, hashes = get_workspace(source_root).snapshot()
+    workspace = VirtualWorkspace(root)
+    workspace.files, workspace.hashes = files, hashes
+    with _registry_lock:
+        _workspaces[os.path.abspath(root)] = workspace
+    return workspace
+
+
+def release_workspace(root: str) -> Optional[VirtualWorkspace]:
+    """Forgets a run's workspace and hands it back (e.g. to serve the download)."""
+    with _registry_lock:
+        return _workspaces.pop(os.path.abspath(root), None)
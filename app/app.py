@@ -1,55 +1,140 @@
 import gradio as gr
-import shutil
 import os
+import threading
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from app_helper import (
+    cleanup_artifacts,
     delete_workspace,
-    make_workspace,
+    format_progress,
+    get_artifact,
+    make_run_workspace,
+    new_run_id,
+    store_artifact,
 )
 
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 os.sys.path.append(project_root)
 
-from agents.run_Agent import run_agentic_pipeline
+from agents.agent_factory import get_tester, warm_up
+from agents.metrics import get_metrics_registry
+from agents.run_Agent import astream_agentic_pipeline
+from agents.virtual_workspace import release_workspace
 
 # Assuming you have implemented the run_agentic_pipeline function
 # to return the final state as requested earlier.
 
 
-def run_project(prompt):
-    directory = "workspace"
-    make_workspace(directory)
-
-    # 1. Run the pipeline and get the final state
-    final_state = run_agentic_pipeline(prompt)
+async def run_project(prompt, request: gr.Request = None):
+    # Every run gets its own workspace so concurrent users never share files
+    run_id = new_run_id(getattr(request, "session_hash", None))
+    directory = make_run_workspace(run_id)
+    cleanup_artifacts()
+
+    # Runs on the server's event loop: while a pipeline waits on the model or
+    # on pytest, the loop serves the other runs
+    try:
+        async for outputs in _run_in_workspace(prompt, run_id, directory):
+            yield outputs
+    finally:
+        release_workspace(directory)
+        delete_workspace(directory)
+        # The tester's per-workspace history would otherwise grow with every run
+        get_tester().reset(directory)
+
+
+async def _run_in_workspace(prompt, run_id, directory):
+    # 1. Stream the pipeline, updating the UI after every file and node
+    progress = []
+    plan_output = None
+    final_state = {}
+    async for event, payload in astream_agentic_pipeline(
+        prompt, workspace=directory, run_id=run_id
+    ):
+        if event == "file":
+            progress.append(
+                f"📄 Wrote {payload['filename']} ({payload['bytes']} bytes)"
+            )
+        elif event == "node":
+            progress.append(format_progress(payload["node"], payload["state"]))
+            plan_output = payload["state"].get("plan") or plan_output
+        elif event == "done":
+            final_state = payload
+        yield plan_output, "\n".join(progress), None
 
     # 2. Extract outputs for Gradio interface
     plan_output = final_state.get("plan", {"error": "Plan not found in state."})
-    progress_results = final_state.get(
-        "feedback", "Pipeline ran but returned no final feedback."
+    progress_results = (
+        "\n".join(progress)
+        + "\n\n"
+        + final_state.get("feedback", "Pipeline ran but returned no final feedback.")
     )
 
-    # 3. Create downloadable zip
-    zip_filename = "workspace_output"
-    zip_path = f"{zip_filename}.zip"
+    # 3. Keep the files in memory; the zip is streamed when it is downloaded
+    store_artifact(run_id, release_workspace(directory))
+    download_link = f"[⬇️ Download Generated Code (.zip)](/download/{run_id}.zip)"
 
-    shutil.make_archive(zip_filename, "zip", directory)
+    # 4. Return the three expected outputs
+    yield plan_output, progress_results, download_link
 
-    delete_workspace(directory)
 
-    # 4. Return the three expected outputs
-    return plan_output, progress_results, zip_path
+# ----------------------------------------------------
+# Zip download, streamed straight from the in-memory workspace
+# ----------------------------------------------------
+app = FastAPI()
+
+
+@app.get("/download/{run_id}.zip")
+def download_workspace(run_id: str):
+    workspace = get_artifact(run_id)
+    if workspace is None:
+        raise HTTPException(status_code=404, detail="Download expired or not found.")
+    return StreamingResponse(
+        workspace.iter_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="workspace_output.zip"'},
+    )
+
+
+# ----------------------------------------------------
+# Metrics: Prometheus text for scraping, JSON per run and p50/p95 summary
+# ----------------------------------------------------
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(
+        get_metrics_registry().prometheus_text(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/metrics/summary")
+def metrics_summary():
+    from llm.router import get_model_router
+
+    summary = get_metrics_registry().aggregate()
+    router = get_model_router()
+    if router is not None:
+        # Observed latency, timeouts and cooldowns of each model tier
+        summary["model_tiers"] = router.stats()
+    return summary
+
+
+@app.get("/metrics/runs/{run_id}")
+def run_metrics(run_id: str):
+    metrics = get_metrics_registry().get(run_id)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="No metrics for this run.")
+    return metrics
 
 
 # ----------------------------------------------------
 # 🌟 NEW: Define the layout using gr.Blocks
 # ----------------------------------------------------
 with gr.Blocks(title="Autonomous Coding Agent") as demo:
-    gr.Markdown(
-        """
+    gr.Markdown("""
         # 🧠 Autonomous Coding Agent
         Describe your project idea below and watch the Planner, Coder, and Tester agents work iteratively.
-        """
-    )
+        """)
 
     with gr.Row():
         # --- Left Column: Input and Control ---
@@ -68,25 +153,27 @@ with gr.Blocks(title="Autonomous Coding Agent") as demo:
         with gr.Column(scale=2):
             # Output 1: Progress/Feedback (Text Box) - Often best placed first for immediate feedback
             results_output = gr.Textbox(
-                label="Progress & Test Results", lines=5, show_copy_button=True
+                label="Progress & Test Results",
+                lines=10,
+                max_lines=30,
+                autoscroll=True,
+                show_copy_button=True,
             )
 
             with gr.Row():
                 # Output 2: Project Plan (JSON)
                 plan_output = gr.JSON(label="Project Plan", scale=2)
 
-                # Output 3: Download File
-                file_output = gr.File(label="Download Generated Code (.zip)", scale=1)
+                # Output 3: Download link
+                file_output = gr.Markdown()
 
-    gr.Markdown(
-        """
+    gr.Markdown("""
     <small>⚠️ <b>Data Safety Disclaimer:</b><br>
     Do <b>not</b> enter any confidential, personal, or proprietary information in prompts.<br>
     By using this app, you acknowledge that <b>both your inputs and outputs are shared with OpenAI for processing</b>.<br>
     You are responsible for ensuring no sensitive data is included.
     </small>
-    """
-    )
+    """)
 
     # ----------------------------------------------------
     # Define Actions
@@ -113,9 +200,20 @@ with gr.Blocks(title="Autonomous Coding Agent") as demo:
     )
 
 
+# Runs are isolated and async, so many pipelines share the event loop
+demo.queue(default_concurrency_limit=int(os.getenv("APP_CONCURRENCY", "16")))
+app = gr.mount_gradio_app(app, demo, path="/")
+
+
 if __name__ == "__main__":
-    # Remove old zip file if it exists for a fresh start
-    if os.path.exists("workspace_output.zip"):
-        os.remove("workspace_output.zip")
+    import uvicorn
 
-    demo.launch()
+    # Serve the UI right away; the agents (and their heavy imports) are built
+    # in the background so the first run does not pay for them either
+    threading.Thread(target=warm_up, daemon=True).start()
+
+    uvicorn.run(
+        app,
+        host=os.getenv("GRADIO_SERVER_NAME", "0.0.0.0"),
+        port=int(os.getenv("GRADIO_SERVER_PORT", "7860")),
+    )
@@ -1,5 +1,13 @@
 import os
 import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# Finished runs' in-memory workspaces, served as zip downloads until they expire
+_artifacts = {}
+_artifacts_lock = threading.Lock()
 
 
 def make_workspace(directory):
@@ -17,3 +25,71 @@ def make_workspace(directory):
 def delete_workspace(directory):
     if os.path.exists(directory):
         shutil.rmtree(directory)
+
+
+def new_run_id(session_hash=None):
+    """Unique id for one pipeline run, prefixed with the Gradio session if known."""
+    run_id = uuid.uuid4().hex[:12]
+    return f"{session_hash}_{run_id}" if session_hash else run_id
+
+
+def make_run_workspace(run_id):
+    """Creates an isolated temp workspace (with tests/) for one pipeline run."""
+    directory = tempfile.mkdtemp(prefix=f"agentic_{run_id}_")
+    make_workspace(directory)
+    return directory
+
+
+def store_artifact(run_id, workspace):
+    """Keeps a finished run's VirtualWorkspace so its zip can be downloaded."""
+    with _artifacts_lock:
+        _artifacts[run_id] = (time.time(), workspace)
+
+
+def get_artifact(run_id):
+    with _artifacts_lock:
+        entry = _artifacts.get(run_id)
+    return entry[1] if entry else None
+
+
+def cleanup_artifacts(max_age_s=None):
+    """
+    Drops stored run artifacts older than max_age_s (ARTIFACT_TTL, default
+    one hour). max_age_s=0 drops all of them.
+    """
+    if max_age_s is None:
+        max_age_s = float(os.getenv("ARTIFACT_TTL", "3600"))
+
+    cutoff = time.time() - max_age_s
+    with _artifacts_lock:
+        for run_id, (created_at, _) in list(_artifacts.items()):
+            if created_at <= cutoff:
+                del _artifacts[run_id]
+
+
+def format_progress(node, state):
+    """
+    One progress line for a finished graph node (plan / code / check / test).
+    """
+    if node == "plan":
+        modules = (state.get("plan") or {}).get("modules", [])
+        return f"📋 Plan ready with {len(modules)} modules."
+
+    if node == "code":
+        code_output = state.get("code_output") or {}
+        if "error" in code_output:
+            return f"❌ Coder: {code_output.get('exception', code_output['error'])}"
+        return f"💻 Code step finished ({len(code_output)} files written)."
+
+    if node == "check":
+        if state.get("static_check"):
+            return (
+                f"🔍 Iteration {state.get('iteration', 0)}: {state.get('feedback', '')}"
+            )
+        return "🔍 Static pre-check passed."
+
+    if node == "test":
+        iteration = state.get("iteration", 0)
+        return f"🧪 Iteration {iteration}: {state.get('feedback', '')}"
+
+    return f"✔️ {node} finished."
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, Set, Tuple
+
+from dotenv import load_dotenv
+
+# Load API keys and env variables
+load_dotenv()
+
+
+def read_prompts(path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Streams (id, prompt) from a JSONL file. A line needs "prompt", or
+    "title" / "body" (as in requests.jsonl); the id is "id", "request_id" or
+    the line number.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            prompt = record.get("prompt") or "\n\n".join(
+                part for part in (record.get("title"), record.get("body")) if part
+            )
+            prompt_id = str(
+                record.get("id") or record.get("request_id") or f"line-{line_no}"
+            )
+            yield prompt_id, prompt
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already in the output file; errored runs are retried."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted batch
+                continue
+            if record.get("status") != "error":
+                done.add(record["id"])
+    return done
+
+
+def run_one(prompt_id: str, prompt: str, artifacts_dir: str) -> dict:
+    """Runs one graph pipeline in its own temporary workspace."""
+    from agents.agent_factory import get_tester
+    from agents.run_Agent import stream_agentic_pipeline
+    from agents.snapshots import shipped_test_output
+    from agents.virtual_workspace import release_workspace
+
+    safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in prompt_id)
+    run_id = f"batch_{safe_id}_{int(time.time())}"
+    workspace = tempfile.mkdtemp(prefix=f"batch_{safe_id}_")
+    record = {"id": prompt_id, "prompt": prompt, "run_id": run_id}
+
+    start = time.perf_counter()
+    last = start
+    nodes, final_state = {}, {}
+    try:
+        for event, payload in stream_agentic_pipeline(prompt, workspace, run_id):
+            now = time.perf_counter()
+            if event == "node":
+                node = payload["node"]
+                nodes[node] = round(nodes.get(node, 0.0) + now - last, 3)
+                last = now
+            elif event == "done":
+                final_state = payload
+
+        # A rolled-back run ships an earlier iteration's code and results
+        test_output = shipped_test_output(final_state)
+        passed = (
+            test_output.get("passed", 0) > 0
+            and test_output.get("failed", 0) == 0
+            and test_output.get("errors", 0) == 0
+            and not test_output.get("timed_out")
+        )
+        artifact = None
+        vfs = release_workspace(workspace)
+        if vfs is not None and len(vfs):
+            artifact = vfs.write_zip(os.path.join(artifacts_dir, f"{safe_id}.zip"))
+        record.update(
+            status="passed" if passed else "failed",
+            plan=final_state.get("plan"),
+            iterations=final_state.get("iteration", 0),
+            stop_reason=final_state.get("stop_reason") or None,
+            shipped_iteration=final_state.get("shipped_iteration"),
+            tests={
+                **{
+                    k: test_output.get(k, 0)
+                    for k in ("passed", "failed", "errors", "skipped")
+                },
+                "partial": test_output["partial"],
+            },
+            error=final_state.get("error") or None,
+            artifact=artifact,
+        )
+    except Exception as e:
+        release_workspace(workspace)
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+        get_tester().reset(workspace)
+
+    record["timings"] = {"wall_s": round(time.perf_counter() - start, 3), **nodes}
+    return record
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    artifacts_dir: str,
+    concurrency: int = 4,
+) -> dict:
+    """
+    Runs every prompt of input_path that output_path does not have a result
+    for yet, at most `concurrency` at a time. Each result is appended to
+    output_path as soon as its run finishes, so an interrupted batch resumes
+    where it stopped.
+    """
+    os.makedirs(artifacts_dir, exist_ok=True)
+    done = completed_ids(output_path)
+    counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    write_lock = threading.Lock()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="batch"
+    ) as executor:
+
+        def collect(futures):
+            for future in futures:
+                record = future.result()
+                counts[record["status"]] += 1
+                with write_lock:
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                print(
+                    f"📦 [Batch] {record['id']}: {record['status']} "
+                    f"({record['timings']['wall_s']}s)"
+                )
+
+        # Only `concurrency` prompts are read ahead, however long the file is
+        pending = set()
+        for prompt_id, prompt in read_prompts(input_path):
+            if prompt_id in done:
+                counts["skipped"] += 1
+                continue
+            if len(pending) >= concurrency:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending.add(executor.submit(run_one, prompt_id, prompt, artifacts_dir))
+        collect(wait(pending).done)
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the agentic pipeline for every prompt of a JSONL file."
+    )
+    parser.add_argument("input", help="JSONL with one prompt per line")
+    parser.add_argument(
+        "--output", default="batch_results.jsonl", help="results JSONL (appended)"
+    )
+    parser.add_argument(
+        "--artifacts", default="batch_artifacts", help="directory for the run zips"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("BATCH_CONCURRENCY", "4")),
+        help="pipelines running at the same time",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        help="LLM requests per second across all runs (LLM_REQUESTS_PER_SECOND)",
+    )
+    args = parser.parse_args()
+    if args.rps is not None:
+        os.environ["LLM_REQUESTS_PER_SECOND"] = str(args.rps)
+
+    started = time.perf_counter()
+    counts = run_batch(args.input, args.output, args.artifacts, args.concurrency)
+    print(
+        f"\n🏁 Batch complete in {time.perf_counter() - started:.1f}s: "
+        + ", ".join(f"{v} {k}" for k, v in counts.items())
+    )
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+from llm.llm_cache import StreamCacheMixin
+
+MODULE_NAME_RE = re.compile(r"['\"]name['\"]:\s*['\"]([^'\"]+)['\"]")
+ONLY_FILE_RE = re.compile(r"Write ONLY the file `([^`]+)`")
+CODE_MODULE_RE = re.compile(r"^mod_(\d+)\.py$")
+TEST_MODULE_RE = re.compile(r"^tests/test_mod_(\d+)\.py$")
+
+TEST_HEADER = (
+    "import sys, os\n"
+    "sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))\n"
+)
+
+
+class ScriptedChatModel(StreamCacheMixin, BaseChatModel):
+    """
+    Deterministic, offline stand-in for the chat model (LLM_PROVIDER=fake).
+
+    Recognizes the planner / coder / fix prompts and answers with a canned
+    project of `modules` code modules (mod_<i>.py, each with its own test file).
+    While fewer than `fix_iterations` fix requests were made, mod_0.py keeps a
+    bug so the code -> test loop runs that many times. Recorded `responses`,
+    when given, are replayed in order before falling back to the canned ones.
+    Every call waits `latency_s` to simulate the provider; a call slower than
+    `timeout_s` (when set) raises TimeoutError after timeout_s, as a client
+    with that request timeout would.
+    """
+
+    modules: int = 3
+    fix_iterations: int = 0
+    latency_s: float = 0.0
+    timeout_s: float = 0.0
+    chunk_size: int = 64
+    responses: List[str] = Field(default_factory=list)
+    calls: int = 0
+    fixes: int = 0
+
+    @classmethod
+    def from_env(cls, tier: str = None, **kwargs: Any) -> "ScriptedChatModel":
+        """
+        Environment:
+            FAKE_LLM_MODULES          code modules in the canned project
+            FAKE_LLM_FIX_ITERATIONS   fix requests needed before the tests pass
+            FAKE_LLM_LATENCY_S        simulated latency per call
+            FAKE_LLM_TIER_LATENCY_S   tier=seconds,... latency of router tiers
+            FAKE_LLM_RESPONSES        JSON file with a list of recorded responses
+        """
+        responses = []
+        if os.getenv("FAKE_LLM_RESPONSES"):
+            with open(os.environ["FAKE_LLM_RESPONSES"], "r", encoding="utf-8") as f:
+                responses = json.load(f)
+        latency_s = float(os.getenv("FAKE_LLM_LATENCY_S", "0"))
+        for item in os.getenv("FAKE_LLM_TIER_LATENCY_S", "").split(","):
+            name, _, seconds = item.strip().partition("=")
+            if tier is not None and name == tier:
+                latency_s = float(seconds)
+        return cls(
+            modules=int(os.getenv("FAKE_LLM_MODULES", "3")),
+            fix_iterations=int(os.getenv("FAKE_LLM_FIX_ITERATIONS", "0")),
+            latency_s=latency_s,
+            responses=responses,
+            **kwargs,
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"modules": self.modules, "fix_iterations": self.fix_iterations}
+
+    # -----------------------------
+    # Canned project
+    # -----------------------------
+    def _file(self, filename: str, buggy: bool) -> dict:
+        code = f"# {filename}\n"
+        match = CODE_MODULE_RE.match(filename)
+        if match:
+            i = int(match.group(1))
+            value = i + 1 if buggy and i == 0 else i
+            code = f"def value_{i}():\n    return {value}\n"
+        match = TEST_MODULE_RE.match(filename)
+        if match:
+            i = int(match.group(1))
+            code = (
+                f"{TEST_HEADER}from mod_{i} import value_{i}\n\n\n"
+                f"def test_value_{i}():\n    assert value_{i}() == {i}\n"
+            )
+        return {"filename": filename, "code": code}
+
+    def _plan(self) -> dict:
+        modules = [
+            {"name": f"mod_{i}.py", "tasks": [f"Implement value_{i}() returning {i}"]}
+            for i in range(self.modules)
+        ]
+        modules += [
+            {
+                "name": f"tests/test_mod_{i}.py",
+                "tasks": [f"Test value_{i} from mod_{i}.py"],
+            }
+            for i in range(self.modules)
+        ]
+        return {"modules": modules}
+
+    def respond(self, prompt: str) -> str:
+        """Returns the response text for a rendered prompt."""
+        if self.calls < len(self.responses):
+            return self.responses[self.calls]
+
+        if "software project planner" in prompt:
+            return json.dumps(self._plan())
+
+        if "reviewing test failures" in prompt:
+            self.fixes += 1
+            buggy = self.fixes < self.fix_iterations
+            if "Do NOT rewrite whole files" in prompt:
+                edit = {
+                    "search": "return 1",
+                    "replace": "return 1" if buggy else "return 0",
+                }
+                return json.dumps(
+                    {"files": [{"filename": "mod_0.py", "edits": [edit]}]}
+                )
+            return json.dumps({"files": [self._file("mod_0.py", buggy)]})
+
+        buggy = self.fix_iterations > 0
+        only = ONLY_FILE_RE.search(prompt)
+        if only:
+            filenames = [only.group(1)]
+        else:
+            filenames = list(dict.fromkeys(MODULE_NAME_RE.findall(prompt)))
+        return json.dumps({"files": [self._file(name, buggy) for name in filenames]})
+
+    # -----------------------------
+    # BaseChatModel interface
+    # -----------------------------
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _wait(self):
+        if self.timeout_s and self.latency_s > self.timeout_s:
+            time.sleep(self.timeout_s)
+            raise TimeoutError(f"no response within {self.timeout_s}s")
+        time.sleep(self.latency_s)
+
+    async def _await(self):
+        if self.timeout_s and self.latency_s > self.timeout_s:
+            await asyncio.sleep(self.timeout_s)
+            raise TimeoutError(f"no response within {self.timeout_s}s")
+        await asyncio.sleep(self.latency_s)
+
+    def _next(self, messages: List[BaseMessage]) -> str:
+        text = self.respond(self._prompt_text(messages))
+        self.calls += 1
+        return text
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._wait()
+        message = AIMessage(content=self._next(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await self._await()
+        message = AIMessage(content=self._next(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._wait()
+        text = self._next(messages)
+        for start in range(0, len(text), self.chunk_size):
+            chunk = AIMessageChunk(content=text[start : start + self.chunk_size])
+            yield ChatGenerationChunk(message=chunk)
@@ -1,25 +1,237 @@
 import os
-from langchain_openai import ChatOpenAI
+import threading
 
 # from langchain_ollama import ChatOllama
-from huggingface_hub import login
 
+# Shared by every client in the process, so concurrent pipelines share one
+# request / token budget and one keep-alive connection pool
+_rate_limiter = None
+_http_client = None
+_async_http_client = None
+_shared_lock = threading.Lock()
 
-def get_llm(model_name=None, temperature=0):
+
+def get_rate_limiter():
+    """
+    Returns the process-wide token bucket limiter (see llm.rate_limit), or
+    None when neither LLM_REQUESTS_PER_SECOND nor LLM_TOKENS_PER_MINUTE is set.
+    """
+    global _rate_limiter
+
+    requests_per_second = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0"))
+    tokens_per_minute = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+    if requests_per_second <= 0 and tokens_per_minute <= 0:
+        return None
+
+    with _shared_lock:
+        if _rate_limiter is None:
+            from llm.rate_limit import TokenBucketLimiter
+
+            _rate_limiter = TokenBucketLimiter(
+                requests_per_second=requests_per_second,
+                tokens_per_minute=tokens_per_minute,
+            )
+        return _rate_limiter
+
+
+def _openai_httpx():
+    """The httpx package openai is built on (newer releases ship it as httpx2)."""
+    from openai import _base_client
+
+    return getattr(_base_client, "httpx2", None) or _base_client.httpx
+
+
+def _pool_options() -> dict:
+    import openai
+
+    httpx = _openai_httpx()
+
+    connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    return {
+        "limits": httpx.Limits(
+            max_connections=connections,
+            max_keepalive_connections=connections,
+            keepalive_expiry=60,
+        ),
+        "timeout": openai.Timeout(300, connect=10),
+    }
+
+
+def get_http_client():
+    """
+    Keep-alive HTTP connection pool shared by every OpenAI client. Sync calls
+    use it directly; ainvoke / astream use get_async_http_client, which keeps a
+    pool with the same LLM_MAX_CONNECTIONS limits per event loop.
+    """
+    global _http_client
+
+    with _shared_lock:
+        if _http_client is None:
+            import openai
+
+            _http_client = openai.DefaultHttpxClient(**_pool_options())
+        return _http_client
+
+
+def get_async_http_client():
+    """
+    The async counterpart of get_http_client, shared by every OpenAI client.
+    Async connections belong to the event loop that opened them, and the sync
+    paths run a fresh loop per call (asyncio.run), so it keeps one pool per
+    running loop instead of one for the process.
+    """
+    global _async_http_client
+
+    with _shared_lock:
+        if _async_http_client is None:
+            import openai
+
+            _async_http_client = openai.DefaultAsyncHttpxClient(
+                transport=_loop_pool_transport(),
+                timeout=_pool_options()["timeout"],
+            )
+        return _async_http_client
+
+
+def _loop_pool_transport():
+    import asyncio
+    import weakref
+
+    httpx = _openai_httpx()
+
+    class LoopPoolTransport(httpx.AsyncBaseTransport):
+        """Routes each request to the connection pool of its running loop."""
+
+        def __init__(self):
+            self._pools = weakref.WeakKeyDictionary()
+            self._lock = threading.Lock()
+
+        def _pool(self) -> httpx.AsyncHTTPTransport:
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                if loop not in self._pools:
+                    self._pools[loop] = httpx.AsyncHTTPTransport(
+                        limits=_pool_options()["limits"]
+                    )
+                return self._pools[loop]
+
+        async def handle_async_request(self, request):
+            return await self._pool().handle_async_request(request)
+
+        async def aclose(self):
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+            if pool is not None:
+                await pool.aclose()
+
+    return LoopPoolTransport()
+
+
+def get_llm(model_name=None, temperature=0, use_cache=True, role=None):
     """
     Returns an LLM client depending on the LLM_PROVIDER environment variable.
-    Supported: openai, ollama
+    Supported: openai, ollama, fake (offline scripted responses, see llm.fake_llm)
+
+    When LLM_CACHE=1, responses are served from / stored in a persistent
+    on-disk cache (see llm.llm_cache); pass use_cache=False to opt a client out.
+    OpenAI clients share one connection pool (for sync and async calls alike)
+    and one rate limiter
+    (LLM_REQUESTS_PER_SECOND / LLM_TOKENS_PER_MINUTE), and retry throttling,
+    timeouts and server errors with jittered exponential backoff
+    (LLM_MAX_RETRIES, LLM_RETRY_INITIAL_S, LLM_RETRY_MAX_S).
+
+    With LLM_ROUTING=1, a client for an agent role ("planner", "coder")
+    routes every call to one of the LLM_ROUTER_TIERS models instead of
+    model_name (see llm.router).
     """
+    # Provider clients and the cache are imported on first use (slow to import)
+    from llm.llm_cache import get_llm_cache
+
     provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    cache = get_llm_cache() if use_cache else False
+    rate_limiter = get_rate_limiter()
+
+    router = None
+    if role is not None:
+        from llm.router import get_model_router
 
+        router = get_model_router()
+    if router is None:
+        return _client(provider, model_name, temperature, cache, rate_limiter)
+
+    from llm.router import RoutedChatModel
+
+    timeout_errors = (TimeoutError,)
     if provider == "openai":
-        return ChatOpenAI(
+        import openai
+
+        timeout_errors += (openai.APITimeoutError,)
+    return RoutedChatModel(
+        role=role,
+        router=router,
+        clients={
+            tier.name: _client(
+                provider, tier.model, temperature, cache, rate_limiter, tier
+            )
+            for tier in router.tiers
+        },
+        timeout_errors=timeout_errors,
+    )
+
+
+def accepts_temperature(llm) -> bool:
+    """
+    Whether a per-call temperature can be bound on llm. gpt-5 reasoning models
+    reject any temperature but the default (ChatOpenAI drops it when the
+    client is built, but a bound one is sent as is); a routed model accepts it
+    only if every tier does.
+    """
+    clients = getattr(llm, "clients", None)
+    if clients:
+        return all(accepts_temperature(client) for client in clients.values())
+    validate = getattr(type(llm), "validate_temperature", None)
+    if validate is None:
+        return True
+    return "temperature" in validate(
+        {"model": getattr(llm, "model_name", ""), "temperature": 0.5}
+    )
+
+
+def _client(provider, model_name, temperature, cache, rate_limiter, tier=None):
+    """One provider client; a router tier sets its own request timeout."""
+    if provider == "openai":
+        from llm.openai_client import RetryingChatOpenAI
+
+        return RetryingChatOpenAI(
             model_name=model_name or os.getenv("OPENAI_MODEL", "gpt-5-mini"),
             temperature=temperature,
-            timeout=300,
+            timeout=tier.timeout_s if tier else 300,
             api_key=os.getenv("OPENAI_API_KEY"),
+            cache=cache,
+            rate_limiter=rate_limiter,
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+            stream_usage=True,
+            # Retries happen in RetryingChatOpenAI, not in the OpenAI SDK
+            max_retries=0,
+            max_attempts=int(os.getenv("LLM_MAX_RETRIES", "4")) + 1,
+            backoff_initial_s=float(os.getenv("LLM_RETRY_INITIAL_S", "1")),
+            backoff_max_s=float(os.getenv("LLM_RETRY_MAX_S", "30")),
+            # A routed tier falls back to the next tier instead
+            retry_timeouts=tier is None,
         )
 
+    elif provider == "fake":
+        from llm.fake_llm import ScriptedChatModel
+
+        if tier is not None:
+            return ScriptedChatModel.from_env(
+                tier=tier.name,
+                timeout_s=tier.timeout_s,
+                cache=cache,
+                rate_limiter=rate_limiter,
+            )
+        return ScriptedChatModel.from_env(cache=cache, rate_limiter=rate_limiter)
+
     # elif provider == "ollama":
     #     return ChatOllama(
     #         model=model_name or os.getenv("OLLAMA_MODEL", "llama2"),
@@ -0,0 +1,330 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import (
+    AIMessageChunk,
+    BaseMessage,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, Generation
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+
+
+class DiskLLMCache(BaseCache):
+    """
+    Persistent, content-addressed response cache for chat models.
+
+    Entries are keyed by a hash of the model configuration (model name,
+    temperature, ...) and the fully rendered prompt, stored in a local SQLite
+    file and evicted by age (max_age_s) and total size (max_entries / max_bytes,
+    least recently used first).
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = 5000,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age_s: Optional[float] = 7 * 24 * 3600,
+        bypass: bool = False,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        # When bypassed, lookups always miss but fresh responses are still stored
+        self.bypass = bypass
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    # -----------------------------
+    # Key / value encoding
+    # -----------------------------
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(llm_string.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _encode(return_val: Sequence[Generation]) -> str:
+        records = []
+        for gen in return_val:
+            if isinstance(gen, ChatGeneration):
+                records.append({"message": message_to_dict(gen.message)})
+            else:
+                records.append({"text": gen.text})
+        return json.dumps(records)
+
+    @staticmethod
+    def _decode(value: str) -> list:
+        generations = []
+        for record in json.loads(value):
+            if "message" in record:
+                message = messages_from_dict([record["message"]])[0]
+                generations.append(ChatGeneration(message=message))
+            else:
+                generations.append(Generation(text=record["text"]))
+        return generations
+
+    # -----------------------------
+    # BaseCache interface
+    # -----------------------------
+    def lookup(self, prompt: str, llm_string: str):
+        if self.bypass:
+            self.misses += 1
+            return None
+
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.max_age_s is not None and now - row[1] > self.max_age_s:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+
+        self.hits += 1
+        return self._decode(row[0])
+
+    def contains(self, prompt: str, llm_string: str) -> bool:
+        """
+        Whether lookup would hit, without serving the entry. A miss is counted
+        as one; a hit is counted by the lookup that serves it.
+        """
+        found = False
+        if not self.bypass:
+            key = self.make_key(prompt, llm_string)
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            found = row is not None and (
+                self.max_age_s is None or time.time() - row[0] <= self.max_age_s
+            )
+        if not found:
+            self.misses += 1
+        return found
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = self._encode(return_val)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    # -----------------------------
+    # Eviction and stats
+    # -----------------------------
+    def _evict(self) -> None:
+        """Drops expired entries, then least recently used ones until within limits."""
+        cur = self._conn
+        if self.max_age_s is not None:
+            deleted = cur.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.max_age_s,),
+            ).rowcount
+            self.evictions += max(deleted, 0)
+
+        count, total = cur.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = cur.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            cur.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total,
+        }
+
+
+# -----------------------------
+# Streamed calls
+# -----------------------------
+def cache_entry(
+    llm, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any
+) -> Optional[Tuple[BaseCache, str, str]]:
+    """
+    (cache, prompt, llm_string) under which llm's invoke caches its response
+    to messages, or None when llm has no cache of its own.
+    """
+    cache = getattr(llm, "cache", None)
+    if not isinstance(cache, BaseCache):
+        return None
+    # As BaseChatModel._generate_with_cache: message ids are not part of the key
+    messages = [
+        m.model_copy(update={"id": None}) if getattr(m, "id", None) else m
+        for m in messages
+    ]
+    return cache, dumps(messages), llm._get_llm_string(stop=stop, **kwargs)
+
+
+def cached_chunk(message: BaseMessage) -> AIMessageChunk:
+    """A cached response as the single chunk of a replayed stream (no usage)."""
+    return AIMessageChunk(
+        content=message.content, response_metadata=message.response_metadata
+    )
+
+
+def store_stream(entry: Tuple[BaseCache, str, str], chunks: List[AIMessageChunk]):
+    """Stores a completed stream as the response invoke would have cached."""
+    if not chunks:
+        return
+    message = chunks[0]
+    for chunk in chunks[1:]:
+        message = message + chunk
+    message = message_chunk_to_message(message).model_copy(update={"id": None})
+    cache, prompt, llm_string = entry
+    cache.update(prompt, llm_string, [ChatGeneration(message=message)])
+
+
+class StreamCacheMixin:
+    """
+    Serves stream / astream from the model's cache, which BaseChatModel only
+    consults for invoke. A hit is replayed as one chunk (through invoke, so
+    callbacks see the call); a completed stream is stored under the key invoke
+    uses, so either kind of call serves the other. Goes before the chat model
+    class in the bases.
+    """
+
+    def stream(self, input, config=None, *, stop=None, **kwargs):
+        messages = self._convert_input(input).to_messages()
+        entry = cache_entry(self, messages, stop, **kwargs)
+        if entry is not None and entry[0].contains(entry[1], entry[2]):
+            yield cached_chunk(self.invoke(input, config, stop=stop, **kwargs))
+            return
+        chunks = []
+        for chunk in super().stream(input, config, stop=stop, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if entry is not None:
+            store_stream(entry, chunks)
+
+    async def astream(self, input, config=None, *, stop=None, **kwargs):
+        messages = self._convert_input(input).to_messages()
+        entry = cache_entry(self, messages, stop, **kwargs)
+        if entry is not None and entry[0].contains(entry[1], entry[2]):
+            message = await self.ainvoke(input, config, stop=stop, **kwargs)
+            yield cached_chunk(message)
+            return
+        chunks = []
+        async for chunk in super().astream(input, config, stop=stop, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        if entry is not None:
+            store_stream(entry, chunks)
+
+
+# -----------------------------
+# Process-wide cache instance
+# -----------------------------
+_cache: Optional[DiskLLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[DiskLLMCache]:
+    """
+    Returns the shared on-disk cache, or None when LLM_CACHE is not enabled.
+
+    Environment:
+        LLM_CACHE=1              enable the cache
+        LLM_CACHE_PATH           SQLite file (default .cache/llm_cache.sqlite)
+        LLM_CACHE_MAX_ENTRIES    entry limit before LRU eviction
+        LLM_CACHE_MAX_MB         size limit before LRU eviction
+        LLM_CACHE_MAX_AGE_H      entries older than this are dropped (0 = never)
+        LLM_CACHE_BYPASS=1       always call the provider but refresh stored entries
+    """
+    global _cache
+
+    if os.getenv("LLM_CACHE", "0").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            max_age_h = float(os.getenv("LLM_CACHE_MAX_AGE_H", "168"))
+            _cache = DiskLLMCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+                max_bytes=int(
+                    float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+                ),
+                max_age_s=max_age_h * 3600 if max_age_h > 0 else None,
+            )
+        _cache.bypass = os.getenv("LLM_CACHE_BYPASS", "0").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+        return _cache
@@ -0,0 +1,174 @@
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import openai
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_openai import ChatOpenAI
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+)
+
+from llm.llm_cache import StreamCacheMixin
+from llm.rate_limit import Backoff
+
+# Worth another attempt: throttling, timeouts, dropped connections, 5xx
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def _result_tokens(result: ChatResult) -> int:
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    if usage.get("total_tokens"):
+        return usage["total_tokens"]
+    return sum(
+        (getattr(gen.message, "usage_metadata", None) or {}).get("total_tokens", 0)
+        for gen in result.generations
+    )
+
+
+def _chunk_tokens(chunk: ChatGenerationChunk) -> int:
+    usage = getattr(chunk.message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class RetryingChatOpenAI(StreamCacheMixin, ChatOpenAI):
+    """
+    ChatOpenAI with the client-side policy of get_llm: retryable errors are
+    retried with jittered exponential backoff (honouring Retry-After), every
+    retry waits on the shared rate limiter again and is reported to the run's
+    callbacks (on_retry), and the tokens each call used are charged to the
+    limiter's tokens-per-minute bucket. A stream is only retried while it has
+    not produced any output yet.
+    """
+
+    max_attempts: int = 5
+    backoff_initial_s: float = 1.0
+    backoff_max_s: float = 30.0
+    # False for routed tiers, which fall back to the next tier on a timeout
+    retry_timeouts: bool = True
+
+    def _retryable(self, e: BaseException) -> bool:
+        if isinstance(e, openai.APITimeoutError) and not self.retry_timeouts:
+            return False
+        return isinstance(e, RETRYABLE_ERRORS)
+
+    def _retry_kwargs(self, retryable) -> dict:
+        return {
+            "stop": stop_after_attempt(self.max_attempts),
+            "wait": Backoff(self.backoff_initial_s, self.backoff_max_s),
+            "retry": retry_if_exception(retryable),
+            "reraise": True,
+        }
+
+    def _retrying(self, run_manager, retryable=None) -> Retrying:
+        def before_sleep(retry_state):
+            if run_manager is not None:
+                run_manager.on_retry(retry_state)
+
+        return Retrying(
+            before_sleep=before_sleep,
+            **self._retry_kwargs(retryable or self._retryable),
+        )
+
+    def _aretrying(self, run_manager, retryable=None) -> AsyncRetrying:
+        async def before_sleep(retry_state):
+            if run_manager is not None:
+                await run_manager.on_retry(retry_state)
+
+        return AsyncRetrying(
+            before_sleep=before_sleep,
+            **self._retry_kwargs(retryable or self._retryable),
+        )
+
+    def _charge(self, tokens: int) -> None:
+        consume = getattr(self.rate_limiter, "consume_tokens", None)
+        if consume is not None and tokens:
+            consume(tokens)
+
+    # -----------------------------
+    # BaseChatModel interface
+    # -----------------------------
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        for attempt in self._retrying(run_manager):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1 and self.rate_limiter:
+                    self.rate_limiter.acquire(blocking=True)
+                result = super()._generate(messages, stop, run_manager, **kwargs)
+        self._charge(_result_tokens(result))
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        async for attempt in self._aretrying(run_manager):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1 and self.rate_limiter:
+                    await self.rate_limiter.aacquire(blocking=True)
+                result = await super()._agenerate(messages, stop, run_manager, **kwargs)
+        self._charge(_result_tokens(result))
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        started = False
+        tokens = 0
+
+        def retryable(e: BaseException) -> bool:
+            return self._retryable(e) and not started
+
+        for attempt in self._retrying(run_manager, retryable):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1 and self.rate_limiter:
+                    self.rate_limiter.acquire(blocking=True)
+                for chunk in super()._stream(messages, stop, run_manager, **kwargs):
+                    started = True
+                    tokens += _chunk_tokens(chunk)
+                    yield chunk
+        self._charge(tokens)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        started = False
+        tokens = 0
+
+        def retryable(e: BaseException) -> bool:
+            return self._retryable(e) and not started
+
+        async for attempt in self._aretrying(run_manager, retryable):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1 and self.rate_limiter:
+                    await self.rate_limiter.aacquire(blocking=True)
+                async for chunk in super()._astream(
+                    messages, stop, run_manager, **kwargs
+                ):
+                    started = True
+                    tokens += _chunk_tokens(chunk)
+                    yield chunk
+        self._charge(tokens)
@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from typing import Optional
+
+from langchain_core.rate_limiters import BaseRateLimiter
+
+# Seconds this context spent waiting for the limiter, summed over its calls;
+# callback handlers take the difference around one model call (agents.metrics)
+_queue_wait_s = contextvars.ContextVar("llm_queue_wait_s", default=0.0)
+
+
+def queue_wait_total() -> float:
+    return _queue_wait_s.get()
+
+
+class TokenBucketLimiter(BaseRateLimiter):
+    """
+    Client-side rate limit shared by every model client of the process.
+
+    Two token buckets: one refilled with requests_per_second (bursts up to
+    one second's worth), one with tokens_per_minute (up to one minute's
+    worth). A request needs a free request slot and a token bucket that is
+    not in debt; the tokens it actually used are only known afterwards and
+    are taken with consume_tokens(), which may push the bucket into debt and
+    hold back the next requests. A rate of 0 disables that bucket.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 0,
+        tokens_per_minute: float = 0,
+        check_every_n_seconds: float = 0.05,
+    ):
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.check_every_n_seconds = check_every_n_seconds
+
+        self._max_requests = max(1.0, requests_per_second)
+        self._requests = self._max_requests
+        self._tokens = float(tokens_per_minute)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.queued = 0
+        self.queue_wait_s = 0.0
+        self.max_queue_wait_s = 0.0
+        self.tokens_used = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_second > 0:
+            self._requests = min(
+                self._max_requests,
+                self._requests + elapsed * self.requests_per_second,
+            )
+        if self.tokens_per_minute > 0:
+            self._tokens = min(
+                float(self.tokens_per_minute),
+                self._tokens + elapsed * self.tokens_per_minute / 60,
+            )
+
+    def _try_acquire(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.requests_per_second > 0 and self._requests < 1:
+                return False
+            if self.tokens_per_minute > 0 and self._tokens <= 0:
+                return False
+            if self.requests_per_second > 0:
+                self._requests -= 1
+            return True
+
+    def _record(self, waited: float) -> None:
+        with self._lock:
+            self.acquired += 1
+            if waited > 0:
+                self.queued += 1
+                self.queue_wait_s += waited
+                self.max_queue_wait_s = max(self.max_queue_wait_s, waited)
+        _queue_wait_s.set(_queue_wait_s.get() + waited)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        start, waited = time.monotonic(), False
+        while not self._try_acquire():
+            if not blocking:
+                return False
+            time.sleep(self.check_every_n_seconds)
+            waited = True
+        self._record(time.monotonic() - start if waited else 0.0)
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        start, waited = time.monotonic(), False
+        while not self._try_acquire():
+            if not blocking:
+                return False
+            await asyncio.sleep(self.check_every_n_seconds)
+            waited = True
+        self._record(time.monotonic() - start if waited else 0.0)
+        return True
+
+    def consume_tokens(self, tokens: int) -> None:
+        with self._lock:
+            self.tokens_used += tokens
+            if self.tokens_per_minute > 0:
+                self._tokens -= tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "acquired": self.acquired,
+                "queued": self.queued,
+                "queue_wait_s": round(self.queue_wait_s, 4),
+                "max_queue_wait_s": round(self.max_queue_wait_s, 4),
+                "tokens_used": self.tokens_used,
+            }
+
+
+class Backoff:
+    """Jittered exponential backoff that honours a server's Retry-After."""
+
+    def __init__(self, initial_s: float = 1.0, max_s: float = 30.0):
+        self.initial_s = initial_s
+        self.max_s = max_s
+
+    @staticmethod
+    def retry_after(error: Optional[BaseException]) -> Optional[float]:
+        response = getattr(error, "response", None)
+        value = getattr(response, "headers", {}).get("retry-after")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def __call__(self, retry_state) -> float:
+        """tenacity wait callable: full jitter, at least Retry-After."""
+        exponential = min(
+            self.max_s, self.initial_s * 2 ** (retry_state.attempt_number - 1)
+        )
+        delay = random.uniform(0, exponential)
+        outcome = retry_state.outcome
+        retry_after = self.retry_after(outcome.exception() if outcome else None)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_s))
+        return delay
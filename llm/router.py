@@ -0,0 +1,471 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from llm.llm_cache import cache_entry, cached_chunk, store_stream
+
+# name=model:max_prompt_tokens:timeout_s, cheapest first (0 tokens = no limit)
+DEFAULT_TIERS = (
+    "fast=gpt-5-nano:8000:60,standard=gpt-5-mini:32000:180,large=gpt-5:0:300"
+)
+# The cheapest tier each agent starts at (before prompt size and failures)
+DEFAULT_ROLE_FLOORS = "planner=fast,coder=standard"
+
+# Failure categories a fix request is routed on. The trivial ones (a missing
+# import, a typo) can go to the cheapest tier whatever the agent's floor is.
+FAILURE_PATTERNS = [
+    ("syntax", re.compile(r"\b(SyntaxError|IndentationError|TabError)\b")),
+    ("import", re.compile(r"\b(ImportError|ModuleNotFoundError)\b")),
+    ("name", re.compile(r"\b(NameError|AttributeError)\b")),
+    ("timeout", re.compile(r"timed out|wall-clock limit|exceeded .*timeout")),
+    ("assertion", re.compile(r"\bAssertionError\b|^\s*E\s+assert\b", re.MULTILINE)),
+]
+TRIVIAL_FAILURES = {"syntax", "import", "name"}
+
+
+def failure_category(feedback: str) -> str:
+    """
+    Classifies test / pre-check feedback: "" without feedback, a trivial
+    category when every failure is trivial, otherwise the first non-trivial
+    one found ("timeout", "assertion" or "other").
+    """
+    if not feedback:
+        return ""
+    found = [name for name, pattern in FAILURE_PATTERNS if pattern.search(feedback)]
+    serious = [name for name in found if name not in TRIVIAL_FAILURES]
+    if serious:
+        return serious[0]
+    return found[0] if found else "other"
+
+
+# Per-call routing hints set by the agents (contextvars follow asyncio tasks
+# and the copied contexts of fix candidate threads)
+_route_hint: contextvars.ContextVar = contextvars.ContextVar("route_hint", default={})
+
+
+@contextmanager
+def route_hint(**hint):
+    """Routing hints (failure=..., escalate=...) for the model calls inside."""
+    token = _route_hint.set({**_route_hint.get(), **hint})
+    try:
+        yield
+    finally:
+        _route_hint.reset(token)
+
+
+@dataclass
+class ModelTier:
+    name: str
+    model: str
+    # Largest estimated prompt this tier is used for (0 = no limit)
+    max_prompt_tokens: int = 0
+    timeout_s: float = 300
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    # Exponentially weighted moving average of successful call latency
+    latency_ewma_s: float = 0.0
+    consecutive_timeouts: int = 0
+    cooldown_until: float = 0.0
+
+
+def parse_tiers(spec: str) -> List[ModelTier]:
+    """Parses "name=model:max_prompt_tokens:timeout_s,..." (cheapest first)."""
+    tiers = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, rest = item.strip().partition("=")
+        model, max_tokens, timeout = (rest.split(":") + ["", ""])[:3]
+        tiers.append(
+            ModelTier(
+                name=name,
+                model=model,
+                max_prompt_tokens=int(max_tokens or 0),
+                timeout_s=float(timeout or 300),
+            )
+        )
+    if not tiers:
+        raise ValueError(f"No model tiers in {spec!r}")
+    return tiers
+
+
+class ModelRouter:
+    """
+    Picks the model tier of every call from the agent's role, the estimated
+    prompt size and the failure being fixed, and keeps the observed latency
+    of each tier.
+
+    A call starts at the cheapest tier whose max_prompt_tokens fits the
+    prompt, but not below the role's floor (trivial failures ignore the
+    floor, escalated fixes go straight to the largest tier). When a tier
+    times out, the call falls back to the next larger one; a tier that timed
+    out `timeouts_to_cooldown` times in a row is skipped for `cooldown_s`.
+    """
+
+    def __init__(
+        self,
+        tiers: List[ModelTier],
+        role_floors: Dict[str, str] = None,
+        cooldown_s: float = 60.0,
+        timeouts_to_cooldown: int = 2,
+        latency_alpha: float = 0.3,
+    ):
+        self.tiers = tiers
+        self.role_floors = role_floors or {}
+        self.cooldown_s = cooldown_s
+        self.timeouts_to_cooldown = timeouts_to_cooldown
+        self.latency_alpha = latency_alpha
+        self._stats = {tier.name: TierStats() for tier in tiers}
+        self._lock = threading.Lock()
+
+    def _index(self, name: Optional[str]) -> int:
+        for i, tier in enumerate(self.tiers):
+            if tier.name == name:
+                return i
+        return 0
+
+    def route(
+        self,
+        role: str,
+        prompt_tokens: int,
+        failure: str = "",
+        escalate: bool = False,
+    ) -> List[ModelTier]:
+        """The tiers to try for one call, in order."""
+        last = len(self.tiers) - 1
+        if escalate:
+            start = last
+        else:
+            start = next(
+                (
+                    i
+                    for i, tier in enumerate(self.tiers)
+                    if not tier.max_prompt_tokens
+                    or prompt_tokens <= tier.max_prompt_tokens
+                ),
+                last,
+            )
+            if failure not in TRIVIAL_FAILURES:
+                start = max(start, self._index(self.role_floors.get(role)))
+
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                tier
+                for tier in self.tiers[start:]
+                if self._stats[tier.name].cooldown_until <= now
+            ]
+        # The largest tier is always tried, cooling down or not
+        return candidates or [self.tiers[last]]
+
+    def record(self, tier: ModelTier, latency_s: float, outcome: str = "ok"):
+        """Records one call of a tier: outcome is "ok", "timeout" or "error"."""
+        with self._lock:
+            stats = self._stats[tier.name]
+            stats.calls += 1
+            if outcome == "timeout":
+                stats.timeouts += 1
+                stats.consecutive_timeouts += 1
+                if stats.consecutive_timeouts >= self.timeouts_to_cooldown:
+                    stats.cooldown_until = time.monotonic() + self.cooldown_s
+                return
+            stats.consecutive_timeouts = 0
+            if outcome == "error":
+                stats.errors += 1
+                return
+            if stats.latency_ewma_s == 0.0:
+                stats.latency_ewma_s = latency_s
+            else:
+                stats.latency_ewma_s += self.latency_alpha * (
+                    latency_s - stats.latency_ewma_s
+                )
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                tier.name: {
+                    "model": tier.model,
+                    "calls": s.calls,
+                    "timeouts": s.timeouts,
+                    "errors": s.errors,
+                    "latency_ewma_s": round(s.latency_ewma_s, 4),
+                    "cooling_down": s.cooldown_until > now,
+                }
+                for tier, s in ((t, self._stats[t.name]) for t in self.tiers)
+            }
+
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    # ~4 characters per token, as in agents.context_builder.estimate_tokens
+    return sum(len(str(m.content)) for m in messages) // 4
+
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model that sends every call to the client of the tier the router
+    picks (see ModelRouter), falling back to the next tier on a timeout.
+    Each tier client keeps its own cache (streams included), rate limiter and
+    retries; a stream only falls back while it has not produced any output yet.
+    """
+
+    role: str
+    router: Any
+    # Tier name -> chat model
+    clients: Dict[str, Any]
+    # Exceptions that count as a timeout of a tier client
+    timeout_errors: Tuple[type, ...] = (TimeoutError,)
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"role": self.role, "tiers": [t.model for t in self.router.tiers]}
+
+    def _route(self, messages: List[BaseMessage]) -> List[ModelTier]:
+        hint = _route_hint.get()
+        return self.router.route(
+            self.role,
+            _prompt_tokens(messages),
+            failure=hint.get("failure", ""),
+            escalate=hint.get("escalate", False),
+        )
+
+    def _fall_back(self, tier: ModelTier, started: float, tiers: List[ModelTier]):
+        self.router.record(tier, time.perf_counter() - started, "timeout")
+        if tier is not tiers[-1]:
+            print(
+                f"⏱️ [Router] {tier.name} ({tier.model}) timed out after "
+                f"{tier.timeout_s}s; falling back to the next tier"
+            )
+
+    @staticmethod
+    def _tag(result: ChatResult, tier: ModelTier) -> ChatResult:
+        result.llm_output = {
+            **(result.llm_output or {}),
+            "tier": tier.name,
+            "model_name": tier.model,
+        }
+        return result
+
+    @staticmethod
+    def _tag_chunk(chunk: ChatGenerationChunk, tier: ModelTier) -> ChatGenerationChunk:
+        # Only the first chunk: metadata strings of later chunks are concatenated
+        chunk.generation_info = {
+            **(chunk.generation_info or {}),
+            "tier": tier.name,
+            "model_name": tier.model,
+        }
+        return chunk
+
+    @staticmethod
+    def _client_stream(
+        client, messages, stop, run_manager, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        """
+        client._stream through the client's cache and rate limiter: a cached
+        response is replayed as one chunk, a completed stream is stored.
+        """
+        entry = cache_entry(client, messages, stop, **kwargs)
+        if entry is not None and entry[0].contains(entry[1], entry[2]):
+            result = client._generate_with_cache(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+            message = cached_chunk(result.generations[0].message)
+            yield ChatGenerationChunk(message=message)
+            return
+        if client.rate_limiter:
+            client.rate_limiter.acquire(blocking=True)
+        chunks = []
+        for chunk in client._stream(messages, stop, run_manager, **kwargs):
+            chunks.append(chunk.message)
+            yield chunk
+        if entry is not None:
+            store_stream(entry, chunks)
+
+    @staticmethod
+    async def _aclient_stream(
+        client, messages, stop, run_manager, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        entry = cache_entry(client, messages, stop, **kwargs)
+        if entry is not None and entry[0].contains(entry[1], entry[2]):
+            result = await client._agenerate_with_cache(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            )
+            message = cached_chunk(result.generations[0].message)
+            yield ChatGenerationChunk(message=message)
+            return
+        if client.rate_limiter:
+            await client.rate_limiter.aacquire(blocking=True)
+        chunks = []
+        async for chunk in client._astream(messages, stop, run_manager, **kwargs):
+            chunks.append(chunk.message)
+            yield chunk
+        if entry is not None:
+            store_stream(entry, chunks)
+
+    # -----------------------------
+    # BaseChatModel interface
+    # -----------------------------
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tiers = self._route(messages)
+        for tier in tiers:
+            started = time.perf_counter()
+            try:
+                # Through the tier client's cache and rate limiter
+                result = self.clients[tier.name]._generate_with_cache(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+            except self.timeout_errors:
+                self._fall_back(tier, started, tiers)
+                if tier is tiers[-1]:
+                    raise
+                continue
+            except Exception:
+                self.router.record(tier, time.perf_counter() - started, "error")
+                raise
+            self.router.record(tier, time.perf_counter() - started)
+            return self._tag(result, tier)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        tiers = self._route(messages)
+        for tier in tiers:
+            started = time.perf_counter()
+            try:
+                result = await self.clients[tier.name]._agenerate_with_cache(
+                    messages, stop=stop, run_manager=run_manager, **kwargs
+                )
+            except self.timeout_errors:
+                self._fall_back(tier, started, tiers)
+                if tier is tiers[-1]:
+                    raise
+                continue
+            except Exception:
+                self.router.record(tier, time.perf_counter() - started, "error")
+                raise
+            self.router.record(tier, time.perf_counter() - started)
+            return self._tag(result, tier)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        tiers = self._route(messages)
+        for tier in tiers:
+            client = self.clients[tier.name]
+            started = time.perf_counter()
+            produced = False
+            try:
+                for chunk in self._client_stream(
+                    client, messages, stop, run_manager, **kwargs
+                ):
+                    yield chunk if produced else self._tag_chunk(chunk, tier)
+                    produced = True
+            except self.timeout_errors:
+                self._fall_back(tier, started, tiers)
+                if produced or tier is tiers[-1]:
+                    raise
+                continue
+            except Exception:
+                self.router.record(tier, time.perf_counter() - started, "error")
+                raise
+            self.router.record(tier, time.perf_counter() - started)
+            return
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        tiers = self._route(messages)
+        for tier in tiers:
+            client = self.clients[tier.name]
+            started = time.perf_counter()
+            produced = False
+            try:
+                async for chunk in self._aclient_stream(
+                    client, messages, stop, run_manager, **kwargs
+                ):
+                    yield chunk if produced else self._tag_chunk(chunk, tier)
+                    produced = True
+            except self.timeout_errors:
+                self._fall_back(tier, started, tiers)
+                if produced or tier is tiers[-1]:
+                    raise
+                continue
+            except Exception:
+                self.router.record(tier, time.perf_counter() - started, "error")
+                raise
+            self.router.record(tier, time.perf_counter() - started)
+            return
+
+
+# -----------------------------
+# Process-wide router instance
+# -----------------------------
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> Optional[ModelRouter]:
+    """
+    Returns the shared model router, or None unless LLM_ROUTING is enabled.
+    Shared so every agent and run feeds the same per-tier latency stats.
+
+    Environment:
+        LLM_ROUTING=1             route each call to a model tier
+        LLM_ROUTER_TIERS          name=model:max_prompt_tokens:timeout_s,...
+        LLM_ROUTER_ROLES          role=tier,... (the tier each agent starts at)
+        LLM_ROUTER_COOLDOWN_S     how long a tier that keeps timing out is skipped
+    """
+    global _router
+
+    if os.getenv("LLM_ROUTING", "0").lower() not in ("1", "true", "yes"):
+        return None
+
+    with _router_lock:
+        if _router is None:
+            floors = os.getenv("LLM_ROUTER_ROLES", DEFAULT_ROLE_FLOORS)
+            _router = ModelRouter(
+                parse_tiers(os.getenv("LLM_ROUTER_TIERS", DEFAULT_TIERS)),
+                role_floors=dict(
+                    item.strip().split("=", 1)
+                    for item in floors.split(",")
+                    if "=" in item
+                ),
+                cooldown_s=float(os.getenv("LLM_ROUTER_COOLDOWN_S", "60")),
+            )
+        return _router
@@ -1,32 +1,60 @@
-import os
-import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
 from dotenv import load_dotenv
-from agents.planner_agent import PlannerAgent
-from agents.coder_agent import CoderAgent
-from agents.tester_agent import TesterAgent
+from agents.agent_factory import get_coder, get_planner, get_tester
+from agents.virtual_workspace import get_workspace
 
 # Load API keys and env variables
 load_dotenv()
 
-# Initialize agents
-planner = PlannerAgent()
-coder = CoderAgent()
-tester = TesterAgent()
+
+@contextmanager
+def _step(metrics, name: str):
+    """Times a pipeline step like the graph's nodes are timed."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = round(time.perf_counter() - started, 4)
+        metrics.add("nodes", {"node": name, "duration_s": elapsed})
 
 
 def run_pipeline(user_prompt: str):
+    from agents.metrics import RunMetrics, collect_metrics, get_metrics_registry
+    from agents.telemetry import record_run
+
+    # Model calls, step timings and the outcome go to the telemetry store
+    metrics = RunMetrics(uuid.uuid4().hex[:12])
+    state = {"user_prompt": user_prompt, "iteration": 0}
+    status = "failed"
+    try:
+        with collect_metrics(metrics):
+            status = _run_steps(user_prompt, metrics, state)
+    finally:
+        metrics.finish(status)
+        record_run(get_metrics_registry().record(metrics), state, "linear")
+
+
+def _run_steps(user_prompt: str, metrics, state: dict) -> str:
     print("\n🚀 Starting Autonomous Coding Pair Pipeline\n")
     print(f"🧭 User Prompt: {user_prompt}\n")
 
+    # Agents are built on first use, after the prompt was entered
+    planner, coder, tester = get_planner(), get_coder(), get_tester()
+
     # Step 1 — Planning
     print("📋 Generating project plan...")
-    plan = planner.plan_project(user_prompt)
+    with _step(metrics, "plan"):
+        plan = planner.plan_project(user_prompt)
 
     # Validate plan
     if not isinstance(plan, dict) or "modules" not in plan:
         print("❌ Planner failed to generate a valid plan.")
         print("Raw output:", plan)
-        return
+        return "failed"
+    state["plan"] = plan
 
     print("\n✅ Plan generated successfully:")
     for module in plan["modules"]:
@@ -34,11 +62,12 @@ def run_pipeline(user_prompt: str):
 
     # Step 2 — Code Generation
     print("\n💻 Generating code files...")
-    code_output = coder.generate_or_improve_code(plan)
+    with _step(metrics, "code"):
+        code_output = coder.generate_or_improve_code(plan)
 
     if "error" in code_output:
         print("❌ Code generation failed:", code_output["exception"])
-        return
+        return "failed"
 
     print("\n✅ Code files created:")
     for filename in code_output.keys():
@@ -46,22 +75,34 @@ def run_pipeline(user_prompt: str):
 
     # Step 3 — Testing
     print("\n🧪 Running tests...")
-    test_output = tester.run_tests()
+    with _step(metrics, "test"):
+        test_output = tester.run_tests()
     feedback = tester.analyze_results(test_output)
+    state.update(iteration=1, test_output=test_output.model_dump())
 
     print("\n🔍 Test Results:\n")
-    print(test_output)
+    print(test_output.output)
     print("\nSummary:", feedback)
 
-    # Step 4 — Archive results
-    zip_path = "workspace_output.zip"
-    shutil.make_archive("workspace_output", "zip", "workspace")
+    # Step 4 — Archive results (straight from the in-memory workspace)
+    zip_path = get_workspace(coder.output_dir).write_zip("workspace_output.zip")
     print(f"\n📦 Workspace archived at: {zip_path}")
 
     print("\n🏁 Pipeline complete!\n")
+    return "done"
 
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) == 3 and sys.argv[1] == "--resume":
+        # Continue a checkpointed graph run after its last completed node
+        from agents.run_Agent import resume
+
+        final_state = resume(sys.argv[2])
+        print("\nSummary:", final_state.get("feedback", ""))
+        sys.exit(0)
+
     user_prompt = input("Describe your coding project idea: ").strip()
     if not user_prompt:
         print("Please enter a valid project description.")
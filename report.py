@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import time
+
+UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds of "90m", "24h" or "7d" (plain numbers are days)."""
+    text = text.strip().lower()
+    if text[-1] in UNITS:
+        return float(text[:-1]) * UNITS[text[-1]]
+    return float(text) * UNITS["d"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Latency, iterations-to-green and regressions of recorded runs."
+    )
+    parser.add_argument(
+        "--window", default="7d", help="report the runs of the last 90m / 24h / 7d"
+    )
+    parser.add_argument(
+        "--baseline",
+        help="compare against the window of this length right before it "
+        "(default: the same length; 0 disables the comparison)",
+    )
+    parser.add_argument(
+        "--pipeline", help="only runs of this pipeline (graph, graph_async, linear)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change that counts as a regression",
+    )
+    parser.add_argument("--path", help="telemetry SQLite file (TELEMETRY_PATH)")
+    parser.add_argument("--json", action="store_true", help="print JSON instead")
+    args = parser.parse_args()
+
+    from agents.telemetry import (
+        DEFAULT_TELEMETRY_PATH,
+        TelemetryStore,
+        format_report,
+        regressions,
+        window_report,
+    )
+
+    path = args.path or os.getenv("TELEMETRY_PATH", DEFAULT_TELEMETRY_PATH)
+    if not os.path.exists(path):
+        raise SystemExit(f"No telemetry recorded yet ({path}).")
+    store = TelemetryStore(path)
+
+    def runs(since: float, until: float):
+        found = store.runs(since, until)
+        if args.pipeline:
+            found = [r for r in found if r["pipeline"] == args.pipeline]
+        return found
+
+    now = time.time()
+    window = parse_duration(args.window)
+    baseline_length = parse_duration(args.baseline or args.window)
+    current = window_report(runs(now - window, now))
+    baseline = None
+    if baseline_length > 0:
+        start = now - window
+        baseline = window_report(runs(start - baseline_length, start))
+
+    if args.json:
+        result = {"window": current, "baseline": baseline}
+        if baseline is not None:
+            result["regressions"] = regressions(baseline, current, args.threshold)
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"📈 Runs of the last {args.window}\n")
+        print(format_report(current, baseline, args.threshold))